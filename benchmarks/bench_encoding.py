@@ -0,0 +1,101 @@
+"""
+JSON vs MessagePack command payloads: encode/decode cost and message size.
+
+    python -m benchmarks.bench_encoding [iterations]
+
+Runs over every intent and gesture command. "encode" builds the payload on the fly,
+"cached" is the PayloadCache lookup the publishers use, "decode" is what a consumer
+such as mqtt_listener.py pays per message, telling the encoding from the first
+byte. Sizes are the payload and the whole MQTT PUBLISH packet on central_main/control:
+v5 as MQTT5Publisher sends it by default, "v5+CT" with the ContentType "msgpack" it
+adds to MessagePack payloads when ANNOUNCE_CONTENT_TYPE is on. The last table scales the per-message figures to message
+rates from an idle home (gesture cooldown, one voice command) up to the flood rate
+bench_publish reaches on the local broker.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common import payloads
+from common.payloads import PayloadCache, ENCODING_JSON, ENCODING_MSGPACK, decode_payload, encode_payload
+from rhasspy_voice.intent_parser import INTENT_COMMANDS
+
+TOPIC = "central_main/control"
+RATES = (0.5, 10, 100, 5000)   # Commands per second
+
+
+def publish_size(payload, content_type=None, v5=False):
+    # Bytes on the wire of a QoS 0 PUBLISH (fixed header, topic, v5 properties, payload)
+    properties = b""
+    if content_type is not None:
+        value = content_type.encode()
+        properties = b"\x03" + len(value).to_bytes(2, "big") + value   # ContentType
+    body = 2 + len(TOPIC) + (1 + len(properties) if v5 else 0) + len(payload)
+    return 1 + (1 if body < 128 else 2) + body
+
+
+def main(iterations=100000):
+    commands = list(dict.fromkeys(list(INTENT_COMMANDS.values()) + [
+        ("Front Door", "unlock"), ("Front Door", "lock"), ("CMD_SWITCH_ALL", "on"), ("CMD_LIGHT_ALL", "off")]))
+    messages = [{"name": name, "state": state} for name, state in commands]
+    rounds = max(1, iterations // len(messages))
+    version = ".".join(map(str, payloads.msgpack.version))
+    print(f"{len(messages)} commands x {rounds} rounds, MessagePack via msgpack {version}")
+
+    results = {}
+    for encoding in (ENCODING_JSON, ENCODING_MSGPACK):
+        cache = PayloadCache(commands, encoding=encoding)
+        encoded = [encode_payload(message, encoding) for message in messages]
+
+        def encode():
+            for message in messages:
+                encode_payload(message, encoding)
+
+        def cached():
+            for message in messages:
+                cache.encode(message)
+
+        def decode():
+            for payload in encoded:
+                decode_payload(payload)
+
+        timings = {}
+        for label, fn in (("encode", encode), ("cached", cached), ("decode", decode)):
+            seconds = min(timeit.repeat(fn, number=rounds, repeat=3))
+            timings[label] = seconds / (rounds * len(messages)) * 1e9
+        property_type = ENCODING_MSGPACK if encoding == ENCODING_MSGPACK else None
+        results[encoding] = {
+            **timings,
+            "payload": sum(map(len, encoded)) / len(encoded),
+            "v311": sum(publish_size(p) for p in encoded) / len(encoded),
+            "v5": sum(publish_size(p, v5=True) for p in encoded) / len(encoded),
+            "v5ct": sum(publish_size(p, property_type, v5=True) for p in encoded) / len(encoded),
+        }
+
+    print(f"{'':10s} {'encode':>10s} {'cached':>10s} {'decode':>10s} {'payload':>9s} {'PUBLISH':>9s} {'v5':>6s} "
+          f"{'v5+CT':>6s}")
+    for encoding, r in results.items():
+        print(f"{encoding:10s} {r['encode']:8.0f}ns {r['cached']:8.0f}ns {r['decode']:8.0f}ns "
+              f"{r['payload']:8.1f}B {r['v311']:8.1f}B {r['v5']:5.1f}B {r['v5ct']:5.1f}B")
+
+    json_r, pack_r = results[ENCODING_JSON], results[ENCODING_MSGPACK]
+    saving = lambda key: (1 - pack_r[key] / json_r[key]) * 100
+    print(f"MessagePack payloads are {saving('payload'):.0f}% smaller, whole packets {saving('v311'):.0f}% (3.1.1), "
+          f"{saving('v5'):.0f}% (v5) and {saving('v5ct'):.0f}% (v5 with ContentType)")
+    print(f"Trade-off per message: {json_r['v311'] - pack_r['v311']:.1f} B less on the wire "
+          f"({pack_r['v5ct'] - pack_r['v5']:.0f} B of it spent when the ContentType is announced) for "
+          f"{pack_r['cached'] + pack_r['decode'] - json_r['cached'] - json_r['decode']:+.0f} ns of "
+          f"publisher plus consumer CPU")
+    print(f"{'rate/s':>8s} {'json B/s':>10s} {'msgpack B/s':>12s} {'json CPU':>10s} {'msgpack CPU':>12s}")
+    for rate in RATES:
+        # Publisher (cached payload) plus one consumer decoding every message
+        json_cpu = rate * (json_r["cached"] + json_r["decode"]) / 1e9 * 100
+        pack_cpu = rate * (pack_r["cached"] + pack_r["decode"]) / 1e9 * 100
+        print(f"{rate:8g} {rate * json_r['v311']:10.0f} {rate * pack_r['v311']:12.0f} "
+              f"{json_cpu:9.4f}% {pack_cpu:11.4f}%")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
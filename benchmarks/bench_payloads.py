@@ -0,0 +1,61 @@
+"""
+Per-publish payload cost before and after the pre-encoded payload cache.
+
+    python -m benchmarks.bench_payloads [iterations]
+
+"json.dumps" builds the command dict and serializes it on every publish (the old
+path); "cache" looks up the bytes compiled at startup. Both are also measured
+through paho's publish() on an unconnected client, which includes paho's own
+str -> bytes encoding and message setup.
+"""
+import json
+import os
+import sys
+import timeit
+
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.payloads import PayloadCache
+from rhasspy_voice.intent_parser import INTENT_COMMANDS
+
+TOPIC = "central_main/control"
+
+
+def main(iterations=200000):
+    commands = list(INTENT_COMMANDS.values())
+    cache = PayloadCache(commands)
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+
+    def encode_json():
+        for name, state in commands:
+            json.dumps({"name": name, "state": state})
+
+    def encode_cached():
+        for name, state in commands:
+            cache.encode({"name": name, "state": state})
+
+    def publish_json():
+        for name, state in commands:
+            client.publish(TOPIC, json.dumps({"name": name, "state": state}))
+
+    def publish_cached():
+        for name, state in commands:
+            client.publish(TOPIC, cache.encode({"name": name, "state": state}))
+
+    rounds = max(1, iterations // len(commands))
+    print(f"{len(commands)} commands x {rounds} rounds")
+    results = {}
+    for label, fn in (("encode json.dumps", encode_json), ("encode cache", encode_cached),
+                      ("publish json.dumps", publish_json), ("publish cache", publish_cached)):
+        seconds = min(timeit.repeat(fn, number=rounds, repeat=3))
+        results[label] = seconds / (rounds * len(commands)) * 1e9
+        print(f"{label:20s} {results[label]:8.0f} ns/publish")
+    for step in ("encode", "publish"):
+        before, after = results[f"{step} json.dumps"], results[f"{step} cache"]
+        print(f"{step}: {before - after:.0f} ns saved per publish ({(1 - after / before) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
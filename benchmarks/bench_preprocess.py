@@ -0,0 +1,90 @@
+"""
+What the audio preprocessing stage costs and what it saves on the STT upload.
+
+    python -m benchmarks.bench_preprocess [commands]
+
+A synthetic 3 s command at 44.1 kHz (0.5 s room noise, 1.2 s of a voiced,
+speech-like signal, 1.3 s of trailing noise, plus a DC offset as cheap USB
+microphones have) is sent as the raw WAV and after AudioPreprocessor. Reported:
+the preprocessing time, the WAV sizes, the time to upload and get an answer
+from the stub Rhasspy of bench_rhasspy_http over loopback (keep-alive session),
+and the pure transfer time the size difference makes on slower links to the
+Rhasspy host. The STT decoding time saved by the trimmed seconds is not
+measured here: it shows up in voiceControl's "[audio]" report against a real
+Rhasspy.
+"""
+import io
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+from scipy.io import wavfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.latency import LatencyHistogram
+from rhasspy_voice.preprocessing import AudioPreprocessor
+from rhasspy_voice.rhasspy_http import RhasspySession
+from benchmarks.bench_publish import BUCKETS_MS, describe
+from benchmarks.bench_rhasspy_http import StubRhasspy
+
+RATE = 44100
+LINKS_MBIT = (100, 20, 2)    # Wired LAN, Wi-Fi, a weak Wi-Fi link
+
+
+def command(rate=RATE, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(1.2 * rate)) / rate
+    voiced = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((140, 280, 420, 700, 1100), 1))
+    voiced *= 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2   # Syllable-rate envelope
+    signal = np.concatenate([rng.standard_normal(int(0.5 * rate)) * 0.002, voiced * 0.2,
+                             rng.standard_normal(int(1.3 * rate)) * 0.002])
+    return np.clip((signal + 0.01) * 32767, -32768, 32767).astype(np.int16)
+
+
+def wav(samples, rate):
+    buffer = io.BytesIO()
+    wavfile.write(buffer, rate, samples)
+    return buffer.getvalue()
+
+
+def main(commands=200):
+    samples = command()
+    raw = wav(samples, RATE)
+    preprocessor = AudioPreprocessor()
+    for _ in range(commands):
+        # As voiceControl does: preprocess the recorded samples, encode the WAV once
+        processed = wav(preprocessor.process(samples, RATE), preprocessor.target_rate)
+    print(f"{commands} commands of {len(raw)} bytes: preprocessing {describe(preprocessor.cost)}")
+    print(f"WAV sent to STT: {len(raw)} -> {len(processed)} bytes "
+          f"({(1 - len(processed) / len(raw)) * 100:.0f}% less), "
+          f"{preprocessor.seconds_in / commands:.2f} s -> {preprocessor.seconds_out / commands:.2f} s of audio")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubRhasspy)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/speech-to-text"
+    session = RhasspySession()
+    try:
+        for label, body in (("raw 44.1 kHz", raw), ("preprocessed", processed)):
+            histogram = LatencyHistogram(BUCKETS_MS)
+            for _ in range(commands):
+                start = time.perf_counter()
+                session.post(url, data=body, headers={'Content-Type': 'audio/wav'}).raise_for_status()
+                histogram.add((time.perf_counter() - start) * 1000)
+            print(f"{label:13s} upload + reply on loopback: {describe(histogram)}")
+    finally:
+        session.close()
+        server.shutdown()
+        server.server_close()
+
+    for mbit in LINKS_MBIT:
+        seconds = lambda size: size * 8 / (mbit * 1e6)
+        print(f"{mbit:4d} Mbit/s link: transfer {seconds(len(raw)) * 1000:6.1f}ms -> "
+              f"{seconds(len(processed)) * 1000:6.1f}ms per command")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,133 @@
+"""
+Publish throughput and latency of the gesture and voice publish paths, measured
+against the in-process broker (common.local_broker) on an ephemeral port.
+
+    python -m benchmarks.bench_publish [count]
+
+publish_message (gesture) and publish_intent_external (voice) are called back to
+back with alternating commands on a real paho client connected to the broker,
+once over MQTT 3.1.1 and once over v5 (message expiry and a topic alias). A
+separate subscriber receives every command: "call" is the time spent inside the
+publish function, "delivery" is from the call to the subscriber's on_message,
+and the throughput counts until the subscriber received the last command. The
+outbox and the repeat suppression are off so every call publishes.
+"""
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.latency import LatencyHistogram
+from common.local_broker import LocalBroker
+from common.mqtt5 import MQTT5Publisher, protocol_for
+
+TOPIC = "central_main/control"
+# Finer than the runtime tracer's buckets: a loopback publish takes well under a millisecond
+BUCKETS_MS = (0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def describe(histogram):
+    stats = histogram.summary()
+    return (f"mean {stats['mean_ms']:.3f}ms p50<={stats['p50_ms']:g}ms "
+            f"p95<={stats['p95_ms']:g}ms max {stats['max_ms']:.3f}ms")
+
+
+def connect(broker, protocol, on_message=None):
+    connected = threading.Event()
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=protocol)
+    client.on_connect = lambda c, userdata, flags, rc, properties: (
+        setattr(c, "connack_properties", properties), connected.set())
+    if on_message is not None:
+        client.on_message = on_message
+    client.connect("127.0.0.1", broker.port)
+    client.loop_start()
+    connected.wait(5)
+    return client
+
+
+def measure(label, publish, module, client_attribute, commands, count, use_v5):
+    # Times `count` calls of publish(topic, dict) with the module's client pointed at a fresh broker
+    with LocalBroker(record=False) as broker:
+        received = []
+        done = threading.Event()
+
+        def on_message(client, userdata, message):
+            received.append(time.perf_counter())
+            if len(received) == count:
+                done.set()
+
+        subscriber = connect(broker, mqtt.MQTTv311, on_message)
+        subscribed = threading.Event()
+        subscriber.on_subscribe = lambda *args: subscribed.set()
+        subscriber.subscribe(TOPIC)
+        subscribed.wait(5)
+
+        client = connect(broker, protocol_for(use_v5))
+        mqtt5 = MQTT5Publisher() if use_v5 else None
+        if mqtt5 is not None:
+            mqtt5.on_connect(client.connack_properties)
+        saved = {name: getattr(module, name) for name in (client_attribute, "outbox", "state_cache", "mqtt5")}
+        setattr(module, client_attribute, client)
+        module.outbox, module.state_cache, module.mqtt5 = None, None, mqtt5
+
+        calls, sent = LatencyHistogram(BUCKETS_MS), []
+        started = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for index in range(count):
+                    name, state = commands[index % len(commands)]
+                    before = time.perf_counter()
+                    publish(TOPIC, {"name": name, "state": state})
+                    sent.append(before)
+                    calls.add((time.perf_counter() - before) * 1000)
+            done.wait(30)
+        finally:
+            elapsed = (received[-1] if received else time.perf_counter()) - started
+            for name, value in saved.items():
+                setattr(module, name, value)
+            for c in (client, subscriber):
+                c.disconnect()
+                c.loop_stop()
+
+    delivery = LatencyHistogram(BUCKETS_MS)
+    for before, after in zip(sent, received):
+        delivery.add((after - before) * 1000)
+    print(f"{label}: {len(received)}/{count} delivered, {len(received) / elapsed:,.0f} commands/s")
+    print(f"  call     {describe(calls)}")
+    print(f"  delivery {describe(delivery)}")
+
+
+def bench_gesture(count):
+    import gestureControl.gesture_mqtt as gesture
+    commands = [(name, state) for _, _, name, state in gesture.GESTURE_COMMANDS]
+    for use_v5 in (False, True):
+        measure(f"gesture publish_message (MQTT {'5' if use_v5 else '3.1.1'})", gesture.publish_message,
+                gesture, "client", commands, count, use_v5)
+
+
+def bench_voice(count):
+    try:
+        import rhasspy_voice.voiceControl as voice
+    except OSError as e:
+        # sounddevice raises OSError when the PortAudio library is missing
+        print(f"voice publish_intent_external: skipped ({e})")
+        return
+    commands = list(voice.INTENT_COMMANDS.values())
+    for use_v5 in (False, True):
+        measure(f"voice publish_intent_external (MQTT {'5' if use_v5 else '3.1.1'})",
+                voice.publish_intent_external, voice, "external_mqtt_client", commands, count, use_v5)
+
+
+def main(count=5000):
+    bench_gesture(count)
+    bench_voice(count)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,88 @@
+"""
+Cost of a new connection per Rhasspy request versus the shared keep-alive session.
+
+    python -m benchmarks.bench_rhasspy_http [commands]
+
+A stand-in Rhasspy HTTP server on an ephemeral loopback port answers STT with a
+fixed transcript and NLU with a fixed intent at once, so the timings are pure
+client and connection overhead. Each command is one STT POST of a 1 s, 16 kHz
+WAV followed by one NLU POST, as the voice loop sends them: first with
+requests.post() (what the scripts did), then through RhasspySession. On a Pi
+talking to Rhasspy on another host the connection setup is a network round trip
+per request, so the gap grows with the latency to the server.
+"""
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.latency import LatencyHistogram
+from rhasspy_voice.rhasspy_http import RhasspySession
+from benchmarks.bench_publish import BUCKETS_MS, describe
+
+WAV = b"RIFF" + bytes(32000 + 40)   # 1 s of 16 kHz int16 silence with a header
+INTENT = b'{"intent": {"name": "Light1_On", "confidence": 1.0}, "text": "turn on light one"}'
+
+
+class StubRhasspy(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # TCP_NODELAY like real servers: headers and body are separate writes
+    connections = 0
+
+    def setup(self):
+        StubRhasspy.connections += 1
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        reply = b"turn on light one" if self.path.endswith("speech-to-text") else INTENT
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(post, url, commands):
+    histogram = LatencyHistogram(BUCKETS_MS)
+    StubRhasspy.connections = 0
+    start = time.perf_counter()
+    for _ in range(commands):
+        began = time.perf_counter()
+        post(f"{url}/api/speech-to-text", data=WAV, headers={'Content-Type': 'audio/wav'}).raise_for_status()
+        post(f"{url}/api/text-to-intent", data=b"turn on light one").json()
+        histogram.add((time.perf_counter() - began) * 1000)
+    return histogram, time.perf_counter() - start, StubRhasspy.connections
+
+
+def main(commands=300):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubRhasspy)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    session = RhasspySession()
+    try:
+        print(f"{commands} commands (STT + NLU) against a stub Rhasspy on {url}")
+        results = {}
+        for label, post in (("requests.post", lambda *a, **k: requests.post(*a, timeout=20, **k)),
+                            ("RhasspySession", session.post)):
+            histogram, elapsed, connections = run(post, url, commands)
+            results[label] = histogram
+            print(f"{label:15s} {describe(histogram)}; {commands / elapsed:.0f} commands/s, "
+                  f"{connections} connections")
+        saved = results["requests.post"].summary()["mean_ms"] - results["RhasspySession"].summary()["mean_ms"]
+        print(f"Saved per command: {saved:.3f}ms on loopback")
+    finally:
+        session.close()
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
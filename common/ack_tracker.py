@@ -0,0 +1,173 @@
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from common.latency import LatencyHistogram
+from common.outbox import expiry_for
+from common.payloads import decode_payload
+from common.topics import device_id, device_subscriptions, topic_device_id, STATE_SUFFIX, TOPIC_PREFIX
+
+# Confirmation tracking of published commands (off unless a publisher enables it)
+ACK_TIMEOUT = 5.0            # Seconds a device has to report the commanded state
+ACK_RETRIES = 1              # Republishes of an unconfirmed command before it is reported
+
+
+class PendingCommand:
+    """A published command waiting for its device to report the commanded state."""
+
+    __slots__ = ("name", "state", "routes", "sent", "deadline", "attempts")
+
+    def __init__(self, name, state, topic, payload, sent, deadline):
+        self.name = name
+        self.state = state
+        self.routes = [(topic, payload)]  # Every topic the command went to (device topic, legacy mirror)
+        self.sent = sent             # First publish (monotonic), start of the round trip
+        self.deadline = deadline
+        self.attempts = 1
+
+
+class AckTracker:
+    """
+    Matches published commands to the state devices report on home/<device>/state.
+
+    sent() registers a command after each successful publish, also of commands
+    drained from the outbox (drained()); the same command on another topic
+    (device routing's legacy mirror) joins the pending one, so a retry goes to
+    all of its topics. The device's state report, a {"name", "state"} payload (JSON or MessagePack) on its state topic,
+    confirms it and records the round trip from the first publish. The latest
+    command per device is tracked, so a newer command supersedes an unconfirmed
+    one. check() is called from the capture loop: it only walks the pending
+    commands, republishes those past their deadline (while they are still valid,
+    see outbox.expiry_for) and reports each command that runs out of retries
+    once. Every state report updates the DeviceStateCache; a command that is
+    never confirmed invalidates its device there.
+
+    Call subscribe(client) from on_connect; confirmations arrive on paho's
+    network thread through a per-topic message callback.
+    """
+
+    def __init__(self, republish, timeout=ACK_TIMEOUT, retries=ACK_RETRIES, state_cache=None,
+                 devices=(), prefix=TOPIC_PREFIX, name="ack"):
+        self.republish = republish   # republish(topic, payload) -> paho-style result
+        self.timeout = timeout
+        self.retries = retries
+        self.state_cache = state_cache
+        self.name = name
+        self.filters = device_subscriptions(devices, prefix, STATE_SUFFIX)
+        self.prefix = prefix
+        self._pending = {}           # device id -> PendingCommand
+        self._names = {}             # device id -> device name of the commands sent
+        self._lock = threading.Lock()
+        self.latency = defaultdict(LatencyHistogram)  # Device name -> command to confirmation
+        self.counts = Counter()      # sent, confirmed, retried, timed_out, superseded, reports
+
+    def subscribe(self, client):
+        for topic_filter in self.filters:
+            client.message_callback_add(topic_filter, self.on_message)
+            client.subscribe(topic_filter, qos=1)
+
+    def sent(self, message, topic, payload, now=None):
+        command = message.get("name"), message.get("state")
+        if not all(isinstance(value, str) for value in command):
+            return
+        now = time.monotonic() if now is None else now
+        key = device_id(command[0])
+        with self._lock:
+            pending = self._pending.get(key)
+            if (pending is not None and pending.state == command[1] and pending.attempts == 1
+                    and all(topic != sent_topic for sent_topic, _ in pending.routes)):
+                pending.routes.append((topic, payload))
+                return
+            if pending is not None:
+                self.counts["superseded"] += 1
+            self._pending[key] = PendingCommand(*command, topic, payload, now, now + self.timeout)
+            self._names[key] = command[0]
+            self.counts["sent"] += 1
+
+    def drained(self, topic, payload):
+        # Outbox.drain_to callback: registers a queued command once it is published
+        try:
+            message = decode_payload(payload)
+        except ValueError:
+            return
+        if isinstance(message, dict):
+            self.sent(message, topic, payload)
+
+    def on_message(self, client, userdata, msg):
+        self.confirm(msg.topic, msg.payload)
+
+    def confirm(self, topic, payload, now=None):
+        # Handles one state report; returns the confirmed PendingCommand or None
+        now = time.monotonic() if now is None else now
+        try:
+            report = decode_payload(payload)
+        except ValueError:
+            print(f"[{self.name}] Unreadable state report on {topic}: {payload!r}", file=sys.stderr)
+            return None
+        if not isinstance(report, dict) or "state" not in report:
+            return None
+        key = topic_device_id(topic, self.prefix)
+        if isinstance(report.get("name"), str):
+            key = device_id(report["name"])
+        if key is None:
+            return None
+        with self._lock:
+            self.counts["reports"] += 1
+            name = self._names.get(key) or report.get("name")
+            pending = self._pending.get(key)
+            if pending is not None and pending.state == report["state"]:
+                del self._pending[key]
+                self.counts["confirmed"] += 1
+                self.latency[pending.name].add((now - pending.sent) * 1000)
+            else:
+                pending = None
+        if name is not None and self.state_cache is not None:
+            # The device's own report is the best known state, whoever changed it
+            self.state_cache.record({"name": name, "state": report["state"]}, now)
+        return pending
+
+    def check(self, now=None):
+        # Republishes or reports commands past their deadline; cheap enough for every frame
+        now = time.monotonic() if now is None else now
+        retry, expired = [], []
+        with self._lock:
+            for key, pending in list(self._pending.items()):
+                if now < pending.deadline:
+                    continue
+                still_valid = now - pending.sent < expiry_for({"state": pending.state})
+                if pending.attempts <= self.retries and still_valid:
+                    pending.attempts += 1
+                    pending.deadline = now + self.timeout
+                    retry.append(pending)
+                    self.counts["retried"] += 1
+                else:
+                    del self._pending[key]
+                    expired.append(pending)
+                    self.counts["timed_out"] += 1
+        for pending in retry:
+            print(f"[{self.name}] No confirmation from {pending.name} for '{pending.state}', "
+                  f"publishing again (attempt {pending.attempts})")
+            for topic, payload in pending.routes:
+                result = self.republish(topic, payload)
+                if result[0] != 0:
+                    print(f"[{self.name}] Republish to {topic} failed (Error code: {result[0]})", file=sys.stderr)
+        for pending in expired:
+            print(f"[{self.name}] {pending.name} did not confirm '{pending.state}' after "
+                  f"{pending.attempts} attempt(s)", file=sys.stderr)
+            if self.state_cache is not None:
+                self.state_cache.invalidate(pending.name)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def report(self):
+        counts = self.counts
+        lines = [f"[{self.name}] sent {counts['sent']}, confirmed {counts['confirmed']}, "
+                 f"retried {counts['retried']}, timed out {counts['timed_out']}, "
+                 f"superseded {counts['superseded']}, pending {self.pending}"]
+        for name, histogram in sorted(self.latency.items()):
+            lines.append(f"  {name} round trip: {histogram.format()}")
+        return "\n".join(lines)
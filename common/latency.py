@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+REPORT_INTERVAL = 60.0
+PENDING_TIMEOUT = 60.0       # Seconds a published command waits for its ack before it is dropped
+
+GESTURE_STAGES = ("capture", "decision", "publish", "ack")
+VOICE_STAGES = ("recorded", "stt", "decision", "publish", "ack")
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds) with count, mean and max."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        index = 0
+        while index < len(self.buckets) and ms > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the given fraction of samples (max for the open bucket)
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return float(self.buckets[index]) if index < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max,
+        }
+
+    def format(self):
+        stats = self.summary()
+        return (f"n={stats['count']} mean {stats['mean_ms']:.1f}ms p50<={stats['p50_ms']:.0f}ms "
+                f"p95<={stats['p95_ms']:.0f}ms max {stats['max_ms']:.1f}ms")
+
+
+class Trace:
+    """Monotonic timestamps of one command as it passes the stages of a LatencyTracer."""
+
+    __slots__ = ("label", "marks")
+
+    def __init__(self, start_stage, start, label=None):
+        self.label = label
+        self.marks = [(start_stage, start)]
+
+    def mark(self, stage, now=None):
+        self.marks.append((stage, time.monotonic() if now is None else now))
+
+
+class LatencyTracer:
+    """
+    Per-command latency histograms for a fixed sequence of stages.
+
+    A command starts a Trace with the monotonic time of its first stage (frame
+    capture, end of recording), marks the following stages as it passes them, and
+    is handed to published() with paho's publish result. The message id is mapped
+    to the trace until on_publish calls acked(mid): for QoS 0 that is when paho
+    wrote the packet, for QoS 1 when the PUBACK arrived. Each segment between two
+    stages and the total are recorded overall and per command label.
+    """
+
+    def __init__(self, name, stages, report_interval=REPORT_INTERVAL, pending_timeout=PENDING_TIMEOUT):
+        self.name = name
+        self.stages = stages
+        self.report_interval = report_interval
+        self.pending_timeout = pending_timeout
+        self.segments = defaultdict(LatencyHistogram)     # "a->b" -> histogram
+        self.commands = defaultdict(LatencyHistogram)     # label -> first stage->last stage
+        self.lost = 0
+        self._pending = {}           # mid -> trace
+        self._early_acks = {}        # mid -> ack time, when on_publish ran before published()
+        self._lock = threading.Lock()
+        self._next_report = time.monotonic() + report_interval
+
+    def begin(self, start, label=None):
+        return Trace(self.stages[0], start, label)
+
+    def published(self, trace, result, now=None, wait_for_ack=True):
+        # Marks the publish stage and waits for the ack of result.mid (result.rc != 0 drops the trace).
+        # Without wait_for_ack (the connection belongs to the publisher service) the trace ends here.
+        trace.mark("publish", now)
+        if result.rc != 0:
+            self.lost += 1
+            return
+        if not wait_for_ack:
+            self.record(trace)
+            return
+        with self._lock:
+            acked = self._early_acks.pop(result.mid, None)
+            if acked is None:
+                self._pending[result.mid] = trace
+                self._expire(trace.marks[-1][1])
+        if acked is not None:
+            # paho confirmed before publish() returned; count the ack no earlier than the publish
+            trace.mark("ack", max(acked, trace.marks[-1][1]))
+            self.record(trace)
+
+    def acked(self, mid, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            trace = self._pending.pop(mid, None)
+            if trace is None:
+                # Also acks of untraced messages (e.g. health status); pruned after pending_timeout
+                self._early_acks[mid] = now
+                self._expire(now)
+                return
+        trace.mark("ack", now)
+        self.record(trace)
+
+    def _expire(self, now):
+        # Drop traces whose ack never came (e.g. connection lost); called with the lock held
+        for mid in [mid for mid, trace in self._pending.items() if now - trace.marks[-1][1] > self.pending_timeout]:
+            del self._pending[mid]
+            self.lost += 1
+        for mid in [mid for mid, acked in self._early_acks.items() if now - acked > self.pending_timeout]:
+            del self._early_acks[mid]
+
+    def record(self, trace):
+        marks = trace.marks
+        for (stage_a, time_a), (stage_b, time_b) in zip(marks, marks[1:]):
+            self.segments[f"{stage_a}->{stage_b}"].add((time_b - time_a) * 1000)
+        total = (marks[-1][1] - marks[0][1]) * 1000
+        self.segments[f"{marks[0][0]}->{marks[-1][0]}"].add(total)
+        if trace.label is not None:
+            self.commands[trace.label].add(total)
+
+    def summary(self):
+        return {segment: histogram.summary() for segment, histogram in self.segments.items()}
+
+    def report(self):
+        lines = [f"[latency] {self.name}: {self.lost} lost"]
+        for segment, histogram in self.segments.items():
+            lines.append(f"  {segment}: {histogram.format()}")
+        for label, histogram in sorted(self.commands.items()):
+            lines.append(f"  {label} total: {histogram.format()}")
+        return "\n".join(lines)
+
+    def maybe_report(self, now=None):
+        now = time.monotonic() if now is None else now
+        if now >= self._next_report:
+            self._next_report = now + self.report_interval
+            if self.segments:
+                print(self.report())
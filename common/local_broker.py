@@ -0,0 +1,375 @@
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import paho.mqtt.client as mqtt
+
+# Control packet types
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+# MQTT v5 property identifiers -> value type, to walk the property lists of incoming packets
+PROPERTY_TYPES = {
+    0x01: "byte", 0x02: "u32", 0x03: "string", 0x08: "string", 0x09: "binary", 0x0B: "varint",
+    0x11: "u32", 0x12: "string", 0x13: "u16", 0x15: "string", 0x16: "binary", 0x17: "byte",
+    0x18: "u32", 0x19: "byte", 0x1A: "string", 0x1C: "string", 0x1F: "string", 0x21: "u16",
+    0x22: "u16", 0x23: "u16", 0x24: "byte", 0x25: "byte", 0x26: "pair", 0x27: "u32",
+    0x28: "byte", 0x29: "byte", 0x2A: "byte",
+}
+TOPIC_ALIAS = 0x23
+TOPIC_ALIAS_MAXIMUM = 0x22
+USER_PROPERTY = 0x26
+
+# One PUBLISH received by the broker; properties are the decoded v5 properties (empty for 3.1.1)
+BrokerMessage = namedtuple("BrokerMessage", "client_id topic payload qos retain properties timestamp")
+
+
+def encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def encode_string(value):
+    data = value.encode("utf-8") if isinstance(value, str) else value
+    return struct.pack("!H", len(data)) + data
+
+
+class _Reader:
+    """Cursor over the variable header and payload of one packet."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def byte(self):
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def u16(self):
+        self.pos += 2
+        return struct.unpack_from("!H", self.data, self.pos - 2)[0]
+
+    def u32(self):
+        self.pos += 4
+        return struct.unpack_from("!I", self.data, self.pos - 4)[0]
+
+    def varint(self):
+        value, multiplier = 0, 1
+        while True:
+            byte = self.byte()
+            value += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                return value
+            multiplier *= 128
+
+    def binary(self):
+        length = self.u16()
+        self.pos += length
+        return bytes(self.data[self.pos - length:self.pos])
+
+    def string(self):
+        return self.binary().decode("utf-8")
+
+    def rest(self):
+        return bytes(self.data[self.pos:])
+
+    def properties(self):
+        # Returns (decoded {id: value}, raw bytes of each property) of a v5 property list
+        end = self.varint() + self.pos
+        decoded, raw = {}, []
+        while self.pos < end:
+            start = self.pos
+            prop = self.varint()
+            kind = PROPERTY_TYPES.get(prop)
+            if kind is None:
+                raise ValueError(f"Unknown MQTT v5 property 0x{prop:02x}")
+            if kind == "pair":
+                value = (self.string(), self.string())
+                decoded.setdefault(prop, []).append(value)
+            else:
+                value = getattr(self, kind)()
+                decoded[prop] = value
+            raw.append((prop, bytes(self.data[start:self.pos])))
+        return decoded, raw
+
+
+class _Session:
+    """One client connection, served by its own thread."""
+
+    def __init__(self, broker, sock):
+        self.broker = broker
+        self.sock = sock
+        self.client_id = ""
+        self.version = 4
+        self.subscriptions = {}      # topic filter -> granted QoS
+        self.aliases = {}            # topic alias -> topic (client to broker)
+        self._write_lock = threading.Lock()
+        self._next_mid = 0
+
+    def send(self, packet_type, flags, body):
+        data = bytes([(packet_type << 4) | flags]) + encode_length(len(body)) + body
+        with self._write_lock:
+            self.sock.sendall(data)
+
+    def _recv_exact(self, count):
+        data = bytearray()
+        while len(data) < count:
+            chunk = self.sock.recv(count - len(data))
+            if not chunk:
+                raise ConnectionError("Client closed the connection")
+            data += chunk
+        return data
+
+    def _read_packet(self):
+        header = self._recv_exact(1)[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = self._recv_exact(1)[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        return header >> 4, header & 0x0F, _Reader(self._recv_exact(length) if length else b"")
+
+    def run(self):
+        try:
+            packet_type, _, reader = self._read_packet()
+            if packet_type != CONNECT:
+                return
+            self._handle_connect(reader)
+            while True:
+                packet_type, flags, reader = self._read_packet()
+                if packet_type == PUBLISH:
+                    self._handle_publish(flags, reader)
+                elif packet_type == PUBREL:
+                    self.send(PUBCOMP, 0, struct.pack("!H", reader.u16()))
+                elif packet_type == SUBSCRIBE:
+                    self._handle_subscribe(reader)
+                elif packet_type == UNSUBSCRIBE:
+                    self._handle_unsubscribe(reader)
+                elif packet_type == PINGREQ:
+                    self.send(PINGRESP, 0, b"")
+                elif packet_type == DISCONNECT:
+                    return
+                # PUBACK / PUBREC / PUBCOMP for our deliveries need no action
+        except (ConnectionError, OSError, ValueError, IndexError, struct.error):
+            pass
+        finally:
+            self.broker._remove(self)
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def _handle_connect(self, reader):
+        reader.string()              # Protocol name ("MQTT" / "MQIsdp")
+        self.version = reader.byte()
+        connect_flags = reader.byte()
+        reader.u16()                 # Keep alive (not enforced)
+        if self.version == 5:
+            reader.properties()
+        self.client_id = reader.string()
+        if connect_flags & 0x04:     # Will message: not used by the stand-in, skipped
+            if self.version == 5:
+                reader.properties()
+            reader.string()
+            reader.binary()
+        # Username / password are accepted as given
+        if self.version == 5:
+            properties = b""
+            if self.broker.topic_alias_maximum:
+                properties = bytes([TOPIC_ALIAS_MAXIMUM]) + struct.pack("!H", self.broker.topic_alias_maximum)
+            self.send(CONNACK, 0, b"\x00\x00" + encode_length(len(properties)) + properties)
+        else:
+            self.send(CONNACK, 0, b"\x00\x00")
+
+    def _handle_publish(self, flags, reader):
+        qos = (flags >> 1) & 0x03
+        retain = bool(flags & 0x01)
+        topic = reader.string()
+        packet_id = reader.u16() if qos else None
+        properties, raw = {}, []
+        if self.version == 5:
+            properties, raw = reader.properties()
+            alias = properties.pop(TOPIC_ALIAS, None)
+            if alias is not None:
+                if topic:
+                    self.aliases[alias] = topic
+                else:
+                    topic = self.aliases[alias]
+                raw = [(prop, data) for prop, data in raw if prop != TOPIC_ALIAS]
+        payload = reader.rest()
+        if qos == 1:
+            self.send(PUBACK, 0, struct.pack("!H", packet_id))
+        elif qos == 2:
+            self.send(PUBREC, 0, struct.pack("!H", packet_id))
+        self.broker._route(self, topic, payload, qos, retain, properties, b"".join(data for _, data in raw))
+
+    def _handle_subscribe(self, reader):
+        packet_id = reader.u16()
+        if self.version == 5:
+            reader.properties()
+        granted = []
+        while reader.pos < len(reader.data):
+            topic_filter = reader.string()
+            qos = min(reader.byte() & 0x03, 1)
+            self.subscriptions[topic_filter] = qos
+            granted.append((topic_filter, qos))
+        body = struct.pack("!H", packet_id) + (b"\x00" if self.version == 5 else b"") + bytes(qos for _, qos in granted)
+        self.send(SUBACK, 0, body)
+        for topic_filter, qos in granted:
+            self.broker._send_retained(self, topic_filter, qos)
+
+    def _handle_unsubscribe(self, reader):
+        packet_id = reader.u16()
+        if self.version == 5:
+            reader.properties()
+        codes = bytearray()
+        while reader.pos < len(reader.data):
+            codes.append(0x00 if self.subscriptions.pop(reader.string(), None) is not None else 0x11)
+        body = struct.pack("!H", packet_id)
+        if self.version == 5:
+            body += b"\x00" + bytes(codes)
+        self.send(UNSUBACK, 0, body)
+
+    def deliver(self, topic, payload, qos, retain, raw_properties):
+        properties = encode_length(len(raw_properties)) + raw_properties if self.version == 5 else b""
+        with self._write_lock:
+            body = encode_string(topic)
+            if qos:
+                self._next_mid = self._next_mid % 65535 + 1
+                body += struct.pack("!H", self._next_mid)
+            body += properties + payload
+            self.sock.sendall(bytes([(PUBLISH << 4) | (qos << 1) | int(retain)]) + encode_length(len(body)) + body)
+
+
+class LocalBroker:
+    """
+    Minimal in-process MQTT broker for tests and benchmarks.
+
+    Speaks enough MQTT 3.1.1 and 5 for paho clients: CONNECT (credentials accepted),
+    PUBLISH at QoS 0/1 (QoS 2 is acknowledged and delivered as QoS 1), SUBSCRIBE and
+    UNSUBSCRIBE with + and # wildcards, retained messages, PING and DISCONNECT. v5
+    properties are forwarded to v5 subscribers and topic aliases are resolved. There
+    are no persistent sessions, no will messages and no keep-alive enforcement.
+
+        with LocalBroker() as broker:
+            client.connect("127.0.0.1", broker.port)
+
+    Every received PUBLISH is kept in `messages` (unless record=False) and counted
+    in `received`.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, topic_alias_maximum=10, record=True):
+        self.host = host
+        self.port = port
+        self.topic_alias_maximum = topic_alias_maximum
+        self.record = record
+        self.messages = []
+        self.received = 0
+        self.retained = {}           # topic -> (payload, qos, raw v5 properties)
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._received_event = threading.Condition(self._lock)
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(16)
+        self.port = self._server.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept_loop, name="local-broker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.shutdown(socket.SHUT_RDWR)    # Wakes the accept() of the accept thread
+            except OSError:
+                pass
+            server.close()
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            try:
+                session.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept_loop(self):
+        server = self._server
+        while self._server is not None:
+            try:
+                sock, _ = server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = _Session(self, sock)
+            with self._lock:
+                self._sessions.add(session)
+            threading.Thread(target=session.run, name="local-broker-session", daemon=True).start()
+
+    def _remove(self, session):
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _route(self, sender, topic, payload, qos, retain, properties, raw_properties):
+        with self._lock:
+            self.received += 1
+            if self.record:
+                self.messages.append(BrokerMessage(sender.client_id, topic, payload, qos, retain,
+                                                   properties, time.monotonic()))
+            if retain:
+                if payload:
+                    self.retained[topic] = (payload, qos, raw_properties)
+                else:
+                    self.retained.pop(topic, None)
+            targets = []
+            for session in self._sessions:
+                granted = [sub_qos for topic_filter, sub_qos in session.subscriptions.items()
+                           if mqtt.topic_matches_sub(topic_filter, topic)]
+                if granted:
+                    targets.append((session, min(qos, max(granted), 1)))
+            self._received_event.notify_all()
+        for session, delivery_qos in targets:
+            try:
+                session.deliver(topic, payload, delivery_qos, False, raw_properties)
+            except OSError as e:
+                print(f"[local broker] Delivery to {session.client_id or 'client'} failed: {e}", file=sys.stderr)
+
+    def _send_retained(self, session, topic_filter, sub_qos):
+        with self._lock:
+            matches = [(topic, value) for topic, value in self.retained.items()
+                       if mqtt.topic_matches_sub(topic_filter, topic)]
+        for topic, (payload, qos, raw_properties) in matches:
+            session.deliver(topic, payload, min(qos, sub_qos), True, raw_properties)
+
+    def wait_for_messages(self, count, timeout=5.0):
+        # Blocks until `count` PUBLISH packets were received in total; returns whether they were
+        with self._lock:
+            return self._received_event.wait_for(lambda: self.received >= count, timeout)
+
+    @property
+    def client_count(self):
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,94 @@
+import threading
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from common.payloads import ENCODING_MSGPACK, detect_encoding
+
+# Topics that get a topic alias (the high-frequency command topic)
+ALIAS_TOPICS = ("central_main/control",)
+# Announce MessagePack payloads with the v5 ContentType "msgpack" (10 bytes per PUBLISH); off, consumers
+# tell the encoding from the payload's first byte (payloads.detect_encoding)
+ANNOUNCE_CONTENT_TYPE = False
+
+
+def protocol_for(use_v5):
+    return mqtt.MQTTv5 if use_v5 else mqtt.MQTTv311
+
+
+class MQTT5Publisher:
+    """
+    Adds MQTT v5 publish properties to command publishes.
+
+    - MessageExpiryInterval: the broker drops a command nobody received within its
+      validity (see outbox.expiry_for), so a late "unlock" is never delivered.
+    - TopicAlias: after the first publish on an alias topic, later QoS 0 publishes
+      send an empty topic plus a 2-byte alias. Aliases belong to one connection, so
+      the table is reset on every CONNACK and limited to the broker's
+      TopicAliasMaximum (no aliases if the broker does not announce one). QoS > 0
+      publishes keep the full topic because paho may resend them after a reconnect.
+    - ContentType: with `announce_content_type`, "msgpack" on MessagePack payloads
+      for v5 consumers outside this project; JSON payloads never carry it.
+
+    Call on_connect(properties) from the client's on_connect callback.
+    """
+
+    def __init__(self, alias_topics=ALIAS_TOPICS, announce_content_type=ANNOUNCE_CONTENT_TYPE):
+        self.alias_topics = set(alias_topics)
+        self.announce_content_type = announce_content_type
+        self.alias_maximum = 0
+        self._aliases = {}           # topic -> alias
+        self._established = set()    # aliases the broker has seen with their topic
+        self._lock = threading.Lock()
+        self.published = 0
+        self.aliased = 0
+        self.bytes_saved = 0
+
+    def on_connect(self, properties=None):
+        with self._lock:
+            self.alias_maximum = getattr(properties, "TopicAliasMaximum", 0) if properties is not None else 0
+            self._aliases = {}
+            self._established = set()
+
+    def properties(self, topic, qos=0, expiry=None, content_type=None):
+        # Returns (topic to send, PUBLISH properties)
+        props = Properties(PacketTypes.PUBLISH)
+        if expiry is not None:
+            props.MessageExpiryInterval = max(1, int(expiry))
+        if content_type is not None:
+            props.ContentType = content_type
+        if qos != 0 or topic not in self.alias_topics:
+            return topic, props
+        with self._lock:
+            alias = self._aliases.get(topic)
+            if alias is None:
+                if len(self._aliases) >= self.alias_maximum:
+                    return topic, props
+                alias = len(self._aliases) + 1
+                self._aliases[topic] = alias
+            props.TopicAlias = alias
+            if alias in self._established:
+                self.aliased += 1
+                # Topic string and its length prefix replaced by a 3-byte alias property
+                self.bytes_saved += len(topic.encode("utf-8")) - 3
+                return "", props
+            self._established.add(alias)
+            return topic, props
+
+    def publish(self, client, topic, payload=None, qos=0, retain=False, expiry=None):
+        # The content type follows from the payload itself (outbox and publisher service payloads too)
+        announce = self.announce_content_type and detect_encoding(payload) == ENCODING_MSGPACK
+        send_topic, props = self.properties(topic, qos, expiry, ENCODING_MSGPACK if announce else None)
+        result = client.publish(send_topic, payload, qos=qos, retain=retain, properties=props)
+        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+            self.published += 1
+        elif send_topic and getattr(props, "TopicAlias", None):
+            # The broker never saw this alias, send the full topic again next time
+            with self._lock:
+                self._established.discard(props.TopicAlias)
+        return result
+
+    def report(self):
+        return (f"[mqtt5] published {self.published}, aliased {self.aliased} "
+                f"(alias maximum {self.alias_maximum}), {self.bytes_saved} topic bytes saved")
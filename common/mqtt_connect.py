@@ -0,0 +1,107 @@
+import random
+import sys
+import threading
+
+# Delay between connection attempts: exponential from BACKOFF_INITIAL up to BACKOFF_MAX,
+# each delay shortened by a random fraction of up to BACKOFF_JITTER so clients that lost
+# the broker together do not all come back at the same moment
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 30.0
+BACKOFF_JITTER = 0.5
+
+# Fixed pause paho itself takes before every reconnect (also covers refused CONNACKs,
+# which do not go through on_connect_fail)
+RECONNECT_FLOOR = 1
+
+
+def backoff_delay(attempt, initial=BACKOFF_INITIAL, maximum=BACKOFF_MAX, jitter=BACKOFF_JITTER, rand=random.random):
+    # attempt counts failures since the last successful connect, starting at 1
+    delay = min(maximum, initial * (2 ** (attempt - 1)))
+    return delay * (1 - jitter * rand())
+
+
+class BrokerConnector:
+    """
+    Connects a paho client without blocking the caller.
+
+    start() only calls connect_async() and loop_start(); the connection is made by
+    paho's network thread. Each failed attempt moves on to the next broker in the
+    ordered `brokers` list (wrapping around) after a jittered exponential backoff,
+    and a successful connect resets the backoff. Failover happens inside paho's
+    on_connect_fail callback, on the network thread, so the client is never
+    reconfigured while another thread uses its socket.
+    """
+
+    def __init__(self, client, brokers, keepalive=60, initial_delay=BACKOFF_INITIAL,
+                 max_delay=BACKOFF_MAX, jitter=BACKOFF_JITTER, name="mqtt"):
+        if not brokers:
+            raise ValueError("At least one broker is required")
+        self.client = client
+        self.brokers = list(brokers)
+        self.keepalive = keepalive
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.name = name
+
+        self.index = 0               # Broker currently tried / connected
+        self.failures = 0            # Consecutive failed attempts
+        self.attempts = 0
+        self.connects = 0
+        self._stop = threading.Event()
+        self._user_on_connect = None
+
+    @property
+    def broker(self):
+        return self.brokers[self.index]
+
+    def start(self):
+        self._user_on_connect = self.client.on_connect
+        self.client.on_connect = self._on_connect
+        self.client.on_connect_fail = self._on_connect_fail
+        self.client.reconnect_delay_set(RECONNECT_FLOOR, RECONNECT_FLOOR)
+        host, port = self.broker
+        print(f"[{self.name}] Connecting to MQTT broker {host}:{port} in the background...")
+        self.attempts += 1
+        self.client.connect_async(host, port, self.keepalive)
+        self.client.loop_start()
+        return self
+
+    def stop(self):
+        # Interrupts a pending backoff so loop_stop() does not wait for it
+        self._stop.set()
+
+    def _on_connect(self, client, *args):
+        reason_code = args[2] if len(args) > 2 else None
+        if reason_code == 0:
+            self.failures = 0
+            self.connects += 1
+        if self._user_on_connect:
+            self._user_on_connect(client, *args)
+
+    def _on_connect_fail(self, client, userdata):
+        self.failures += 1
+        failed_host, failed_port = self.broker
+        self.index = (self.index + 1) % len(self.brokers)
+        host, port = self.broker
+        delay = backoff_delay(self.failures, self.initial_delay, self.max_delay, self.jitter)
+        print(f"[{self.name}] MQTT broker {failed_host}:{failed_port} unreachable; "
+              f"trying {host}:{port} in {delay + RECONNECT_FLOOR:.1f}s", file=sys.stderr)
+        if self._stop.wait(delay):
+            return
+        self.attempts += 1
+        client.connect_async(host, port, self.keepalive)
+
+    def status(self):
+        host, port = self.broker
+        return {
+            "broker": f"{host}:{port}",
+            "connected": self.client.is_connected(),
+            "attempts": self.attempts,
+            "connects": self.connects,
+            "failures": self.failures,
+        }
+
+
+def connect_in_background(client, brokers, **kwargs):
+    return BrokerConnector(client, brokers, **kwargs).start()
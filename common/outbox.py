@@ -0,0 +1,216 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from common.payloads import decode_payload
+
+# On-disk outbox for commands published while the broker is unreachable (opt-in in each process:
+# a queued command switches the device when the broker is back, i.e. late)
+OUTBOX_PATH = os.environ.get("SMART_HOME_OUTBOX", os.path.expanduser("~/.smart_home/outbox.db"))
+OUTBOX_MAX_ENTRIES = 500     # Oldest commands are dropped beyond this
+DEFAULT_EXPIRY = 10.0        # Seconds a queued command stays valid (lights and switches: a few seconds late at most)
+
+# Locking the door late is still wanted; everything else expires with DEFAULT_EXPIRY
+EXPIRY_BY_STATE = {
+    "unlock": DEFAULT_EXPIRY,
+    "lock": 60.0,
+}
+
+
+def expiry_for(message):
+    # Seconds a command stays valid, from its dict or its JSON / MessagePack payload
+    if isinstance(message, (str, bytes)):
+        try:
+            message = decode_payload(message)
+        except ValueError:
+            return DEFAULT_EXPIRY
+    if isinstance(message, dict):
+        return EXPIRY_BY_STATE.get(message.get("state"), DEFAULT_EXPIRY)
+    return DEFAULT_EXPIRY
+
+
+class Outbox:
+    """
+    Append-only SQLite journal of MQTT commands that could not be published.
+
+    Commands survive reconnects and process restarts and are drained in the order
+    they were added once the broker is back; expired ones are discarded instead of
+    sent. Several processes (gesture, voice, publisher service) can share one file:
+    a drain runs inside a write transaction, so only one of them sends a command.
+    """
+
+    def __init__(self, path=OUTBOX_PATH, max_entries=OUTBOX_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " topic TEXT NOT NULL,"
+            " payload BLOB,"
+            " qos INTEGER NOT NULL DEFAULT 0,"
+            " retain INTEGER NOT NULL DEFAULT 0,"
+            " source TEXT,"
+            " created REAL NOT NULL,"
+            " expires REAL NOT NULL)")
+        self._lock = threading.Lock()  # paho callbacks drain from the network thread
+        self.added = 0
+        self.sent = 0
+        self.expired = 0
+        self.dropped = 0
+
+    def add(self, topic, payload, qos=0, retain=False, expiry=DEFAULT_EXPIRY, source=""):
+        now = time.time()
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO outbox (topic, payload, qos, retain, source, created, expires) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (topic, payload, qos, int(retain), source, now, now + expiry))
+            self.added += 1
+            # Keep the journal bounded: drop the oldest commands first
+            cursor = self._db.execute(
+                "DELETE FROM outbox WHERE id NOT IN (SELECT id FROM outbox ORDER BY id DESC LIMIT ?)",
+                (self.max_entries,))
+            if cursor.rowcount > 0:
+                self.dropped += cursor.rowcount
+                print(f"Outbox full, dropped {cursor.rowcount} oldest command(s)", file=sys.stderr)
+
+    def has_pending(self):
+        with self._lock:
+            return self._db.execute("SELECT EXISTS (SELECT 1 FROM outbox WHERE expires > ?)",
+                                    (time.time(),)).fetchone()[0] == 1
+
+    def pending(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE expires > ?", (time.time(),)).fetchone()[0]
+
+    def drain(self, publish):
+        """
+        Sends queued commands oldest first with publish(topic, payload, qos, retain, ttl) -> bool,
+        ttl being the seconds the command stays valid, and stops at the first failure.
+        Returns the number of commands sent.
+        """
+        sent = 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                cursor = self._db.execute("DELETE FROM outbox WHERE expires <= ?", (now,))
+                if cursor.rowcount > 0:
+                    self.expired += cursor.rowcount
+                    print(f"Outbox discarded {cursor.rowcount} expired command(s)")
+                rows = self._db.execute("SELECT id, topic, payload, qos, retain, expires FROM outbox ORDER BY id").fetchall()
+                for row_id, topic, payload, qos, retain, expires in rows:
+                    if not publish(topic, payload, qos, bool(retain), expires - now):
+                        break
+                    self._db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+                    sent += 1
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self.sent += sent
+        if sent:
+            print(f"Outbox delivered {sent} queued command(s)")
+        return sent
+
+    def drain_to(self, client, mqtt5=None, on_sent=None):
+        # Drain through a paho client (or QueuePublisher) while it is connected; with an
+        # MQTT5Publisher the broker gets the remaining validity as message expiry.
+        # on_sent(topic, payload) is called for every command published (AckTracker.drained)
+        def publish(topic, payload, qos, retain, ttl):
+            if not client.is_connected():
+                return False
+            if mqtt5 is not None:
+                result = mqtt5.publish(client, topic, payload, qos=qos, retain=retain, expiry=ttl)
+            else:
+                result = client.publish(topic, payload, qos=qos, retain=retain)
+            if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                return False
+            if on_sent is not None:
+                on_sent(topic, payload)
+            return True
+        return self.drain(publish)
+
+    def report(self):
+        return (f"[outbox] {self.pending()} pending; added {self.added}, delivered {self.sent}, "
+                f"expired {self.expired}, dropped {self.dropped}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class OutboxWriter:
+    """
+    Runs an Outbox's SQLite work on a background thread, for callers in a frame
+    loop that must not wait for the disk (or for another process holding the
+    write lock). add() and drain_to() are queued and executed in order;
+    has_pending() answers from memory: true while queued work is outstanding
+    or the journal still held commands after the last job. close() finishes
+    the queued work, stops the thread and closes the outbox; report() then
+    returns its final figures.
+    """
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._outstanding = 0        # Jobs queued and not finished
+        self._stored = outbox.has_pending()
+        self._final_report = None    # Set by close()
+        self._thread = threading.Thread(target=self._run, name="outbox-writer", daemon=True)
+        self._thread.start()
+
+    def _submit(self, job, *args):
+        with self._lock:
+            self._outstanding += 1
+        self._jobs.put((job, args))
+
+    def add(self, topic, payload, qos=0, retain=False, expiry=DEFAULT_EXPIRY, source=""):
+        self._submit(self.outbox.add, topic, payload, qos, retain, expiry, source)
+
+    def drain_to(self, client, mqtt5=None, on_sent=None):
+        self._submit(self.outbox.drain_to, client, mqtt5, on_sent)
+
+    def has_pending(self):
+        with self._lock:
+            return self._outstanding > 0 or self._stored
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            function, args = job
+            try:
+                function(*args)
+            except Exception as e:
+                print(f"Outbox error: {e}", file=sys.stderr)
+            stored = self.outbox.has_pending()
+            with self._lock:
+                self._outstanding -= 1
+                self._stored = stored
+
+    def pending(self):
+        return self.outbox.pending()
+
+    def report(self):
+        return self._final_report or self.outbox.report()
+
+    def close(self, timeout=5.0):
+        self._jobs.put(None)
+        self._thread.join(timeout)
+        self._final_report = self.outbox.report()
+        self.outbox.close()
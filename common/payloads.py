@@ -0,0 +1,122 @@
+import json
+
+import msgpack
+
+# Command payload encodings. JSON is the default; MessagePack is the compact option.
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+CONTENT_TYPES = {ENCODING_JSON: "application/json", ENCODING_MSGPACK: "application/msgpack"}
+# MQTT v5 user property some publishers name the encoding with (MQTT5Publisher uses ContentType)
+CONTENT_TYPE_PROPERTY = "content-type"
+
+# First byte of a MessagePack map (fixmap, map16, map32); a JSON object starts with "{"
+_MSGPACK_MAP_MARKERS = frozenset(range(0x80, 0x90)) | {0xDE, 0xDF}
+
+
+def pack(value):
+    return msgpack.packb(value)
+
+
+def unpack(data):
+    # Raises ValueError for a malformed payload, like json.loads
+    try:
+        return msgpack.unpackb(data)
+    except Exception as e:
+        raise ValueError(f"Invalid MessagePack payload: {e}") from e
+
+
+def encode_payload(message, encoding=ENCODING_JSON):
+    if encoding == ENCODING_MSGPACK:
+        return pack(message)
+    if encoding == ENCODING_JSON:
+        return json.dumps(message).encode("utf-8")
+    raise ValueError(f"Unknown payload encoding: {encoding}")
+
+
+def encode_command(name, state, encoding=ENCODING_JSON):
+    # In JSON, the same bytes json.dumps produces for {"name": name, "state": state}
+    return encode_payload({"name": name, "state": state}, encoding)
+
+
+def detect_encoding(payload):
+    if isinstance(payload, (bytes, bytearray)) and payload and payload[0] in _MSGPACK_MAP_MARKERS:
+        return ENCODING_MSGPACK
+    return ENCODING_JSON
+
+
+def encoding_of(content_type):
+    # Encoding of a MIME content type or of its short form ("msgpack", as MQTT5Publisher sends it)
+    for encoding, known in CONTENT_TYPES.items():
+        if content_type in (known, encoding):
+            return encoding
+    return None
+
+
+def content_type_of(properties):
+    # Content type announced in MQTT v5 PUBLISH properties (ContentType or user property), or None
+    content_type = getattr(properties, "ContentType", None)
+    if content_type:
+        return content_type
+    for key, value in getattr(properties, "UserProperty", None) or []:
+        if key == CONTENT_TYPE_PROPERTY:
+            return value
+    return None
+
+
+def decode_payload(payload, content_type=None):
+    # Message of a JSON or MessagePack payload; without a content type the first byte decides.
+    # Raises ValueError if the payload does not decode.
+    encoding = encoding_of(content_type) or detect_encoding(payload)
+    if encoding == ENCODING_MSGPACK:
+        return unpack(payload)
+    return json.loads(payload)
+
+
+def describe_payload(payload, content_type=None):
+    # Readable text of a payload for log lines: JSON as sent, MessagePack decoded and tagged
+    encoding = encoding_of(content_type) or detect_encoding(payload)
+    if encoding == ENCODING_JSON:
+        return payload if isinstance(payload, str) else payload.decode("utf-8", errors="replace")
+    try:
+        message = decode_payload(payload, content_type)
+    except ValueError:
+        return repr(payload)
+    return f"{json.dumps(message)} ({encoding}, {len(payload)} bytes)"
+
+
+class PayloadCache:
+    """
+    Pre-encoded MQTT payloads for a fixed command vocabulary.
+
+    The (name, state) pairs are encoded once at startup; publishing a known command
+    is then a dict lookup returning immutable bytes instead of building a dict and
+    calling json.dumps. Messages outside the vocabulary are encoded on the fly and
+    counted as misses. With encoding="msgpack" the payloads are MessagePack maps.
+    """
+
+    def __init__(self, commands=(), encoding=ENCODING_JSON):
+        if encoding not in CONTENT_TYPES:
+            raise ValueError(f"Unknown payload encoding: {encoding}")
+        self.encoding = encoding
+        self.content_type = CONTENT_TYPES[encoding]
+        self._payloads = {}
+        self.hits = 0
+        self.misses = 0
+        for name, state in commands:
+            self.add(name, state)
+
+    def add(self, name, state):
+        self._payloads[(name, state)] = encode_command(name, state, self.encoding)
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def encode(self, message_dict):
+        # Cached bytes for a {"name", "state"} command, encoded on the fly for anything else
+        if len(message_dict) == 2:
+            payload = self._payloads.get((message_dict.get("name"), message_dict.get("state")))
+            if payload is not None:
+                self.hits += 1
+                return payload
+        self.misses += 1
+        return encode_payload(message_dict, self.encoding)
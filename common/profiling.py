@@ -0,0 +1,246 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Opt-in profiling, e.g. PROFILE=cprofile python main.py  (or python main.py --profile sample)
+#   PROFILE            "cprofile" (or "1") for cProfile, "sample" for the stack sampling profiler
+#   PROFILE_DIR        where the stats files are written
+#   PROFILE_INTERVAL   seconds between periodic dumps
+PROFILE_ENV = "PROFILE"
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_DUMP_INTERVAL = 60.0
+SAMPLE_INTERVAL = 0.005      # Seconds between stack samples
+STAGE_REPORT_INTERVAL = 60.0 # Seconds between stage timer reports
+
+
+def profile_mode():
+    mode = os.environ.get(PROFILE_ENV, "").strip().lower()
+    if mode in ("", "0", "off", "false", "no"):
+        return None
+    if mode in ("1", "on", "true", "yes", "cprofile"):
+        return "cprofile"
+    if mode == "sample":
+        return "sample"
+    print(f"Unknown {PROFILE_ENV} mode '{mode}', expected 'cprofile' or 'sample'. Profiling disabled.", file=sys.stderr)
+    return None
+
+
+class StageTimers:
+    """
+    Always-on per-stage timers: a perf_counter pair and a few additions per stage,
+    cheap enough to leave on in the Pi loops. Totals are kept for the whole run
+    and for the current report window.
+    """
+
+    def __init__(self, name, report_interval=STAGE_REPORT_INTERVAL):
+        self.name = name
+        self.report_interval = report_interval
+        self.totals = {}   # stage -> [count, total seconds, max seconds]
+        self.window = {}
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, duration):
+        with self._lock:
+            for table in (self.totals, self.window):
+                entry = table.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += duration
+                entry[2] = max(entry[2], duration)
+
+    def summary(self, window=False):
+        with self._lock:
+            table = self.window if window else self.totals
+            return {stage: {"count": count, "total_s": total, "mean_ms": 1000 * total / count, "max_ms": 1000 * peak}
+                    for stage, (count, total, peak) in table.items()}
+
+    def report(self, window=False):
+        stats = self.summary(window)
+        if not stats:
+            return f"[timers] {self.name}: no stages recorded"
+        parts = [f"{stage} {s['mean_ms']:.1f}ms avg / {s['max_ms']:.1f}ms max (x{s['count']})" for stage, s in stats.items()]
+        return f"[timers] {self.name}: " + ", ".join(parts)
+
+    def maybe_report(self, now=None):
+        now = time.monotonic() if now is None else now
+        if now - self._window_start < self.report_interval:
+            return
+        print(self.report(window=True))
+        with self._lock:
+            self.window = {}
+        self._window_start = now
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler: a daemon thread samples the stacks of all
+    threads (or only `thread_id`) every `interval` seconds and counts collapsed
+    stacks, rooted at the thread name, which can be fed to flamegraph.pl or
+    speedscope. Covers the voice pipeline workers and the asyncio engine's
+    threads as well as the loop that started it.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id   # None: every thread except the sampler
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames[self.thread_id]} if self.thread_id in frames else {}
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples.update(stacks)
+
+    def dump(self, path):
+        with self._lock:
+            samples = dict(self.samples)
+        with open(path, "w") as f:
+            for stack, count in sorted(samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+        return sum(samples.values())
+
+
+class ProfileSession:
+    """
+    Wraps a hot loop in a cProfile or sampling profiler session. The loop calls
+    maybe_dump() once per iteration; every dump_interval seconds the cumulative
+    stats are written to a new numbered file in out_dir, and once more on stop().
+    cProfile only sees the thread that started the session; "sample" also covers
+    the worker threads (voice pipeline, asyncio engine).
+    """
+
+    def __init__(self, name, mode, out_dir=None, dump_interval=None):
+        self.name = name
+        self.mode = mode
+        self.out_dir = out_dir or os.environ.get("PROFILE_DIR", DEFAULT_PROFILE_DIR)
+        self.dump_interval = dump_interval or float(os.environ.get("PROFILE_INTERVAL", DEFAULT_DUMP_INTERVAL))
+        self.dumps = 0
+        self._profiler = None
+        self._next_dump = 0.0
+
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        self._next_dump = time.monotonic() + self.dump_interval
+        print(f"Profiling {self.name} with {self.mode}; stats go to {os.path.abspath(self.out_dir)}")
+        return self
+
+    def maybe_dump(self):
+        if time.monotonic() >= self._next_dump:
+            self.dump()
+
+    def dump(self):
+        # Writes the stats so far and keeps profiling
+        if self._profiler is None:
+            return None
+        if self.mode == "cprofile":
+            self._profiler.disable()
+            path = self._write_stats()
+            self._profiler.enable()
+        else:
+            path = self._write_stats()
+        self._next_dump = time.monotonic() + self.dump_interval
+        return path
+
+    def _write_stats(self):
+        # Writes the stats to the next numbered file; the profiler is left as it is (running or stopped)
+        self.dumps += 1
+        suffix = "prof" if self.mode == "cprofile" else "folded"
+        path = os.path.join(self.out_dir, f"{self.name}-{os.getpid()}-{self.dumps:03d}.{suffix}")
+        if self.mode == "cprofile":
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.dump(path)
+        print(f"Profile stats for {self.name} written to {path}")
+        return path
+
+    def stop(self):
+        if self._profiler is None:
+            return
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        self._write_stats()
+        self._profiler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+class NullProfileSession:
+    # Stand-in when profiling is off, so the loops call the same methods either way
+    def start(self):
+        return self
+
+    def maybe_dump(self):
+        pass
+
+    def dump(self):
+        return None
+
+    def stop(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def start_profile_session(name):
+    mode = profile_mode()
+    if mode is None:
+        return NullProfileSession()
+    return ProfileSession(name, mode).start()
@@ -0,0 +1,252 @@
+import multiprocessing
+import queue as queue_module
+import sys
+import threading
+import time
+from collections import Counter
+
+import paho.mqtt.client as mqtt
+
+from common.mqtt5 import MQTT5Publisher, protocol_for
+from common.mqtt_connect import BrokerConnector
+from common.outbox import Outbox, expiry_for
+from common.profiling import StageTimers
+from common.state_cache import DeviceStateCache, SUPPRESS_WINDOW
+
+# Broker for the shared publisher (same broker and credentials the gesture control uses)
+PUBLISHER_BROKER = "mqtt.localhost"
+PUBLISHER_PORT = 1883
+PUBLISHER_USERNAME = "admin"
+PUBLISHER_PASSWORD = "1234"
+PUBLISHER_CLIENT_ID = "smart-home-publisher"
+PUBLISHER_FALLBACK_BROKERS = [("localhost", 1883)]  # Tried in order when the main broker is unreachable
+PUBLISHER_MQTT_V5 = False    # MQTT v5: per-command message expiry and topic aliases for the command topic
+PUBLISHER_OUTBOX = False     # Keep commands in the on-disk outbox while the broker is unreachable (late actuation)
+
+QUEUE_MAX_SIZE = 1000        # Commands waiting for the publisher before producers get an error
+STATS_INTERVAL = 30.0        # Seconds between queue depth / latency reports
+
+
+class QueuedMessageInfo:
+    """Result of QueuePublisher.publish, readable like paho's MQTTMessageInfo (.rc or result[0])."""
+
+    def __init__(self, rc, mid=0):
+        self.rc = rc
+        self.mid = mid
+
+    def __getitem__(self, index):
+        return (self.rc, self.mid)[index]
+
+    def is_published(self):
+        return self.rc == mqtt.MQTT_ERR_SUCCESS
+
+
+class QueuePublisher:
+    """
+    Handle the control processes use in place of their own paho client when a
+    PublisherService is running. publish() only puts the message on the shared
+    queue; connection state is read from the flag the service keeps up to date.
+    The loop/disconnect methods are no-ops because the service owns the connection.
+    """
+
+    def __init__(self, queue, connected, source):
+        self.queue = queue
+        self.connected = connected
+        self.source = source
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        try:
+            self.queue.put_nowait((self.source, topic, payload, qos, retain, time.monotonic()))
+        except queue_module.Full:
+            print(f"Publisher queue full, dropping message for {topic}", file=sys.stderr)
+            return QueuedMessageInfo(mqtt.MQTT_ERR_QUEUE_SIZE)
+        return QueuedMessageInfo(mqtt.MQTT_ERR_SUCCESS)
+
+    def is_connected(self):
+        return bool(self.connected.value)
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+def create_publisher_channel(max_size=QUEUE_MAX_SIZE):
+    # Queue and connection flag shared by the service and every QueuePublisher
+    return multiprocessing.Queue(max_size), multiprocessing.Value('b', 0)
+
+
+class PublisherService:
+    """
+    Holds the single broker connection in combined gesture+voice mode and publishes
+    everything the control processes put on the queue. Reports queue depth, the
+    time messages waited in the queue, and the time until paho confirmed the publish.
+    """
+
+    def __init__(self, queue, connected, broker=PUBLISHER_BROKER, port=PUBLISHER_PORT,
+                 username=PUBLISHER_USERNAME, password=PUBLISHER_PASSWORD, stats_interval=STATS_INTERVAL,
+                 outbox=None, state_cache=None, fallback_brokers=PUBLISHER_FALLBACK_BROKERS,
+                 mqtt_v5=PUBLISHER_MQTT_V5):
+        self.queue = queue
+        self.connected = connected
+        self.broker = broker
+        self.port = port
+        self.fallback_brokers = fallback_brokers
+        self.username = username
+        self.password = password
+        self.stats_interval = stats_interval
+        self.outbox = outbox         # Commands that could not be published are kept here
+        self.state_cache = state_cache  # Drops repeats from either source for devices already in that state
+        self.mqtt5 = MQTT5Publisher() if mqtt_v5 else None
+
+        self.client = None
+        self.connector = None
+        self.published = Counter()   # Per source
+        self.failed = 0
+        self.timers = StageTimers("publisher", report_interval=stats_interval)
+        self.max_depth = 0
+        self._pending_acks = {}      # mid -> enqueue time
+        self._early_acks = {}        # mid -> ack time, when paho confirms before publish() returned
+        self._lock = threading.Lock()
+        self._next_stats = time.monotonic() + stats_interval
+
+    def _create_client(self):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=PUBLISHER_CLIENT_ID,
+                             protocol=protocol_for(self.mqtt5 is not None))
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        if self.username:
+            client.username_pw_set(username=self.username, password=self.password)
+        return client
+
+    # --- MQTT callbacks ---
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            print(f"Publisher service connected to MQTT broker {client.host}:{client.port}")
+            if self.mqtt5 is not None:
+                self.mqtt5.on_connect(properties)
+            self.connected.value = 1
+            self._drain_outbox()
+        else:
+            print(f"Publisher service failed to connect, reason code {reason_code}")
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.connected.value = 0
+        print(f"Publisher service disconnected (reason code {reason_code})")
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        now = time.monotonic()
+        with self._lock:
+            enqueued = self._pending_acks.pop(mid, None)
+            if enqueued is None:
+                self._early_acks[mid] = now
+        if enqueued is not None:
+            self.timers.add("ack", now - enqueued)
+
+    # --- Queue handling ---
+    def queue_depth(self):
+        try:
+            return self.queue.qsize()
+        except NotImplementedError:  # multiprocessing.Queue.qsize is not available on macOS
+            return -1
+
+    def handle(self, item):
+        source, topic, payload, qos, retain, enqueued = item
+        self.timers.add("queue", time.monotonic() - enqueued)
+        if self.state_cache is not None and self.state_cache.should_suppress(payload, topic=topic):
+            return
+        if self.mqtt5 is not None:
+            result = self.mqtt5.publish(self.client, topic, payload, qos=qos, retain=retain, expiry=expiry_for(payload))
+        else:
+            result = self.client.publish(topic, payload, qos=qos, retain=retain)
+        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+            self.published[source] += 1
+            if self.state_cache is not None:
+                self.state_cache.record(payload, topic=topic)
+            with self._lock:
+                acked = self._early_acks.pop(result.mid, None)
+                if acked is None:
+                    self._pending_acks[result.mid] = enqueued
+            if acked is not None:
+                self.timers.add("ack", acked - enqueued)
+        else:
+            self.failed += 1
+            print(f"Publisher service failed to send {source} message to {topic} (Error code: {result.rc})",
+                  file=sys.stderr)
+            if self.outbox is not None:
+                self.outbox.add(topic, payload, qos=qos, retain=retain, expiry=expiry_for(payload), source=source)
+
+    def _drain_outbox(self):
+        # Commands stored by this service or by a producer that saw the broker down
+        if self.outbox is not None and self.connected.value and self.outbox.has_pending():
+            self.outbox.drain_to(self.client, self.mqtt5)
+
+    def stats(self):
+        timings = self.timers.summary()
+        return {
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_depth,
+            "published": dict(self.published),
+            "failed": self.failed,
+            "suppressed": sum(self.state_cache.suppressed.values()) if self.state_cache is not None else 0,
+            "queue_ms": timings.get("queue", {}).get("mean_ms", 0.0),
+            "ack_ms": timings.get("ack", {}).get("mean_ms", 0.0),
+        }
+
+    def report(self):
+        sources = ", ".join(f"{source} {count}" for source, count in self.published.items()) or "none"
+        return (f"[publisher] queue depth {self.queue_depth()} (max {self.max_depth}), "
+                f"published {sum(self.published.values())} ({sources}), failed {self.failed}")
+
+    def _maybe_report(self):
+        now = time.monotonic()
+        if now >= self._next_stats:
+            print(self.report())
+            self._next_stats = now + self.stats_interval
+        self.timers.maybe_report(now)
+
+    def run(self):
+        self.client = self._create_client()
+        # Connect in the background; producers see connected=0 (and use the outbox) until it is up
+        self.connector = BrokerConnector(self.client, [(self.broker, self.port)] + list(self.fallback_brokers),
+                                         name="publisher")
+        self.connector.start()
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=1.0)
+                except queue_module.Empty:
+                    self._drain_outbox()
+                    self._maybe_report()
+                    continue
+                if item is None:  # Shutdown sentinel
+                    break
+                self.max_depth = max(self.max_depth, self.queue_depth() + 1)
+                self.handle(item)
+                self._maybe_report()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print(self.report())
+            print(self.timers.report())
+            if self.outbox is not None:
+                print(self.outbox.report())
+            if self.state_cache is not None and self.state_cache.enabled:
+                print(self.state_cache.report())
+            if self.mqtt5 is not None:
+                print(self.mqtt5.report())
+            self.connected.value = 0
+            self.connector.stop()
+            self.client.loop_stop()
+            self.client.disconnect()
+            print("Publisher service stopped.")
+
+
+def run_publisher_service(queue, connected):
+    outbox = Outbox() if PUBLISHER_OUTBOX else None
+    PublisherService(queue, connected, outbox=outbox, state_cache=DeviceStateCache(SUPPRESS_WINDOW)).run()
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import Counter
+
+from common.outbox import expiry_for
+
+# Token buckets for command publishes: (commands per second, burst). A rate of 0 disables the bucket.
+DEVICE_RATE_LIMIT = (1.0, 3)     # Per device name
+SOURCE_RATE_LIMIT = (5.0, 10)    # Per publisher process (gesture, voice)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` stored."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def available(self, now):
+        self.refill(now)
+        return self.tokens >= 1.0
+
+    def take(self, now):
+        if not self.available(now):
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class RateLimiter:
+    """
+    Token-bucket limits per device and for the whole publisher.
+
+    allow() takes a token from the device bucket and the source bucket, or keeps
+    the command as the device's deferred command. A later command for the same
+    device replaces it (coalescing: a burst of "on"/"off" toggles ends in the
+    last one), so at most one command per device ever waits. release() hands
+    back the deferred commands whose buckets have refilled; it is called from
+    the capture loop, and deferred commands past their validity (see
+    outbox.expiry_for) are dropped instead.
+    """
+
+    def __init__(self, source, device_limit=DEVICE_RATE_LIMIT, source_limit=SOURCE_RATE_LIMIT):
+        self.source = source
+        self.device_limit = device_limit
+        self.source_limit = source_limit
+        self._source_bucket = TokenBucket(*source_limit) if source_limit[0] > 0 else None
+        self._device_buckets = {}    # device name -> TokenBucket
+        self._deferred = {}          # device name -> (topic, message, deferred at)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = Counter()     # Per device: commands over the limit
+        self.coalesced = 0           # Deferred commands replaced by a newer one for the device
+        self.released = 0
+        self.expired = 0
+
+    @property
+    def enabled(self):
+        return self._source_bucket is not None or self.device_limit[0] > 0
+
+    def _buckets(self, name, now):
+        buckets = [self._source_bucket] if self._source_bucket is not None else []
+        if self.device_limit[0] > 0:
+            bucket = self._device_buckets.get(name)
+            if bucket is None:
+                bucket = self._device_buckets[name] = TokenBucket(*self.device_limit, now=now)
+            buckets.append(bucket)
+        return buckets
+
+    def _take(self, name, now):
+        buckets = self._buckets(name, now)
+        if not all(bucket.available(now) for bucket in buckets):
+            return False
+        for bucket in buckets:
+            bucket.take(now)
+        return True
+
+    def allow(self, topic, message, now=None):
+        # True: publish now. False: over the limit, kept as the device's deferred command.
+        now = time.monotonic() if now is None else now
+        name = message.get("name", "")
+        with self._lock:
+            if self._take(name, now):
+                if self._deferred.pop(name, None) is not None:
+                    self.coalesced += 1  # The newer command makes the deferred one obsolete
+                self.allowed += 1
+                return True
+            self.limited[name] += 1
+            if name in self._deferred:
+                self.coalesced += 1
+            self._deferred[name] = (topic, message, now)
+            return False
+
+    def release(self, now=None):
+        # [(topic, message)] of deferred commands that may be published now
+        now = time.monotonic() if now is None else now
+        ready = []
+        with self._lock:
+            for name, (topic, message, deferred_at) in list(self._deferred.items()):
+                if now - deferred_at >= expiry_for(message):
+                    del self._deferred[name]
+                    self.expired += 1
+                elif self._take(name, now):
+                    del self._deferred[name]
+                    self.released += 1
+                    ready.append((topic, message))
+        return ready
+
+    @property
+    def deferred(self):
+        with self._lock:
+            return len(self._deferred)
+
+    def report(self):
+        devices = ", ".join(f"{name} {count}" for name, count in self.limited.most_common()) or "none"
+        return (f"[rate limit] {self.source}: allowed {self.allowed}, limited {sum(self.limited.values())} "
+                f"({devices}), coalesced {self.coalesced}, released {self.released}, "
+                f"expired {self.expired}, deferred {self.deferred}")
@@ -0,0 +1,78 @@
+import time
+from collections import Counter
+
+from common.payloads import decode_payload
+
+# Seconds a repeated command for a device already in that state is suppressed (0 = off)
+SUPPRESS_WINDOW = 0.0
+
+
+class DeviceStateCache:
+    """
+    Last known state per device `name`, used to drop repeated commands such as a
+    second "LIGHTS ALL ON" while the lights are already on.
+
+    A state is recorded when a command was handed to the broker (or confirmed by
+    the device, when confirmations are available). A command is suppressed when
+    it asks for the recorded state of the same device within `window` seconds.
+    A caller that sees each command once per topic it is routed to (the
+    publisher service: device topic plus legacy mirror) passes `topic`, so the
+    state is kept per (topic, name) and the mirrored copy is not a repeat.
+    """
+
+    def __init__(self, window=SUPPRESS_WINDOW):
+        self.window = window
+        self._states = {}            # name, or (topic, name) -> (state, monotonic time recorded)
+        self.suppressed = Counter()  # Per device
+        self.passed = 0
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    @staticmethod
+    def command_of(message):
+        # (name, state) of a command dict or its JSON / MessagePack payload, or None
+        if isinstance(message, (str, bytes)):
+            try:
+                message = decode_payload(message)
+            except ValueError:
+                return None
+        if isinstance(message, dict) and "name" in message and "state" in message:
+            return message["name"], message["state"]
+        return None
+
+    def should_suppress(self, message, now=None, topic=None):
+        if not self.enabled:
+            return False
+        command = self.command_of(message)
+        if command is None:
+            return False
+        name, state = command
+        now = time.monotonic() if now is None else now
+        known = self._states.get(name if topic is None else (topic, name))
+        if known and known[0] == state and now - known[1] < self.window:
+            self.suppressed[name] += 1
+            return True
+        self.passed += 1
+        return False
+
+    def record(self, message, now=None, topic=None):
+        command = self.command_of(message)
+        if command is not None:
+            key = command[0] if topic is None else (topic, command[0])
+            self._states[key] = (command[1], time.monotonic() if now is None else now)
+
+    def invalidate(self, name):
+        # Forget a device on every topic, e.g. when it reports a state change made elsewhere
+        for key in [key for key in self._states if key == name or (isinstance(key, tuple) and key[1] == name)]:
+            del self._states[key]
+
+    def state(self, name):
+        known = self._states.get(name)
+        return known[0] if known else None
+
+    def report(self):
+        devices = ", ".join(f"{name} {count}" for name, count in self.suppressed.most_common()) or "none"
+        return (f"[state cache] window {self.window:.1f}s; suppressed {sum(self.suppressed.values())} "
+                f"({devices}), passed {self.passed}")
@@ -0,0 +1,80 @@
+import re
+
+# Routing of command publishes: "legacy" sends every command to the single control
+# topic; "device" sends it to home/<device>/set (plus the control topic as a mirror)
+ROUTING_LEGACY = "legacy"
+ROUTING_DEVICE = "device"
+TOPIC_ROUTING = ROUTING_LEGACY
+TOPIC_PREFIX = "home"
+MIRROR_LEGACY_TOPIC = True   # In "device" mode, also publish to the legacy control topic
+COMMAND_SUFFIX = "set"       # home/<device>/set carries commands
+STATE_SUFFIX = "state"       # home/<device>/state carries the state a device reports
+
+
+def device_id(name):
+    # Topic level for a device name: "Front Door" -> "front_door", "CMD_LIGHT_ALL" -> "light_all"
+    slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+    if slug.startswith("cmd_") and len(slug) > 4:
+        slug = slug[4:]
+    return slug or "unknown"
+
+
+def device_topic(name, prefix=TOPIC_PREFIX, suffix=COMMAND_SUFFIX):
+    return f"{prefix}/{device_id(name)}/{suffix}"
+
+
+def device_subscriptions(devices=(), prefix=TOPIC_PREFIX, suffix=COMMAND_SUFFIX):
+    # Topic filters for a consumer of the given device names (all devices when empty)
+    if not devices:
+        return [f"{prefix}/+/{suffix}"]
+    return [device_topic(name, prefix, suffix) for name in devices]
+
+
+def topic_device_id(topic, prefix=TOPIC_PREFIX):
+    # Device level of a home/<device>/<suffix> topic, or None for other topics
+    levels = topic.split("/")
+    if len(levels) == 3 and levels[0] == prefix:
+        return levels[1]
+    return None
+
+
+class TopicRouter:
+    """
+    Maps a command to the topics it is published on.
+
+    In "device" mode a command for device X goes to home/<x>/set, so a consumer
+    subscribes to its own devices and the broker drops everything else; with
+    mirror_legacy the command is also sent to the topic the caller passed (the
+    legacy control topic) for subscribers that still listen there. The device
+    topics of the command table are derived once at startup.
+    """
+
+    def __init__(self, mode=TOPIC_ROUTING, commands=(), prefix=TOPIC_PREFIX, mirror_legacy=MIRROR_LEGACY_TOPIC):
+        if mode not in (ROUTING_LEGACY, ROUTING_DEVICE):
+            raise ValueError(f"Unknown topic routing mode: {mode}")
+        self.mode = mode
+        self.prefix = prefix
+        self.mirror_legacy = mirror_legacy
+        self._topics = {}            # device name -> device topic
+        for name, _ in commands:
+            self.add(name)
+
+    @property
+    def enabled(self):
+        return self.mode == ROUTING_DEVICE
+
+    def add(self, name):
+        self._topics[name] = device_topic(name, self.prefix)
+
+    def device_topics(self):
+        return list(dict.fromkeys(self._topics.values()))
+
+    def topics(self, topic, message_dict):
+        # Topics to publish message_dict on; `topic` is the legacy control topic
+        name = message_dict.get("name")
+        if not self.enabled or not isinstance(name, str):
+            return (topic,)
+        device = self._topics.get(name)
+        if device is None:
+            device = self._topics[name] = device_topic(name, self.prefix)
+        return (device, topic) if self.mirror_legacy else (device,)
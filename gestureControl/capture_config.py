@@ -0,0 +1,211 @@
+import time
+from dataclasses import dataclass, replace
+
+import cv2
+
+# Camera capture configuration for the gesture engine
+CAMERA_INDEX = 0
+CAPTURE_BACKEND = "any"    # "any", "v4l2" (Linux/Pi) or "gstreamer"
+CAPTURE_FOURCC = "MJPG"    # None keeps the driver default (often YUYV, which limits FPS over USB)
+CAPTURE_WIDTH = 640
+CAPTURE_HEIGHT = 480
+CAPTURE_FPS = 30
+CAPTURE_BUFFER_SIZE = 1    # Frames queued by the driver; 1 means we always read a fresh frame
+
+BACKENDS = {
+    "any": cv2.CAP_ANY,
+    "v4l2": cv2.CAP_V4L2,
+    "gstreamer": cv2.CAP_GSTREAMER,
+}
+
+
+@dataclass(frozen=True)
+class CaptureSettings:
+    camera_index: int = CAMERA_INDEX
+    backend: str = CAPTURE_BACKEND
+    fourcc: str = CAPTURE_FOURCC
+    width: int = CAPTURE_WIDTH
+    height: int = CAPTURE_HEIGHT
+    fps: int = CAPTURE_FPS
+    buffer_size: int = CAPTURE_BUFFER_SIZE
+
+    def describe(self):
+        return (f"{self.backend} {self.fourcc or 'default'} {self.width}x{self.height}"
+                f"@{self.fps} buffer={self.buffer_size or 'default'}")
+
+
+def decode_fourcc(value):
+    value = int(value)
+    return "".join(chr((value >> 8 * i) & 0xFF) for i in range(4))
+
+
+def gstreamer_pipeline(settings):
+    # Decode MJPG in the pipeline and let appsink drop stale frames instead of queueing them
+    device = f"/dev/video{settings.camera_index}"
+    if settings.fourcc == "MJPG":
+        source = (f"image/jpeg,width={settings.width},height={settings.height},framerate={settings.fps}/1 "
+                  f"! jpegdec")
+    else:
+        source = f"video/x-raw,width={settings.width},height={settings.height},framerate={settings.fps}/1"
+    return (f"v4l2src device={device} ! {source} ! videoconvert ! video/x-raw,format=BGR "
+            f"! appsink drop=true max-buffers={max(1, settings.buffer_size)} sync=false")
+
+
+def open_capture(settings=None):
+    """
+    Opens the camera with the given CaptureSettings (module defaults if None).
+    Properties the driver refuses are reported and otherwise ignored.
+    """
+    settings = settings or CaptureSettings()
+    if settings.backend not in BACKENDS:
+        raise ValueError(f"Unknown capture backend '{settings.backend}', expected one of {list(BACKENDS)}")
+
+    if settings.backend == "gstreamer":
+        # Format, size and buffering are part of the pipeline itself
+        return cv2.VideoCapture(gstreamer_pipeline(settings), cv2.CAP_GSTREAMER)
+
+    cap = cv2.VideoCapture(settings.camera_index, BACKENDS[settings.backend])
+    requested = []
+    # FOURCC has to be set before the resolution for most UVC drivers
+    if settings.fourcc:
+        requested.append((cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*settings.fourcc), "FOURCC"))
+    if settings.width and settings.height:
+        requested.append((cv2.CAP_PROP_FRAME_WIDTH, settings.width, "width"))
+        requested.append((cv2.CAP_PROP_FRAME_HEIGHT, settings.height, "height"))
+    if settings.fps:
+        requested.append((cv2.CAP_PROP_FPS, settings.fps, "FPS"))
+    if settings.buffer_size:
+        requested.append((cv2.CAP_PROP_BUFFERSIZE, settings.buffer_size, "buffer size"))
+
+    for prop, value, label in requested:
+        if not cap.set(prop, value):
+            print(f"Camera refused {label}={value} ({settings.backend})")
+    return cap
+
+
+def applied_settings(cap):
+    # What the driver actually gave us, which can differ from what was requested
+    return {
+        "fourcc": decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": float(cap.get(cv2.CAP_PROP_FPS)),
+        "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def probe_capture(settings, frames=60, idle_checks=5):
+    """
+    Measures one capture configuration: time to open, latency of the first frame,
+    per-read latency, throughput, and how many reads after an idle pause returned
+    a frame that was already sitting in the driver buffer (i.e. a stale frame).
+    """
+    result = {"settings": settings, "ok": False}
+    start = time.perf_counter()
+    cap = open_capture(settings)
+    try:
+        if not cap.isOpened():
+            result["error"] = "could not open camera"
+            return result
+        result["open_ms"] = (time.perf_counter() - start) * 1000
+
+        success, _ = cap.read()
+        if not success:
+            result["error"] = "no frames"
+            return result
+        result["first_frame_ms"] = (time.perf_counter() - start) * 1000
+        result["applied"] = applied_settings(cap)
+
+        read_times = []
+        loop_start = time.perf_counter()
+        for _ in range(frames):
+            read_start = time.perf_counter()
+            success, _ = cap.read()
+            if not success:
+                break
+            read_times.append(time.perf_counter() - read_start)
+        elapsed = time.perf_counter() - loop_start
+        if not read_times:
+            result["error"] = "frames stopped"
+            return result
+
+        # After idling for a few frame periods a fresh frame takes about a frame period to
+        # arrive; a read that returns almost immediately came out of the driver buffer.
+        frame_period = 1.0 / settings.fps if settings.fps else 1.0 / 30
+        stale_reads = 0
+        for _ in range(idle_checks):
+            time.sleep(frame_period * 3)
+            read_start = time.perf_counter()
+            cap.read()
+            if time.perf_counter() - read_start < frame_period * 0.25:
+                stale_reads += 1
+
+        result.update({
+            "ok": True,
+            "frames": len(read_times),
+            "fps": len(read_times) / elapsed if elapsed > 0 else 0.0,
+            "read_mean_ms": 1000 * sum(read_times) / len(read_times),
+            "read_p95_ms": 1000 * _percentile(read_times, 0.95),
+            "stale_reads": stale_reads,
+            "idle_checks": idle_checks,
+        })
+        return result
+    finally:
+        cap.release()
+
+
+def candidate_settings(base=None):
+    # Default driver format and buffering vs. the low-latency variants, on each backend
+    base = base or CaptureSettings()
+    candidates = []
+    for backend in ("v4l2", "gstreamer"):
+        for fourcc in (None, "MJPG"):
+            for buffer_size in (0, 1):
+                if backend == "gstreamer" and buffer_size == 0:
+                    continue
+                candidates.append(replace(base, backend=backend, fourcc=fourcc, buffer_size=buffer_size))
+    return candidates
+
+
+def probe_settings(candidates, frames=60):
+    results = []
+    for settings in candidates:
+        print(f"Probing capture settings: {settings.describe()}...")
+        try:
+            results.append(probe_capture(settings, frames=frames))
+        except Exception as e:
+            results.append({"settings": settings, "ok": False, "error": str(e)})
+    return results
+
+
+def best_settings(results):
+    # Prefer no stale frames, then throughput, then the lowest read latency
+    usable = [r for r in results if r["ok"]]
+    if not usable:
+        return None
+    best = min(usable, key=lambda r: (r["stale_reads"], -round(r["fps"]), r["read_mean_ms"]))
+    return best["settings"]
+
+
+def format_probe_results(results):
+    lines = [f"{'settings':<42} {'first':>8} {'fps':>6} {'read':>8} {'p95':>8} {'stale':>6}"]
+    for r in results:
+        name = r["settings"].describe()
+        if not r["ok"]:
+            lines.append(f"{name:<42} failed: {r.get('error', 'unknown error')}")
+            continue
+        lines.append(f"{name:<42} {r['first_frame_ms']:>6.0f}ms {r['fps']:>6.1f} {r['read_mean_ms']:>6.1f}ms "
+                     f"{r['read_p95_ms']:>6.1f}ms {r['stale_reads']:>3}/{r['idle_checks']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    probe_results = probe_settings(candidate_settings())
+    print(format_probe_results(probe_results))
+    chosen = best_settings(probe_results)
+    print(f"Best capture settings: {chosen.describe() if chosen else 'none (camera not available)'}")
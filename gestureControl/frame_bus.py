@@ -0,0 +1,217 @@
+import time
+import uuid
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from gestureControl.capture_config import CaptureSettings, open_capture
+
+# Frame bus defaults
+FRAME_BUS_SLOTS = 4          # Ring size; a reader has this many frame periods before its frame is reused
+FRAME_BUS_POLL_INTERVAL = 0.002
+FRAME_BUS_STARTUP_TIMEOUT = 30.0  # Seconds to wait for the first frame (capture process importing, camera opening)
+
+# Header layout (int64 fields at the start of the shared memory block)
+_MAGIC = 0x46524D42  # "FRMB"
+_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS, _H_LATEST, _H_CLOSED = range(7)
+_HEADER_FIELDS = 8
+
+
+def _open_shared_memory(name):
+    # Python 3.13+ can skip the resource tracker for readers; older versions share the
+    # tracker of the process that spawned them, which is fine for processes started by main.py
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameBus:
+    """
+    Ring of fixed-size frame slots in shared memory.
+
+    One capture process writes each camera frame into the next slot once; any number
+    of consumer processes attach by name and get read-only NumPy views of the slots,
+    so frames are never pickled or copied between processes. Each slot carries a
+    sequence number and a monotonic capture timestamp. A slot's sequence number is
+    zeroed while it is being rewritten, which lets readers detect (via is_current)
+    that the frame they hold has been overwritten.
+    """
+
+    def __init__(self, shm, owner=False):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if header[_H_MAGIC] != _MAGIC:
+            raise ValueError(f"Shared memory block '{shm.name}' is not a frame bus")
+        self._header = header
+        self.slots = int(header[_H_SLOTS])
+        self.frame_shape = (int(header[_H_HEIGHT]), int(header[_H_WIDTH]), int(header[_H_CHANNELS]))
+
+        offset = _HEADER_FIELDS * 8
+        self._slot_seq = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self.slots * 8
+        self._slot_time = np.ndarray((self.slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += self.slots * 8
+        self._frames = np.ndarray((self.slots,) + self.frame_shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    @classmethod
+    def create(cls, shape, slots=FRAME_BUS_SLOTS, name=None):
+        height, width, channels = shape
+        frame_bytes = height * width * channels
+        size = (_HEADER_FIELDS + 2 * slots) * 8 + slots * frame_bytes
+        shm = shared_memory.SharedMemory(name=name or f"framebus_{uuid.uuid4().hex[:8]}", create=True, size=size)
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_H_SLOTS] = slots
+        header[_H_HEIGHT], header[_H_WIDTH], header[_H_CHANNELS] = height, width, channels
+        header[_H_MAGIC] = _MAGIC
+        bus = cls(shm, owner=True)
+        bus._slot_seq[:] = 0
+        return bus
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_open_shared_memory(name))
+
+    # --- Writer side ---
+    def begin_write(self):
+        """Returns (seq, slot view) for the next frame; call commit(seq) once it is filled."""
+        seq = int(self._header[_H_LATEST]) + 1
+        slot = seq % self.slots
+        self._slot_seq[slot] = 0  # Mark the slot as being rewritten
+        return seq, self._frames[slot]
+
+    def commit(self, seq, timestamp=None):
+        slot = seq % self.slots
+        self._slot_time[slot] = time.monotonic() if timestamp is None else timestamp
+        self._slot_seq[slot] = seq
+        self._header[_H_LATEST] = seq
+
+    def write(self, frame, timestamp=None):
+        seq, target = self.begin_write()
+        if frame.shape != self.frame_shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match frame bus shape {self.frame_shape}")
+        np.copyto(target, frame)
+        self.commit(seq, timestamp)
+        return seq
+
+    def mark_closed(self):
+        self._header[_H_CLOSED] = 1
+
+    # --- Reader side ---
+    @property
+    def closed(self):
+        return bool(self._header[_H_CLOSED])
+
+    @property
+    def latest_seq(self):
+        return int(self._header[_H_LATEST])
+
+    def latest(self):
+        """Returns (seq, timestamp, read-only frame view) of the newest frame, or None."""
+        seq = self.latest_seq
+        if seq == 0:
+            return None
+        slot = seq % self.slots
+        timestamp = float(self._slot_time[slot])
+        if self._slot_seq[slot] != seq:
+            return None  # Overwritten between reading the header and the slot
+        view = self._frames[slot]
+        view.flags.writeable = False
+        return seq, timestamp, view
+
+    def read_after(self, seq, timeout=1.0):
+        """Waits for a frame newer than seq; returns (seq, timestamp, view) or None on timeout/close."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.latest_seq > seq:
+                frame = self.latest()
+                if frame is not None:
+                    return frame
+            if self.closed or time.monotonic() >= deadline:
+                return None
+            time.sleep(FRAME_BUS_POLL_INTERVAL)
+
+    def is_current(self, seq):
+        # False once the writer has started reusing the slot of this frame
+        return self._slot_seq[seq % self.slots] == seq
+
+    def close(self):
+        # Drop our views before closing the mapping, otherwise close() raises BufferError
+        self._header = self._slot_seq = self._slot_time = self._frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # A caller still holds a frame view; the mapping goes away with the process
+
+    def unlink(self):
+        if self.owner:
+            self._shm.unlink()
+
+
+class FrameBusCapture:
+    """
+    cv2.VideoCapture-like reader over a FrameBus, so the existing capture loops can
+    consume frames from the bus without changes. Frames are read-only views into
+    shared memory; the loops already produce a new image with cv2.flip before drawing.
+    Until the first frame arrives read() waits up to `startup_timeout` instead of
+    `timeout`, since the capture process is still starting up and opening the camera.
+    """
+
+    def __init__(self, bus, timeout=1.0, startup_timeout=FRAME_BUS_STARTUP_TIMEOUT):
+        self.bus = bus
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.last_seq = 0
+        self.last_timestamp = None
+        self._released = False
+
+    def isOpened(self):
+        return not self._released and not self.bus.closed
+
+    def read(self):
+        frame = self.bus.read_after(self.last_seq, self.timeout if self.last_seq else self.startup_timeout)
+        if frame is None:
+            return False, None
+        self.last_seq, self.last_timestamp, view = frame
+        return True, view
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.bus.close()
+
+
+def run_capture_process(bus_name, settings=None):
+    """
+    Capture loop for a dedicated camera process: decodes each frame straight into
+    the next bus slot when the driver allows it, otherwise copies it in once.
+    """
+    bus = FrameBus.attach(bus_name)
+    cap = open_capture(settings or CaptureSettings())
+    print(f"Frame bus capture started ({bus.name}, {bus.frame_shape[1]}x{bus.frame_shape[0]}, {bus.slots} slots)")
+    try:
+        while cap.isOpened():
+            seq, target = bus.begin_write()
+            success, frame = cap.read(target)
+            if not success:
+                print("Failed to read from webcam.")
+                break
+            timestamp = time.monotonic()
+            if frame is not target:
+                if frame.shape != bus.frame_shape:
+                    frame = cv2.resize(frame, (bus.frame_shape[1], bus.frame_shape[0]))
+                np.copyto(target, frame)
+            bus.commit(seq, timestamp)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.mark_closed()
+        cap.release()
+        bus.close()
+        print("Frame bus capture stopped.")
+
@@ -1,11 +1,32 @@
 import cv2
 import mediapipe as mp
 import numpy as np
+import os
+import sys
 import time
 import math
 import json
 import paho.mqtt.client as mqtt
 
+# Allow running this script directly from the gestureControl folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.ack_tracker import AckTracker, ACK_TIMEOUT, ACK_RETRIES
+from common.latency import LatencyTracer, GESTURE_STAGES
+from common.mqtt5 import MQTT5Publisher, protocol_for
+from common.mqtt_connect import BrokerConnector
+from common.outbox import Outbox, OutboxWriter, expiry_for
+from common.payloads import PayloadCache, ENCODING_JSON, describe_payload
+from common.profiling import StageTimers, start_profile_session
+from common.rate_limit import RateLimiter, DEVICE_RATE_LIMIT, SOURCE_RATE_LIMIT
+from common.state_cache import DeviceStateCache
+from common.topics import TopicRouter, ROUTING_LEGACY
+
+from gestureControl.capture_config import CaptureSettings, open_capture, candidate_settings, probe_settings, best_settings, format_probe_results
+from gestureControl.frame_bus import FrameBus, FrameBusCapture
+from gestureControl.inference_gate import InferenceGate
+from gestureControl.loop_watchdog import LoopWatchdog
+
 # Initialize MediaPipe
 mp_hands = mp.solutions.hands
 hands = mp_hands.Hands(
@@ -22,40 +43,120 @@ mqtt_port = 1883
 mqtt_topic = "central_main/control"  # Updated topic for central system
 mqtt_username = "admin"  # Added MQTT username
 mqtt_password = "1234"   # Added MQTT password
+mqtt_fallback_brokers = [("localhost", 1883)]  # Tried in order when the main broker is unreachable
+mqtt_use_v5 = False  # MQTT v5: per-command message expiry and a topic alias for mqtt_topic
+health_topic = "central_main/health/gesture"  # Loop watchdog status (retained)
+topic_routing = ROUTING_LEGACY  # "device": publish to home/<device>/set as well (see common/topics.py)
+topic_mirror_legacy = True  # In "device" routing, keep publishing to mqtt_topic for old subscribers
+payload_encoding = ENCODING_JSON  # "msgpack": compact MessagePack command payloads (see common/payloads.py)
 
 # Device configuration
 door_name = "Front Door"  # Name of the door to control
 
+# Hand inference during the command cooldown ("full", "skip" or "thin")
+cooldown_inference_mode = "full"
+cooldown_thin_stride = 3       # In "thin" mode, run inference on every 3rd cooldown frame
+cooldown_resume_margin = 0.3   # Seconds before the cooldown ends to resume full inference
+
+# Camera capture (defaults live in capture_config.py)
+capture_settings = CaptureSettings()
+capture_probe_on_startup = False  # Measure the candidate capture settings and use the fastest one
+
+# Keep commands issued while the broker is unreachable and send them on reconnect (opt-in: they are
+# actuated late, within outbox.EXPIRY_BY_STATE); the SQLite writes run off the frame loop
+outbox_enabled = False
+
+# Drop a repeated command for a device already in that state within this many seconds (0 = off)
+suppress_repeat_window = 0.0
+
+# Wait for devices to confirm commands on home/<device>/state, republish or report the unconfirmed ones
+ack_tracking_enabled = False
+ack_timeout = ACK_TIMEOUT
+ack_retries = ACK_RETRIES
+
+# Token-bucket limits (commands per second, burst) per device and for all gesture commands;
+# commands over the limit are coalesced to the latest per device and published when tokens refill
+rate_limit_per_device = DEVICE_RATE_LIMIT
+rate_limit_gesture = SOURCE_RATE_LIMIT
+
 # MQTT Callbacks
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
         print("Connected to MQTT Broker!")
+        if mqtt5 is not None:
+            mqtt5.on_connect(properties)
+        if ack_tracker is not None:
+            ack_tracker.subscribe(client)
+        if outbox is not None:
+            outbox.drain_to(client, mqtt5, ack_tracker.drained if ack_tracker is not None else None)
     else:
         print(f"Failed to connect, return code {rc}")
 
 def on_publish(client, userdata, mid, properties=None):
     print(f"Message {mid} published")
+    latency_tracer.acked(mid)
 
-# Set up MQTT client with the correct protocol version
-client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION1)
-client.on_connect = on_connect
-client.on_publish = on_publish
+# MQTT client, created in main() or handed in by the shared publisher service (main.py mode 3)
+client = None
+outbox = None  # Opened in main() when outbox_enabled
+state_cache = None  # Created in main()
+mqtt5 = None  # MQTT5Publisher when mqtt_use_v5 and main() created its own client
+ack_tracker = None  # AckTracker when ack_tracking_enabled and main() created its own client
+rate_limiter = None  # Created in main()
 
-# Set MQTT credentials
-client.username_pw_set(username=mqtt_username, password=mqtt_password)  # Added authentication
-
-client.connect(mqtt_broker, mqtt_port)
-client.loop_start()  # Start the background thread
+# Capture -> decision -> publish -> ack latency of every gesture command
+latency_tracer = LatencyTracer("gesture", GESTURE_STAGES)
+own_connection = True  # False when the publisher service acks our messages (no on_publish here)
 
 # MQTT Publish function
-def publish_message(topic, message_dict):
-    message_json = json.dumps(message_dict)
-    result = client.publish(topic, message_json)
-    status = result[0]
-    if status == 0:
-        print(f"Message sent to topic {topic}: {message_json}")
-    else:
-        print(f"Failed to send message to topic {topic}")
+def publish_message(topic, message_dict, trace=None, rate_limited=True):
+    payload = GESTURE_PAYLOADS.encode(message_dict)  # Pre-encoded bytes for the gesture commands
+    topics = GESTURE_TOPICS.topics(topic, message_dict)  # Device topic (and legacy mirror) in device routing
+    if state_cache is not None and state_cache.should_suppress(message_dict):
+        print(f"Suppressed repeated command for topic {topic}: {message_dict}")
+        return
+    if rate_limited and rate_limiter is not None and not rate_limiter.allow(topic, message_dict):
+        print(f"Rate limit reached, deferred command for topic {topic}: {message_dict}")
+        return
+    if outbox is not None and (not client.is_connected() or outbox.has_pending()):
+        # Queue behind older undelivered commands so the broker receives them in order
+        for send_topic in topics:
+            outbox.add(send_topic, payload, expiry=expiry_for(message_dict), source="gesture")
+            print(f"Message for topic {send_topic} kept in outbox: {describe_payload(payload)}")
+        if client.is_connected():
+            outbox.drain_to(client, mqtt5, ack_tracker.drained if ack_tracker is not None else None)
+        return
+    sent = False
+    for send_topic in topics:
+        if mqtt5 is not None:
+            result = mqtt5.publish(client, send_topic, payload, expiry=expiry_for(message_dict))
+        else:
+            result = client.publish(send_topic, payload)
+        if trace is not None and send_topic == topics[0]:
+            latency_tracer.published(trace, result, wait_for_ack=own_connection)
+        status = result[0]
+        if status == 0:
+            print(f"Message sent to topic {send_topic}: {describe_payload(payload)}")
+            if ack_tracker is not None:
+                ack_tracker.sent(message_dict, send_topic, payload)
+            sent = True
+        else:
+            print(f"Failed to send message to topic {send_topic}")
+            if outbox is not None:
+                outbox.add(send_topic, payload, expiry=expiry_for(message_dict), source="gesture")
+    if sent and state_cache is not None:
+        state_cache.record(message_dict)
+
+# Publish an unconfirmed command again (AckTracker retries)
+def republish(topic, payload):
+    if mqtt5 is not None:
+        return mqtt5.publish(client, topic, payload)
+    return client.publish(topic, payload)
+
+# Publish the loop watchdog status so a supervisor can see a stalled worker
+def publish_health(status):
+    if client is not None:
+        client.publish(health_topic, json.dumps(status), retain=True)
 
 # Gesture Detection Functions with debug information
 def calculate_distance(point1, point2):
@@ -258,29 +359,83 @@ def debug_finger_positions(hand_landmarks, image):
         cv2.putText(image, f"{finger}: {y_val:.2f}", 
                     (10, debug_y + 20 + i * 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
-def main(mqtt_client=None):
+# Gesture -> (action text, device name, state), checked in this order
+GESTURE_COMMANDS = [
+    (is_thumb_up, "UNLOCKING DOOR", door_name, "unlock"),
+    (is_thumb_down, "LOCKING DOOR", door_name, "lock"),
+    (is_open_palm, "SWITCHES ALL ON", "CMD_SWITCH_ALL", "on"),
+    (is_number_one, "SWITCHES ALL OFF", "CMD_SWITCH_ALL", "off"),
+    (is_number_two, "LIGHTS ALL ON", "CMD_LIGHT_ALL", "on"),
+    (is_rock_on, "LIGHTS ALL OFF", "CMD_LIGHT_ALL", "off"),
+]
+
+# MQTT payloads of the gesture commands, encoded once at startup
+GESTURE_PAYLOADS = PayloadCache(((name, state) for _, _, name, state in GESTURE_COMMANDS), encoding=payload_encoding)
+
+# Per-device topics of the gesture commands, derived once at startup
+GESTURE_TOPICS = TopicRouter(topic_routing, ((name, state) for _, _, name, state in GESTURE_COMMANDS),
+                             mirror_legacy=topic_mirror_legacy)
+
+def classify_gesture(hand_landmarks, image):
+    # Returns (action text, MQTT message) for the first matching gesture, or None
+    for detector, action_text, name, state in GESTURE_COMMANDS:
+        if detector(hand_landmarks, image):
+            return action_text, {"name": name, "state": state}
+    return None
+
+def open_webcam(settings):
+    if capture_probe_on_startup:
+        probe_results = probe_settings(candidate_settings(settings))
+        print(format_probe_results(probe_results))
+        settings = best_settings(probe_results) or settings
+    print(f"Opening camera: {settings.describe()}")
+    return open_capture(settings)
+
+def main(mqtt_client=None, frame_bus_name=None, health_value=None):
     # Use the provided MQTT client or create a new one
-    global client
+    global client, outbox, state_cache, mqtt5, own_connection, ack_tracker, rate_limiter
+    if outbox_enabled and outbox is None:
+        outbox = OutboxWriter(Outbox())
+    state_cache = DeviceStateCache(suppress_repeat_window)
+    rate_limiter = RateLimiter("gesture", rate_limit_per_device, rate_limit_gesture)
     if mqtt_client is None:
-        client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION1)
+        client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION1, protocol=protocol_for(mqtt_use_v5))
+        mqtt5 = MQTT5Publisher([mqtt_topic] + GESTURE_TOPICS.device_topics()) if mqtt_use_v5 else None
+        own_connection = True
+        ack_tracker = AckTracker(republish, ack_timeout, ack_retries, state_cache,
+                                 name="gesture ack") if ack_tracking_enabled else None
         client.on_connect = on_connect
         client.on_publish = on_publish
         
         # Set MQTT credentials
         client.username_pw_set(username=mqtt_username, password=mqtt_password)
         
-        client.connect(mqtt_broker, mqtt_port)
-        client.loop_start()  # Start the background thread
+        # Connect in the background (with backoff and broker failover) so the loop starts right away
+        connector = BrokerConnector(client, [(mqtt_broker, mqtt_port)] + mqtt_fallback_brokers, name="gesture")
+        connector.start()
     else:
+        connector = None
         client = mqtt_client
+        own_connection = False  # The publisher service acks our messages (no on_publish here)
+        ack_tracker = None  # The publisher service's connection does not subscribe to state topics
+        if outbox is not None and client.is_connected():
+            outbox.drain_to(client)
 
-    # Open webcam
-    cap = cv2.VideoCapture(0)
+    # Open webcam, or read frames from the shared frame bus of a capture process
+    if frame_bus_name:
+        print(f"Reading frames from frame bus {frame_bus_name}")
+        cap = FrameBusCapture(FrameBus.attach(frame_bus_name))
+    else:
+        cap = open_webcam(capture_settings)
     
     # Command cooldown to prevent multiple detections
     last_command_time = 0
     cooldown = 1.5  # seconds
     
+    # Skips or thins hand inference while the cooldown discards its results
+    inference_gate = InferenceGate(cooldown_inference_mode, cooldown_thin_stride, cooldown_resume_margin)
+    results = None
+    
     # For showing the action text
     action_text = ""
     text_display_end = 0
@@ -291,166 +446,164 @@ def main(mqtt_client=None):
     # MQTT connection status display
     mqtt_status = "Connecting to MQTT..."
     
+    # Per-stage heartbeats; logs a timing breakdown and reports "stalled" if a stage hangs
+    stage_timers = StageTimers("gesture")
+    watchdog = LoopWatchdog(on_health=publish_health, health_value=health_value, stage_timers=stage_timers)
+    watchdog.start()
+    
+    # cProfile / sampling profiler session when PROFILE is set (no-op otherwise)
+    profiler = start_profile_session("gesture")
+    
     while cap.isOpened():
-        success, image = cap.read()
-        if not success:
-            print("Failed to read from webcam.")
-            break
-        
-        # Flip the image horizontally for a selfie-view display
-        image = cv2.flip(image, 1)
+        with watchdog.stage("capture"):
+            success, image = cap.read()
+            if not success:
+                print("Failed to read from webcam.")
+                break
+            # Frame bus frames carry the capture process' monotonic timestamp; a camera frame counts from here
+            frame_time = cap.last_timestamp if isinstance(cap, FrameBusCapture) else time.monotonic()
+            
+            # Flip the image horizontally for a selfie-view display
+            image = cv2.flip(image, 1)
         
-        # Convert the BGR image to RGB
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = hands.process(rgb_image)
+        with watchdog.stage("inference"):
+            if inference_gate.should_infer(time.time(), last_command_time + cooldown):
+                # Convert the BGR image to RGB
+                rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                inference_start = time.perf_counter()
+                results = hands.process(rgb_image)
+                inference_gate.record_inference(time.perf_counter() - inference_start)
+            elif not inference_gate.reuse_results:
+                results = None
         
         # Current time for cooldown
         current_time = time.time()
+        command = None
+        trace = None
         
-        # Clear debug area
-        if debug_mode:
-            cv2.rectangle(image, (5, 100), (500, 480), (0, 0, 0), -1)
-        
-        # Draw hand landmarks
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                mp_drawing.draw_landmarks(
-                    image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-                
-                # Display debug info for finger positions
-                if debug_mode:
-                    debug_finger_positions(hand_landmarks, image)
-                
-                # Gesture recognition
-                if current_time - last_command_time > cooldown:
-                    # Check gestures with debug info
-                    if is_thumb_up(hand_landmarks, image):
-                        action_text = "UNLOCKING DOOR"
-                        text_display_end = current_time + 2
-                        last_command_time = current_time
-                        
-                        # Send MQTT message for door unlock
-                        mqtt_message = {
-                            "name": door_name,
-                            "state": "unlock"
-                        }
-                        publish_message(mqtt_topic, mqtt_message)
-                        
-                    elif is_thumb_down(hand_landmarks, image):
-                        action_text = "LOCKING DOOR"
-                        text_display_end = current_time + 2
-                        last_command_time = current_time
-                        
-                        # Send MQTT message for door lock
-                        mqtt_message = {
-                            "name": door_name,
-                            "state": "lock"
-                        }
-                        publish_message(mqtt_topic, mqtt_message)
+        with watchdog.stage("classification"):
+            # Clear debug area
+            if debug_mode:
+                cv2.rectangle(image, (5, 100), (500, 480), (0, 0, 0), -1)
+            
+            # Draw hand landmarks
+            if results and results.multi_hand_landmarks:
+                for hand_landmarks in results.multi_hand_landmarks:
+                    mp_drawing.draw_landmarks(
+                        image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
                     
-                    # New gestures for switch and light control
-                    elif is_open_palm(hand_landmarks, image):
-                        action_text = "SWITCHES ALL ON"
-                        text_display_end = current_time + 2
-                        last_command_time = current_time
-                        
-                        # Send MQTT message for all switches on
-                        mqtt_message = {
-                            "name": "CMD_SWITCH_ALL",
-                            "state": "on"
-                        }
-                        publish_message(mqtt_topic, mqtt_message)
-                        
-                    elif is_number_one(hand_landmarks, image):
-                        action_text = "SWITCHES ALL OFF"
-                        text_display_end = current_time + 2
-                        last_command_time = current_time
-                        
-                        # Send MQTT message for all switches off
-                        mqtt_message = {
-                            "name": "CMD_SWITCH_ALL",
-                            "state": "off"
-                        }
-                        publish_message(mqtt_topic, mqtt_message)
-                        
-                    elif is_number_two(hand_landmarks, image):
-                        action_text = "LIGHTS ALL ON"
-                        text_display_end = current_time + 2
-                        last_command_time = current_time
-                        
-                        # Send MQTT message for all lights on
-                        mqtt_message = {
-                            "name": "CMD_LIGHT_ALL",
-                            "state": "on"
-                        }
-                        publish_message(mqtt_topic, mqtt_message)
-                        
-                    elif is_rock_on(hand_landmarks, image):
-                        action_text = "LIGHTS ALL OFF"
-                        text_display_end = current_time + 2
-                        last_command_time = current_time
-                        
-                        # Send MQTT message for all lights off
-                        mqtt_message = {
-                            "name": "CMD_LIGHT_ALL",
-                            "state": "off"
-                        }
-                        publish_message(mqtt_topic, mqtt_message)
-        
-        # Display action text if within display time
-        if current_time < text_display_end:
-            # Draw a background for better visibility
-            cv2.rectangle(image, (40, 30), (400, 70), (0, 0, 0), -1)
-            cv2.putText(image, action_text, (50, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        # Show command cooldown timer
-        if current_time - last_command_time < cooldown:
-            countdown = int(cooldown - (current_time - last_command_time)) + 1
-            cv2.putText(image, f"Cooldown: {countdown}s", (image.shape[1] - 200, 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        
-        # Display MQTT status
-        if client.is_connected():
-            mqtt_status = "Connected"
-        else:
-            mqtt_status = "Disconnected"
-        cv2.putText(image, f"MQTT: {mqtt_status} (mqtt.local:1883)", (10, 30), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        
-        # Display debug toggle instruction
-        cv2.putText(image, "Press 'D' to toggle debug info", (image.shape[1] - 250, 60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                    # Display debug info for finger positions
+                    if debug_mode:
+                        debug_finger_positions(hand_landmarks, image)
+                    
+                    # Gesture recognition
+                    if current_time - last_command_time > cooldown:
+                        # Check gestures with debug info
+                        command = classify_gesture(hand_landmarks, image)
+                        if command:
+                            trace = latency_tracer.begin(frame_time, f"{command[1]['name']}:{command[1]['state']}")
+                            trace.mark("decision")
+                            action_text = command[0]
+                            text_display_end = current_time + 2
+                            last_command_time = current_time
         
-        # Display legend for gestures
-        y_start = image.shape[0] - 140  # Start position for gesture legend
-        cv2.putText(image, "Gesture Legend:", (10, y_start), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(image, "Thumb Up: Door UNLOCK", (10, y_start + 20), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(image, "Thumb Down: Door LOCK", (10, y_start + 40), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(image, "Open Palm: SWITCHES ALL ON", (10, y_start + 60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(image, "Number One: SWITCHES ALL OFF", (10, y_start + 80), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(image, "Number Two: LIGHTS ALL ON", (10, y_start + 100), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(image, "Rock On: LIGHTS ALL OFF", (10, y_start + 120), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        if command:
+            with watchdog.stage("publish"):
+                # Send the MQTT message for the recognized gesture
+                publish_message(mqtt_topic, command[1], trace)
         
-        # Display the image
-        cv2.imshow('Smart Home Control with Hand Gestures', image)
+        with watchdog.stage("render"):
+            # Display action text if within display time
+            if current_time < text_display_end:
+                # Draw a background for better visibility
+                cv2.rectangle(image, (40, 30), (400, 70), (0, 0, 0), -1)
+                cv2.putText(image, action_text, (50, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            
+            # Show command cooldown timer
+            if current_time - last_command_time < cooldown:
+                countdown = int(cooldown - (current_time - last_command_time)) + 1
+                cv2.putText(image, f"Cooldown: {countdown}s", (image.shape[1] - 200, 30), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            
+            # Display MQTT status
+            if client.is_connected():
+                mqtt_status = "Connected"
+            elif connector is not None and connector.connects == 0:
+                mqtt_status = "Connecting..."
+            else:
+                mqtt_status = "Disconnected"
+            broker_host, broker_port = connector.broker if connector is not None else (mqtt_broker, mqtt_port)
+            cv2.putText(image, f"MQTT: {mqtt_status} ({broker_host}:{broker_port})", (10, 30), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            
+            # Display inference frames skipped during cooldown
+            if debug_mode and inference_gate.mode != "full":
+                cv2.putText(image, f"Cooldown frames skipped: {inference_gate.skipped}/{inference_gate.frames}", (10, 90), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            
+            # Display debug toggle instruction
+            cv2.putText(image, "Press 'D' to toggle debug info", (image.shape[1] - 250, 60), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            
+            # Display legend for gestures
+            y_start = image.shape[0] - 140  # Start position for gesture legend
+            cv2.putText(image, "Gesture Legend:", (10, y_start), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            cv2.putText(image, "Thumb Up: Door UNLOCK", (10, y_start + 20), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            cv2.putText(image, "Thumb Down: Door LOCK", (10, y_start + 40), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            cv2.putText(image, "Open Palm: SWITCHES ALL ON", (10, y_start + 60), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            cv2.putText(image, "Number One: SWITCHES ALL OFF", (10, y_start + 80), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            cv2.putText(image, "Number Two: LIGHTS ALL ON", (10, y_start + 100), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            cv2.putText(image, "Rock On: LIGHTS ALL OFF", (10, y_start + 120), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            
+            # Display the image
+            cv2.imshow('Smart Home Control with Hand Gestures', image)
+            
+            # Process keyboard input
+            key = cv2.waitKey(5) & 0xFF
         
-        # Process keyboard input
-        key = cv2.waitKey(5) & 0xFF
+        stage_timers.maybe_report()
+        latency_tracer.maybe_report()
+        if ack_tracker is not None:
+            ack_tracker.check()
+        for deferred_topic, deferred_message in rate_limiter.release():
+            publish_message(deferred_topic, deferred_message, rate_limited=False)
+        profiler.maybe_dump()
         if key == 27:  # ESC key to exit
             break
         elif key == ord('d') or key == ord('D'):  # D key to toggle debug
             debug_mode = not debug_mode
     
     # Clean up
+    watchdog.stop()
+    profiler.stop()
+    print(stage_timers.report())
+    if latency_tracer.segments:
+        print(latency_tracer.report())
+    if inference_gate.mode != "full":
+        print(inference_gate.report())
+    if outbox is not None:
+        outbox.close() # Writes the queued commands, then closes the SQLite connection
+        print(outbox.report())
+        outbox = None
+    if state_cache.enabled:
+        print(state_cache.report())
+    if mqtt5 is not None:
+        print(mqtt5.report())
+    if ack_tracker is not None:
+        print(ack_tracker.report())
+    if rate_limiter.limited:
+        print(rate_limiter.report())
     cap.release()
     cv2.destroyAllWindows()
+    if connector is not None:
+        connector.stop()
     client.loop_stop()
     client.disconnect()
 
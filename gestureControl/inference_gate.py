@@ -0,0 +1,83 @@
+import time
+
+# Modes for hand inference while the command cooldown is running:
+#   "full" - run hands.process on every frame (original behaviour)
+#   "skip" - no inference during cooldown, resume shortly before it ends
+#   "thin" - run inference on every Nth frame so MediaPipe keeps tracking the hand
+INFERENCE_MODES = ("full", "skip", "thin")
+
+
+class InferenceGate:
+    """
+    Decides per frame whether the MediaPipe hand inference should run.
+
+    Gesture results are thrown away while the command cooldown is active, so
+    the expensive hands.process call can be skipped or thinned out during that
+    window. Inference always runs again `resume_margin` seconds before the
+    cooldown ends, so the tracker has locked back onto the hand by the time
+    gestures are accepted again.
+    """
+
+    def __init__(self, mode="full", thin_stride=3, resume_margin=0.3):
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown cooldown inference mode '{mode}', expected one of {INFERENCE_MODES}")
+        self.mode = mode
+        self.thin_stride = max(1, int(thin_stride))
+        self.resume_margin = resume_margin
+
+        self.frames = 0
+        self.inferred = 0
+        self.skipped = 0
+        self.inference_time = 0.0  # Total seconds spent in hands.process
+        self._cooldown_frame = 0
+        self._started = time.time()
+
+    @property
+    def reuse_results(self):
+        # Thinned frames are at most a few frames old, skipped ones can be a whole cooldown old
+        return self.mode == "thin"
+
+    def should_infer(self, now, cooldown_end):
+        self.frames += 1
+        if self.mode == "full" or now >= cooldown_end - self.resume_margin:
+            self._cooldown_frame = 0
+            return True
+
+        self._cooldown_frame += 1
+        if self.mode == "thin" and self._cooldown_frame % self.thin_stride == 0:
+            return True
+
+        self.skipped += 1
+        return False
+
+    def record_inference(self, duration):
+        self.inferred += 1
+        self.inference_time += duration
+
+    def average_inference_time(self):
+        if self.inferred == 0:
+            return 0.0
+        return self.inference_time / self.inferred
+
+    def summary(self):
+        # Saved time is estimated from the average cost of the inferences that did run
+        saved = self.skipped * self.average_inference_time()
+        elapsed = max(time.time() - self._started, 1e-9)
+        would_have_spent = self.inference_time + saved
+        return {
+            "mode": self.mode,
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "avg_inference_ms": self.average_inference_time() * 1000,
+            "saved_seconds": saved,
+            "saved_percent": 100.0 * saved / would_have_spent if would_have_spent > 0 else 0.0,
+            "saved_per_minute": 60.0 * saved / elapsed,
+        }
+
+    def report(self):
+        stats = self.summary()
+        return (f"Cooldown inference ({stats['mode']}): {stats['skipped']}/{stats['frames']} frames skipped, "
+                f"avg inference {stats['avg_inference_ms']:.1f} ms, "
+                f"saved ~{stats['saved_seconds']:.2f} s ({stats['saved_percent']:.1f}% of inference time, "
+                f"{stats['saved_per_minute']:.2f} s/min)")
@@ -0,0 +1,169 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Stages of one gesture loop iteration, in order
+STAGES = ("capture", "inference", "classification", "publish", "render")
+
+# Seconds a single stage may take before the loop counts as stalled
+DEFAULT_DEADLINES = {
+    "capture": 2.0,         # Camera driver hangs show up here
+    "inference": 1.0,
+    "classification": 0.5,
+    "publish": 1.0,         # A blocked MQTT client shows up here
+    "render": 1.0,
+}
+LOOP_DEADLINE = 3.0          # Max time between two stages, e.g. when code outside a stage blocks
+CHECK_INTERVAL = 0.5
+HEALTH_INTERVAL = 10.0       # Seconds between periodic health reports while healthy
+
+# Values written to the shared health flag watched by the supervisor (main.py)
+HEALTH_OK = 0
+HEALTH_STALLED = 1
+
+
+class LoopWatchdog:
+    """
+    Tracks per-stage heartbeats of the gesture loop from a background thread.
+
+    The loop wraps each stage in `with watchdog.stage(name):`. When a stage runs
+    past its deadline (or no stage starts for LOOP_DEADLINE seconds) a timing
+    breakdown of the last iteration is logged once, the health status switches to
+    "stalled" and is passed to `on_health` and written to `health_value`, a shared
+    multiprocessing.Value the supervising process can poll to restart the worker.
+    """
+
+    def __init__(self, deadlines=None, loop_deadline=LOOP_DEADLINE, check_interval=CHECK_INTERVAL,
+                 health_interval=HEALTH_INTERVAL, on_health=None, health_value=None, stage_timers=None,
+                 name="gesture"):
+        self.deadlines = dict(DEFAULT_DEADLINES, **(deadlines or {}))
+        self.loop_deadline = loop_deadline
+        self.check_interval = check_interval
+        self.health_interval = health_interval
+        self.on_health = on_health
+        self.health_value = health_value
+        self.stage_timers = stage_timers  # Optional StageTimers fed with every completed stage
+        self.name = name
+
+        self.last_durations = {}     # Duration of each stage in the latest iteration
+        self.last_heartbeat = {}     # Monotonic time each stage last completed
+        self.stalls = 0
+        self._current = None         # (stage, start time) while a stage is running
+        self._last_activity = time.monotonic()
+        self._stalled = None         # Stage name while stalled
+        self._last_health = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Loop side ---
+    def enter(self, stage):
+        now = time.monotonic()
+        with self._lock:
+            self._current = (stage, now)
+            self._last_activity = now
+
+    def exit(self, stage):
+        now = time.monotonic()
+        recovered = None
+        duration = None
+        with self._lock:
+            if self._current and self._current[0] == stage:
+                duration = now - self._current[1]
+                self.last_durations[stage] = duration
+            self._current = None
+            self.last_heartbeat[stage] = now
+            self._last_activity = now
+            if self._stalled:
+                recovered, self._stalled = self._stalled, None
+        if duration is not None and self.stage_timers is not None:
+            self.stage_timers.add(stage, duration)
+        if recovered:
+            print(f"[watchdog] {self.name} loop recovered after stall in '{recovered}' ({self.breakdown()})")
+            self._report_health()
+
+    @contextmanager
+    def stage(self, stage):
+        self.enter(stage)
+        try:
+            yield
+        finally:
+            self.exit(stage)
+
+    # --- Monitor side ---
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-watchdog", daemon=True)
+        self._thread.start()
+        self._report_health()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.check_interval * 2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def check(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._current:
+                stage, started = self._current
+                overdue = now - started > self.deadlines.get(stage, self.loop_deadline)
+            else:
+                stage, started = "loop", self._last_activity
+                overdue = now - started > self.loop_deadline
+            newly_stalled = overdue and self._stalled is None
+            if newly_stalled:
+                self._stalled = stage
+                self.stalls += 1
+        if newly_stalled:
+            print(f"[watchdog] {self.name} loop stalled in '{stage}' for {now - started:.1f}s "
+                  f"(deadline {self.deadlines.get(stage, self.loop_deadline):.1f}s): {self.breakdown(now)}",
+                  file=sys.stderr)
+            self._report_health(now)
+        elif now - self._last_health >= self.health_interval:
+            self._report_health(now)
+
+    def breakdown(self, now=None):
+        # Last completed duration per stage, plus the running time of the stage in progress
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            current = self._current
+            parts = []
+            for stage in STAGES:
+                if current and current[0] == stage:
+                    parts.append(f"{stage}=RUNNING {now - current[1]:.2f}s")
+                elif stage in self.last_durations:
+                    parts.append(f"{stage}={self.last_durations[stage] * 1000:.1f}ms")
+        return ", ".join(parts) if parts else "no stages completed yet"
+
+    def health(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stalled = self._stalled
+            current = self._current
+            return {
+                "worker": self.name,
+                "status": "stalled" if stalled else "ok",
+                "stage": stalled,
+                "stalled_for": round(now - (current[1] if current else self._last_activity), 3) if stalled else 0.0,
+                "stalls": self.stalls,
+                "stages_ms": {stage: round(d * 1000, 1) for stage, d in self.last_durations.items()},
+                "timestamp": time.time(),
+            }
+
+    def _report_health(self, now=None):
+        status = self.health(now)
+        self._last_health = time.monotonic() if now is None else now
+        if self.health_value is not None:
+            self.health_value.value = HEALTH_STALLED if status["status"] == "stalled" else HEALTH_OK
+        if self.on_health:
+            try:
+                self.on_health(status)
+            except Exception as e:
+                print(f"[watchdog] Failed to publish health status: {e}", file=sys.stderr)
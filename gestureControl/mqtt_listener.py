@@ -1,15 +1,33 @@
+import os
+import sys
+
 import paho.mqtt.client as mqtt
 
+# Allow running this script directly from the gestureControl folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.payloads import content_type_of, describe_payload
+from common.topics import device_subscriptions, ROUTING_DEVICE, ROUTING_LEGACY
+
+# "legacy": every command on central_main/control; "device": only the home/<device>/set
+# topics of LISTEN_DEVICES (empty: every device), matching the publishers' topic routing
+LISTEN_TOPIC_ROUTING = ROUTING_LEGACY
+LISTEN_DEVICES = []
+LEGACY_TOPIC = "central_main/control"
+
 # The callback for when a message is received
 def on_message(client, userdata, msg, properties=None):
-    print(f"Received message on topic {msg.topic}: {msg.payload.decode()}")
+    # JSON or MessagePack commands, from the v5 content-type property or the payload itself
+    print(f"Received message on topic {msg.topic}: {describe_payload(msg.payload, content_type_of(msg.properties))}")
 
 # The callback for when the client connects
 def on_connect(client, userdata, flags, rc, properties=None):
     print(f"Connected with result code {rc}")
-    # Subscribe to the door control topic
-    client.subscribe("central_main/control")
-    print("Subscribed to central_main/control")
+    # With per-device topics the broker drops the commands of other devices
+    topics = device_subscriptions(LISTEN_DEVICES) if LISTEN_TOPIC_ROUTING == ROUTING_DEVICE else [LEGACY_TOPIC]
+    for topic in topics:
+        client.subscribe(topic)
+        print(f"Subscribed to {topic}")
     print("Waiting for messages...")
 
 # Create client instance with correct API version
@@ -1,39 +1,85 @@
 import sys
 import os
+import argparse
 import multiprocessing
 import time
 
-# Adjust sys.path to allow importing from subdirectories
-# Assuming main.py is in Rhasspy0.1 and other scripts are in subfolders
-sys.path.append(os.path.join(os.path.dirname(__file__), "gestureControl"))
-sys.path.append(os.path.join(os.path.dirname(__file__), "rhasspy_voice"))
+# Make the project root importable so the control modules load as packages
+# (rhasspy_voice.voiceControl uses relative imports; gestureControl and common import from the root)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import the main functions from your scripts
 # gesture_mqtt.py should have a main() function
 # voiceControl.py now has run_voice_control_system()
 try:
-    from gesture_mqtt import main as run_gesture_control_system
-    from voiceControl import run_voice_control_system
+    from gestureControl.gesture_mqtt import main as run_gesture_control_system
+    from gestureControl.gesture_mqtt import capture_settings as gesture_capture_settings
+    from gestureControl.frame_bus import FrameBus, run_capture_process
+    from gestureControl.loop_watchdog import HEALTH_OK, HEALTH_STALLED
+    from rhasspy_voice.voiceControl import run_voice_control_system
+    from common.publisher_service import QueuePublisher, create_publisher_channel, run_publisher_service
 except ImportError as e:
     print(f"Error importing control modules: {e}")
     print("Please ensure gesture_mqtt.py and voiceControl.py are in their respective subdirectories (gestureControl, rhasspy_voice) and are correctly structured.")
     sys.exit(1)
 
-def start_gesture_control():
+# Set FRAME_BUS=1 to run the camera in its own process and share frames through shared memory
+FRAME_BUS_ENABLED = os.environ.get("FRAME_BUS", "0") == "1"
+
+# Seconds the gesture worker may report a stalled loop before it is restarted (mode 3)
+GESTURE_RESTART_AFTER = 10.0
+
+def start_gesture_control(frame_bus_name=None, health_value=None, mqtt_client=None):
     print("Starting Gesture Control System...")
     try:
-        run_gesture_control_system()
+        run_gesture_control_system(mqtt_client=mqtt_client, frame_bus_name=frame_bus_name, health_value=health_value)
     except Exception as e:
         print(f"Error in Gesture Control System: {e}")
 
-def start_voice_control():
+def start_frame_capture(frame_bus_name, settings):
+    print("Starting Frame Bus Capture...")
+    try:
+        run_capture_process(frame_bus_name, settings)
+    except Exception as e:
+        print(f"Error in Frame Bus Capture: {e}")
+
+def start_frame_bus():
+    # The bus is created (and later unlinked) here; capture and consumers attach by name
+    settings = gesture_capture_settings
+    frame_bus = FrameBus.create((settings.height, settings.width, 3))
+    capture_process = multiprocessing.Process(target=start_frame_capture, args=(frame_bus.name, settings), name="FrameCapture")
+    capture_process.start()
+    print(f"Frame bus capture process started ({frame_bus.name}).")
+    return frame_bus, capture_process
+
+def launch_gesture_process(frame_bus_name, health_value, mqtt_client):
+    health_value.value = HEALTH_OK
+    process = multiprocessing.Process(target=start_gesture_control, args=(frame_bus_name, health_value, mqtt_client), name="GestureControl")
+    process.start()
+    return process
+
+def start_voice_control(mqtt_client=None):
     print("Starting Voice Control System...")
     try:
-        run_voice_control_system()
+        run_voice_control_system(mqtt_client=mqtt_client)
     except Exception as e:
         print(f"Error in Voice Control System: {e}")
 
+def start_publisher_service(publisher_queue, publisher_connected):
+    print("Starting MQTT Publisher Service...")
+    try:
+        run_publisher_service(publisher_queue, publisher_connected)
+    except Exception as e:
+        print(f"Error in MQTT Publisher Service: {e}")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Home Control System")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+                        help="profile the gesture and voice loops (same as setting PROFILE=cprofile|sample)")
+    args = parser.parse_args()
+    if args.profile:
+        os.environ["PROFILE"] = args.profile # Inherited by the spawned control processes
+
     try:
         multiprocessing.set_start_method('spawn', force=True)
     except RuntimeError:
@@ -53,22 +99,40 @@ if __name__ == "__main__":
 
     gesture_process = None
     voice_process = None
+    publisher_process = None
+    publisher_queue = None
+    capture_process = None
+    frame_bus = None
 
     try:
+        if FRAME_BUS_ENABLED and choice in ['1', '3']:
+            frame_bus, capture_process = start_frame_bus()
+        frame_bus_name = frame_bus.name if frame_bus else None
+
         if choice == '1':
             print("Launching Gesture Control...")
             # Run in the current process for simplicity if only one is chosen
-            start_gesture_control()
+            start_gesture_control(frame_bus_name)
         elif choice == '2':
             print("Launching Voice Control...")
             # Run in the current process
             start_voice_control()
         elif choice == '3':
             print("Launching Both Gesture and Voice Control Systems...")
-            gesture_process = multiprocessing.Process(target=start_gesture_control, name="GestureControl")
-            voice_process = multiprocessing.Process(target=start_voice_control, name="VoiceControl")
+            # One broker connection for both systems; they hand their messages to the publisher over a queue
+            publisher_queue, publisher_connected = create_publisher_channel()
+            publisher_process = multiprocessing.Process(target=start_publisher_service, args=(publisher_queue, publisher_connected), name="MQTTPublisher")
+            publisher_process.start()
+            print("MQTT publisher service process started.")
+            gesture_publisher = QueuePublisher(publisher_queue, publisher_connected, "gesture")
+            voice_publisher = QueuePublisher(publisher_queue, publisher_connected, "voice")
+
+            # The gesture loop watchdog flags a stalled loop here so it can be restarted
+            gesture_health = multiprocessing.Value('i', HEALTH_OK)
+            gesture_stalled_since = None
+            voice_process = multiprocessing.Process(target=start_voice_control, args=(voice_publisher,), name="VoiceControl")
 
-            gesture_process.start()
+            gesture_process = launch_gesture_process(frame_bus_name, gesture_health, gesture_publisher)
             print("Gesture control process started.")
             voice_process.start()
             print("Voice control process started.")
@@ -81,6 +145,18 @@ if __name__ == "__main__":
                     print("Gesture control process has terminated.")
                     gesture_process.join() # Clean up
                     gesture_process = None
+                    if capture_process and capture_process.is_alive():
+                        capture_process.terminate() # Nobody left to read the frame bus
+                elif gesture_process and gesture_health.value == HEALTH_STALLED:
+                    gesture_stalled_since = gesture_stalled_since or time.time()
+                    if time.time() - gesture_stalled_since > GESTURE_RESTART_AFTER:
+                        print("Gesture control process is stalled. Restarting it...")
+                        gesture_process.terminate()
+                        gesture_process.join(timeout=5)
+                        gesture_process = launch_gesture_process(frame_bus_name, gesture_health, gesture_publisher)
+                        gesture_stalled_since = None
+                else:
+                    gesture_stalled_since = None
                 if voice_process and not voice_process.is_alive():
                     print("Voice control process has terminated.")
                     voice_process.join() # Clean up
@@ -105,4 +181,18 @@ if __name__ == "__main__":
             print("Terminating voice control process...")
             voice_process.terminate()
             voice_process.join(timeout=5) # Wait for termination
+        if publisher_process and publisher_process.is_alive():
+            print("Stopping MQTT publisher service...")
+            publisher_queue.put(None) # Shutdown sentinel, after any commands still queued
+            publisher_process.join(timeout=5)
+            if publisher_process.is_alive():
+                publisher_process.terminate()
+                publisher_process.join(timeout=5)
+        if capture_process and capture_process.is_alive():
+            print("Terminating frame bus capture process...")
+            capture_process.terminate()
+            capture_process.join(timeout=5)
+        if frame_bus:
+            frame_bus.close()
+            frame_bus.unlink()
         print("Smart Home Control System shutdown complete.")
\ No newline at end of file
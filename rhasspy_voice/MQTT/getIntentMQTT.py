@@ -9,6 +9,10 @@ import os
 import paho.mqtt.client as mqtt # Import MQTT client
 import time
 
+# Make the project root importable for the shared Rhasspy HTTP session
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from rhasspy_voice.rhasspy_http import rhasspy_session
+
 # --- Configuration ---
 RHASSPY_URL = "http://localhost:12101"
 STT_ENDPOINT = f"{RHASSPY_URL}/api/speech-to-text"
@@ -69,7 +73,7 @@ def get_text_from_audio(audio_data):
     print("Sending recorded audio data to Rhasspy STT...")
     try:
         headers = {'Content-Type': 'audio/wav'}
-        response = requests.post(STT_ENDPOINT, headers=headers, data=audio_data, timeout=20)
+        response = rhasspy_session().post(STT_ENDPOINT, headers=headers, data=audio_data)
         print(f"STT request sent. Status code: {response.status_code}")
         response.raise_for_status()
         transcribed_text = response.text
@@ -96,7 +100,7 @@ def get_intent_from_text(text):
     print(f"Sending text '{text}' to Rhasspy NLU...")
     try:
         # Send text as plain text in the POST body
-        response = requests.post(NLU_ENDPOINT, data=text.encode('utf-8'), timeout=10)
+        response = rhasspy_session().post(NLU_ENDPOINT, data=text.encode('utf-8'))
         print(f"NLU request sent. Status code: {response.status_code}")
         response.raise_for_status()
         intent_data = response.json() # Parse the JSON response
@@ -0,0 +1,136 @@
+import asyncio
+import sys
+
+from .endpointing import Endpointer
+from .pipeline import OrderedPipeline, PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE
+
+
+class AsyncUtterancePipeline(OrderedPipeline):
+    """
+    UtterancePipeline on asyncio tasks instead of threads.
+
+    `workers` tasks take utterances from a bounded asyncio.Queue and await
+    recognize(utterance); while one waits for STT or NLU the others, and the
+    microphone capture, keep running on the same event loop. publish(utterance,
+    result) is a blocking call (MQTT client lock, outbox): one more task runs
+    it on a worker thread for each result, in the order OrderedPipeline hands
+    them over. Ordering per source, dropping the oldest utterance when the
+    queue is full and the counters are those of OrderedPipeline.
+    """
+
+    def __init__(self, recognize, publish, workers=PIPELINE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE,
+                 name="voice engine"):
+        super().__init__(publish, workers, name)
+        self.recognize = recognize
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._ready = asyncio.Queue()        # (utterance, result) next in recording order, to publish
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._run(), name=f"{self.name} {index + 1}")
+                       for index in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._publish_ready(), name=f"{self.name} publish"))
+        return self
+
+    async def stop(self, timeout=None):
+        # Lets the workers finish and publish the queued utterances (up to `timeout` seconds), then cancels them
+        try:
+            await asyncio.wait_for(self._drained(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, audio, trace=None, source="mic"):
+        utterance = self._utterance(audio, trace, source)
+        while True:
+            try:
+                self._queue.put_nowait(utterance)
+                return utterance
+            except asyncio.QueueFull:
+                pass
+            try:
+                stale = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                continue
+            self._queue.task_done()
+            self._dropped(stale)
+
+    async def _drained(self):
+        await self._queue.join()
+        await self._ready.join()
+
+    def _deliver(self, utterance, result):
+        # Called by _finish() in order; the publisher task runs publish() off the event loop
+        self._ready.put_nowait((utterance, result))
+
+    async def _publish_ready(self):
+        while True:
+            utterance, result = await self._ready.get()
+            try:
+                await asyncio.to_thread(self.publish, utterance, result)
+                with self._lock:
+                    self.counts["published"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[{self.name}] Error publishing command #{utterance.seq}: {e}", file=sys.stderr)
+            finally:
+                self._ready.task_done()
+
+    async def _run(self):
+        while True:
+            utterance = await self._queue.get()
+            self._started(utterance)
+            result, outcome = None, "failed"
+            try:
+                result = await self.recognize(utterance)
+                outcome = "recognized" if result is not None else "unrecognized"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[{self.name}] Error recognizing command #{utterance.seq}: {e}", file=sys.stderr)
+            finally:
+                self._ended(utterance, result, outcome)
+                self._queue.task_done()
+
+
+class BlockQueue:
+    """
+    Puts audio blocks from the PortAudio callback thread on an asyncio.Queue of
+    the event loop. Blocks that arrive after the loop closed (the stream is
+    stopped after asyncio.run() returns) are dropped.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, block):
+        if self.loop.is_closed():
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, block)
+        except RuntimeError:
+            pass  # Closed between the check and the call
+
+
+async def capture_commands(open_stream, source, samplerate, max_duration, on_command, **endpointer_options):
+    """
+    Endless capture of one microphone: the stream stays open, its blocks are
+    awaited from an asyncio.Queue and cut into commands by an Endpointer, and
+    each finished command is awaited as on_command(source, samples, endpointer)
+    (blocks arriving meanwhile wait in the queue). open_stream(blocks) returns
+    the (not yet started) input stream context.
+    """
+    blocks = BlockQueue(asyncio.get_running_loop())
+    noise_floor_db = None            # Carried from command to command on the open stream
+    with open_stream(blocks):
+        while True:
+            endpointer = Endpointer(samplerate, max_duration, noise_floor_db=noise_floor_db, **endpointer_options)
+            while endpointer.feed(await blocks.queue.get()) is None:
+                pass
+            noise_floor_db = endpointer.noise_floor_db
+            await on_command(source, endpointer.audio(), endpointer)
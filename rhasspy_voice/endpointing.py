@@ -0,0 +1,105 @@
+import numpy as np
+
+# Voice activity detection settings for command recording
+VAD_BLOCK_MS = 30            # Audio block (and decision) size
+VAD_SILENCE_AFTER = 0.8      # Seconds of silence after speech that end the command
+VAD_MIN_SPEECH = 0.15        # Seconds above the threshold before a sound counts as speech
+VAD_PRE_ROLL = 0.3           # Seconds kept before the detected speech start (soft onsets)
+VAD_MARGIN_DB = 12.0         # Speech is at least this much louder than the noise floor
+VAD_MIN_THRESHOLD_DB = -45.0 # ... and never quieter than this (dBFS)
+VAD_NOISE_ADAPT = 0.05       # Weight of each quiet block in the noise floor average
+
+
+def block_level_db(block):
+    # RMS level of an int16 (or float in [-1, 1]) block in dBFS
+    samples = np.asarray(block, dtype=np.float64)
+    if np.issubdtype(np.asarray(block).dtype, np.integer):
+        samples = samples / 32768.0
+    rms = np.sqrt(np.mean(samples * samples)) if samples.size else 0.0
+    return 20.0 * np.log10(max(rms, 1e-10))
+
+
+class Endpointer:
+    """
+    Energy-based end-of-command detection for a stream of audio blocks.
+
+    feed() takes the blocks as the microphone delivers them and returns the reason
+    to stop, or None to keep recording: "silence" once speech was followed by
+    `silence_after` seconds below the threshold, "max_duration" at the cap
+    (speech still going on) or "no_speech" when nothing was said. The speech
+    threshold follows the room: `margin_db` above a noise floor averaged over the
+    blocks below the threshold. The floor is seeded from `noise_floor_db`, the
+    floor of the previous command on a stream that stays open, so a command that
+    starts with speech is not taken for the room; without it, from the first
+    block. audio() returns the command from `pre_roll` seconds before the speech
+    start, or the whole recording if there was none.
+    """
+
+    def __init__(self, sample_rate, max_duration, silence_after=VAD_SILENCE_AFTER, min_speech=VAD_MIN_SPEECH,
+                 pre_roll=VAD_PRE_ROLL, margin_db=VAD_MARGIN_DB, min_threshold_db=VAD_MIN_THRESHOLD_DB,
+                 noise_adapt=VAD_NOISE_ADAPT, noise_floor_db=None):
+        self.sample_rate = sample_rate
+        self.max_duration = max_duration
+        self.silence_after = silence_after
+        self.min_speech = min_speech
+        self.pre_roll = pre_roll
+        self.margin_db = margin_db
+        self.min_threshold_db = min_threshold_db
+        self.noise_adapt = noise_adapt
+        self.noise_floor_db = noise_floor_db
+        self.duration = 0.0          # Seconds fed so far
+        self.speech_start = None     # Seconds into the recording where speech started
+        self.speech_end = None       # Seconds into the recording of the last speech block
+        self.reason = None
+        self._blocks = []
+        self._speech_run = 0.0       # Seconds of consecutive loud blocks before speech starts
+
+    @property
+    def threshold_db(self):
+        if self.noise_floor_db is None:
+            return self.min_threshold_db
+        return max(self.min_threshold_db, self.noise_floor_db + self.margin_db)
+
+    @property
+    def speech_detected(self):
+        return self.speech_start is not None
+
+    def feed(self, block):
+        if self.reason is not None:
+            return self.reason
+        block_seconds = len(block) / self.sample_rate
+        start = self.duration
+        self.duration += block_seconds
+        self._blocks.append(block)
+        level = block_level_db(block)
+        if self.noise_floor_db is None:
+            self.noise_floor_db = level
+        loud = level > self.threshold_db
+        if not loud:
+            self.noise_floor_db += self.noise_adapt * (level - self.noise_floor_db)
+
+        if self.speech_start is None:
+            if loud:
+                self._speech_run += block_seconds
+                if self._speech_run >= self.min_speech:
+                    self.speech_start = self.duration - self._speech_run
+                    self.speech_end = self.duration
+            else:
+                self._speech_run = 0.0
+        elif loud:
+            self.speech_end = self.duration
+        elif self.duration - self.speech_end >= self.silence_after:
+            self.reason = "silence"
+
+        if self.reason is None and self.duration >= self.max_duration - 1e-9:
+            self.reason = "max_duration" if self.speech_start is not None else "no_speech"
+        return self.reason
+
+    def audio(self):
+        if not self._blocks:
+            return None
+        recording = np.concatenate(self._blocks)
+        if self.speech_start is not None:
+            first = max(0, int((self.speech_start - self.pre_roll) * self.sample_rate))
+            recording = recording[first:]
+        return recording
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from .intent_parser import INTENT_COMMANDS
+from .local_intents import SENTENCES_PATH, normalize
+
+# Cache of Rhasspy NLU results in front of /api/text-to-intent
+INTENT_CACHE_SIZE = 256      # Distinct transcripts kept; the least recently used is dropped beyond this
+INTENT_CACHE_TTL = 3600.0    # Seconds an NLU result is reused (covers retraining in the Rhasspy web UI)
+CONFIG_CHECK_INTERVAL = 5.0  # Seconds between checks of the intent configuration files
+INTENT_CACHE_SNAPSHOT = os.environ.get("SMART_HOME_INTENT_CACHE")  # JSON file kept across restarts; unset = off
+
+
+def intent_config_fingerprint(paths=(SENTENCES_PATH,), commands=INTENT_COMMANDS):
+    # Hash of everything an NLU result depends on locally: the training sentences and the intent mapping
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            with open(path, "rb") as config:
+                digest.update(config.read())
+        except OSError:
+            digest.update(b"missing:" + path.encode())
+    digest.update(json.dumps(sorted((name, list(command)) for name, command in commands.items())).encode())
+    return digest.hexdigest()
+
+
+class IntentCache:
+    """
+    Bounded LRU cache with TTL from normalized transcript to NLU result.
+
+    get() returns the stored result of an earlier identical transcript (same
+    normalization as the local sentence.ini lookup) while it is younger than
+    `ttl`, and moves it to the most recently used end; put() stores a result
+    and evicts the least recently used entries beyond `max_entries`. The
+    cache is tied to a fingerprint of the intent configuration (sentence.ini
+    and the INTENT_COMMANDS mapping): check_config() compares the files'
+    modification times at most every `check_interval` seconds, rehashes on a
+    change and clears the cache when the fingerprint differs. With a
+    `snapshot_path`, save() writes the entries as JSON (wall-clock expiry) and
+    load() restores those still valid under the same fingerprint.
+    """
+
+    def __init__(self, max_entries=INTENT_CACHE_SIZE, ttl=INTENT_CACHE_TTL, config_paths=(SENTENCES_PATH,),
+                 commands=INTENT_COMMANDS, snapshot_path=INTENT_CACHE_SNAPSHOT, check_interval=CONFIG_CHECK_INTERVAL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.config_paths = tuple(config_paths)
+        self.commands = commands
+        self.snapshot_path = snapshot_path
+        self.check_interval = check_interval
+        self.fingerprint = intent_config_fingerprint(self.config_paths, commands)
+        self._mtimes = self._config_mtimes()
+        self._next_check = time.monotonic() + check_interval
+        self._entries = OrderedDict()  # normalized transcript -> (result, monotonic expiry)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidations = 0
+
+    def _config_mtimes(self):
+        mtimes = []
+        for path in self.config_paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def check_config(self, now=None):
+        # True when the intent configuration changed since the last check (the cache was cleared)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            mtimes = self._config_mtimes()
+            if mtimes == self._mtimes:
+                return False
+            self._mtimes = mtimes
+            fingerprint = intent_config_fingerprint(self.config_paths, self.commands)
+            if fingerprint == self.fingerprint:
+                return False
+            self.fingerprint = fingerprint
+            self._entries.clear()
+            self.invalidations += 1
+        print("[intent cache] Intent configuration changed, cached NLU results dropped")
+        return True
+
+    def get(self, text, now=None):
+        now = time.monotonic() if now is None else now
+        key = normalize(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry[1]:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, text, result, now=None):
+        now = time.monotonic() if now is None else now
+        key = normalize(text)
+        with self._lock:
+            self._entries[key] = (result, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, now=None):
+        # Restores a snapshot written under the same intent configuration; returns the entries loaded
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0
+        now = time.monotonic() if now is None else now
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as snapshot:
+                data = json.load(snapshot)
+            if data.get("fingerprint") != self.fingerprint:
+                print("[intent cache] Snapshot is from another intent configuration, not loaded")
+                return 0
+            wall = time.time()
+            loaded = 0
+            with self._lock:
+                for key, result, expires in data.get("entries", []):
+                    if expires > wall:
+                        self._entries[key] = (result, now + min(self.ttl, expires - wall))
+                        loaded += 1
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return loaded
+        except (OSError, ValueError, TypeError) as e:
+            print(f"[intent cache] Cannot read snapshot {self.snapshot_path}: {e}", file=sys.stderr)
+            return 0
+
+    def save(self, now=None):
+        # Writes the valid entries (least recently used first) atomically; returns the entries written
+        if not self.snapshot_path:
+            return 0
+        now = time.monotonic() if now is None else now
+        wall = time.time()
+        with self._lock:
+            entries = [[key, result, wall + expiry - now] for key, (result, expiry) in self._entries.items()
+                       if expiry > now]
+        directory = os.path.dirname(self.snapshot_path)
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary = f"{self.snapshot_path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as snapshot:
+                json.dump({"fingerprint": self.fingerprint, "entries": entries}, snapshot)
+            os.replace(temporary, self.snapshot_path)
+        except OSError as e:
+            print(f"[intent cache] Cannot write snapshot {self.snapshot_path}: {e}", file=sys.stderr)
+            return 0
+        return len(entries)
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (f"[intent cache] {len(self)}/{self.max_entries} entries; hits {self.hits}, misses {self.misses} "
+                f"(hit rate {rate:.0f}%), expired {self.expired}, evicted {self.evicted}, "
+                f"invalidated {self.invalidations}x")
@@ -13,6 +13,7 @@ from pocketsphinx import LiveSpeech, get_model_path
 
 # Import the new parser function
 from rhasspy_voice.intent_parser import parse_rhasspy_intent
+from rhasspy_voice.rhasspy_http import rhasspy_session
 
 # --- Configuration ---
 RHASSPY_URL = "http://localhost:12101"
@@ -64,7 +65,7 @@ def get_text_from_audio(audio_data):
     print("Sending command audio to Rhasspy STT...")
     try:
         headers = {'Content-Type': 'audio/wav'}
-        response = requests.post(STT_ENDPOINT, headers=headers, data=audio_data, timeout=20)
+        response = rhasspy_session().post(STT_ENDPOINT, headers=headers, data=audio_data)
         response.raise_for_status()
         transcribed_text = response.text.strip()
         if not transcribed_text:
@@ -80,7 +81,7 @@ def get_intent_from_text(text):
     if not text: return None
     print(f"Sending text '{text}' to Rhasspy NLU...")
     try:
-        response = requests.post(NLU_ENDPOINT, data=text.encode('utf-8'), timeout=10)
+        response = rhasspy_session().post(NLU_ENDPOINT, data=text.encode('utf-8'))
         response.raise_for_status()
         intent_data = response.json()
         print(f"NLU API Result (JSON): {json.dumps(intent_data, indent=2)}")
@@ -0,0 +1,175 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import product
+
+# Exact-match intent recognition from the Rhasspy training sentences
+SENTENCES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentence.ini")
+MAX_EXPANSIONS = 10000       # Phrases one template line may expand to before it is left to Rhasspy
+MAX_MISSED_KEPT = 100        # Distinct missed transcripts counted for the report
+RELOAD_CHECK_INTERVAL = 5.0  # Seconds between checks of sentence.ini for changes
+
+_TOKEN = re.compile(r"\(|\)|\[|\]|\||[^\s()\[\]|]+")
+
+
+def normalize(text):
+    # "Turn ON light one." -> "turn on light one" (what both the sentences and STT output reduce to)
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+def _parse_alternatives(tokens, pos, closing):
+    # alternatives := sequence ('|' sequence)* up to `closing`; returns ([phrase word lists], next pos)
+    options = []
+    sequence = [[]]
+    while pos < len(tokens) and tokens[pos] != closing:
+        token = tokens[pos]
+        if token == "|":
+            options.extend(sequence)
+            sequence = [[]]
+            pos += 1
+            continue
+        if token in ("(", "["):
+            group, pos = _parse_alternatives(tokens, pos + 1, ")" if token == "(" else "]")
+            if token == "[":
+                group = group + [[]]   # Optional: the group or nothing
+        elif token in (")", "]"):
+            raise ValueError(f"Unbalanced '{token}'")
+        else:
+            spoken = token.split(":", 1)[0]   # word:substitution is spoken as the word
+            group = [[spoken]] if spoken else [[]]
+            pos += 1
+        sequence = [head + tail for head, tail in product(sequence, group)]
+        if len(sequence) > MAX_EXPANSIONS:
+            raise ValueError("Too many expansions")
+    if closing is not None:
+        if pos >= len(tokens):
+            raise ValueError(f"Missing '{closing}'")
+        pos += 1
+    options.extend(sequence)
+    return options, pos
+
+
+def expand(template):
+    # Every phrase a sentence template stands for: "turn (on | off) [the] light" -> 4 phrases
+    template = re.sub(r"\{[^}]*\}", "", template)   # Tags name entities, they are not spoken
+    options, _ = _parse_alternatives(_TOKEN.findall(template), 0, None)
+    return list(dict.fromkeys(phrase for phrase in (normalize(" ".join(words)) for words in options) if phrase))
+
+
+def load_sentences(path=SENTENCES_PATH):
+    # {normalized phrase: intent name} of the plain templates; rules (<...>) and slots ($...) stay with Rhasspy
+    phrases = {}
+    skipped = 0
+    intent = None
+    with open(path, encoding="utf-8") as sentences:
+        for line in sentences:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            header = re.fullmatch(r"\[([^\[\]\s]+)\]", line)
+            if header:
+                intent = header.group(1)
+                continue
+            if intent is None or "=" in line.split("(", 1)[0] or "<" in line or "$" in line:
+                skipped += 1
+                continue
+            try:
+                expanded = expand(line)
+            except ValueError as e:
+                print(f"[local intents] Left to Rhasspy: '{line}' ({e})", file=sys.stderr)
+                skipped += 1
+                continue
+            for phrase in expanded:
+                known = phrases.setdefault(phrase, intent)
+                if known != intent:
+                    print(f"[local intents] '{phrase}' is in both {known} and {intent}; using {known}",
+                          file=sys.stderr)
+    return phrases, skipped
+
+
+class LocalIntentRecognizer:
+    """
+    Resolves transcripts that are exactly one of the training sentences.
+
+    sentence.ini is compiled once into a dict from normalized phrase (lower
+    case, no punctuation, single spaces) to intent name, with optional [...]
+    parts and (a | b) alternatives expanded. recognize() is a single dict
+    lookup and returns a result shaped like Rhasspy's /api/text-to-intent
+    response, or None on a miss, when the caller asks Rhasspy's NLU (which
+    also handles the rules and slots skipped here). Hits, misses and the most
+    frequent missed transcripts (candidates for sentence.ini) are kept for
+    report(). check_reload() looks at the file's modification time at most
+    every `check_interval` seconds and recompiles it when it changed, keeping
+    the counters; a file that cannot be read keeps the previous phrases.
+    """
+
+    def __init__(self, path=SENTENCES_PATH, check_interval=RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime = self._file_mtime()
+        self._next_check = time.monotonic() + check_interval
+        self.phrases, self.skipped = load_sentences(path)
+        self.reloads = 0
+        self.hits = Counter()        # Intent name -> local matches
+        self.misses = 0
+        self.missed = Counter()      # Normalized transcript -> misses (first MAX_MISSED_KEPT distinct)
+        self._lock = threading.Lock()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check_reload(self, now=None):
+        # True when sentence.ini changed since the last check and was recompiled
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            mtime = self._file_mtime()
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+        try:
+            phrases, skipped = load_sentences(self.path)
+        except OSError as e:
+            print(f"[local intents] Cannot read {self.path}, keeping the compiled phrases: {e}", file=sys.stderr)
+            return False
+        with self._lock:
+            self.phrases, self.skipped = phrases, skipped
+            self.reloads += 1
+        print(f"[local intents] Recompiled {len(phrases)} phrases from {os.path.basename(self.path)}")
+        return True
+
+    def recognize(self, text):
+        phrase = normalize(text)
+        intent = self.phrases.get(phrase)
+        with self._lock:
+            if intent is None:
+                self.misses += 1
+                if phrase in self.missed or len(self.missed) < MAX_MISSED_KEPT:
+                    self.missed[phrase] += 1
+                return None
+            self.hits[intent] += 1
+        return {"text": phrase, "raw_text": text, "intent": {"name": intent, "confidence": 1.0},
+                "entities": [], "slots": {}, "recognizer": "local"}
+
+    @property
+    def hit_rate(self):
+        total = sum(self.hits.values()) + self.misses
+        return sum(self.hits.values()) / total if total else 0.0
+
+    def report(self):
+        hits = sum(self.hits.values())
+        line = (f"[local intents] {len(self.phrases)} phrases from {os.path.basename(self.path)}; "
+                f"hits {hits}, misses {self.misses} (hit rate {self.hit_rate * 100:.0f}%)")
+        if self.reloads:
+            line += f"; recompiled {self.reloads}x"
+        if self.missed:
+            line += "; most missed: " + ", ".join(f"'{phrase}' x{count}" for phrase, count in self.missed.most_common(3))
+        return line
@@ -1,5 +1,13 @@
+import os
+import sys
+
 import paho.mqtt.client as mqtt
 
+# Allow running this script directly from the rhasspy_voice folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.payloads import content_type_of, describe_payload
+
 # Configuration
 BROKER = "test.mosquitto.org"
 PORT = 1883
@@ -16,7 +24,8 @@ def on_connect(client, userdata, flags, reason_code, properties):
         print(f"Connection failed, reason code {reason_code}")
 
 def on_message(client, userdata, msg):
-    print(f"Received message on {msg.topic}: {msg.payload.decode()}")
+    # JSON or MessagePack commands, from the v5 content-type property or the payload itself
+    print(f"Received message on {msg.topic}: {describe_payload(msg.payload, content_type_of(msg.properties))}")
 
 # Setup MQTT client
 client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
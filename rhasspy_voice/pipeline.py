@@ -0,0 +1,174 @@
+import queue
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from common.latency import LatencyHistogram
+
+# Recognition of recorded commands while the microphone keeps listening
+PIPELINE_WORKERS = 2         # Concurrent STT/NLU round trips
+PIPELINE_QUEUE_SIZE = 4      # Recorded commands waiting for a worker; the oldest is dropped beyond this
+
+
+class Utterance:
+    """One recorded command on its way through the pipeline."""
+
+    __slots__ = ("source", "seq", "audio", "trace", "queued")
+
+    def __init__(self, source, seq, audio, trace, queued):
+        self.source = source
+        self.seq = seq               # Recording order within the source
+        self.audio = audio
+        self.trace = trace
+        self.queued = queued
+
+
+class OrderedPipeline:
+    """
+    Bookkeeping shared by the threaded and the asyncio pipelines: sequence
+    numbers per source, the counters, and the in-order hand-off of results.
+
+    _finish() is called when an utterance is done (recognized, unrecognized,
+    failed or dropped). It stores the result and passes every result that is
+    now next in recording order to publish(utterance, result), one at a time
+    and under the lock, so a fast second command waits for a slow first one.
+    A result of None is skipped.
+    """
+
+    def __init__(self, publish, workers, name):
+        self.publish = publish
+        self.workers = workers
+        self.name = name
+        self._lock = threading.Lock()        # Sequencing state; held while publishing in order
+        self._next_seq = defaultdict(int)    # source -> sequence number of the next recording
+        self._next_out = defaultdict(int)    # source -> sequence number to publish next
+        self._done = defaultdict(dict)       # source -> {seq: (utterance, result)} finished out of order
+        self._in_flight = 0
+        self.max_in_flight = 0
+        self.wait = LatencyHistogram()       # Queued -> picked up by a worker
+        self.counts = Counter()              # submitted, recognized, unrecognized, failed, dropped, published
+
+    def _utterance(self, audio, trace, source):
+        with self._lock:
+            seq = self._next_seq[source]
+            self._next_seq[source] += 1
+            self.counts["submitted"] += 1
+        return Utterance(source, seq, audio, trace, time.monotonic())
+
+    def _dropped(self, stale):
+        print(f"[{self.name}] Queue full, dropped the command recorded as #{stale.seq}", file=sys.stderr)
+        with self._lock:
+            self.counts["dropped"] += 1
+        self._finish(stale, None)
+
+    def _started(self, utterance):
+        with self._lock:
+            self.wait.add((time.monotonic() - utterance.queued) * 1000)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+    def _ended(self, utterance, result, outcome):
+        with self._lock:
+            self._in_flight -= 1
+            self.counts[outcome] += 1
+        self._finish(utterance, result)
+
+    def _finish(self, utterance, result):
+        # Publishes every result that is now next in recording order
+        with self._lock:
+            source = utterance.source
+            done = self._done[source]
+            done[utterance.seq] = (utterance, result)
+            while self._next_out[source] in done:
+                ready, ready_result = done.pop(self._next_out[source])
+                self._next_out[source] += 1
+                if ready_result is not None:
+                    self._deliver(ready, ready_result)
+
+    def _deliver(self, utterance, result):
+        # Publishes one result; called under the lock, in recording order
+        try:
+            self.publish(utterance, result)
+            self.counts["published"] += 1
+        except Exception as e:
+            print(f"[{self.name}] Error publishing command #{utterance.seq}: {e}", file=sys.stderr)
+
+    @property
+    def pending(self):
+        # Utterances queued or in recognition
+        with self._lock:
+            return sum(self._next_seq.values()) - sum(self._next_out.values())
+
+    def report(self):
+        counts = self.counts
+        return (f"[{self.name}] submitted {counts['submitted']}, published {counts['published']}, "
+                f"unrecognized {counts['unrecognized']}, failed {counts['failed']}, dropped {counts['dropped']}, "
+                f"max in flight {self.max_in_flight}/{self.workers}; queue wait {self.wait.format()}")
+
+
+class UtterancePipeline(OrderedPipeline):
+    """
+    Runs recognition of recorded commands on a small worker pool so the capture
+    loop can go straight back to the microphone.
+
+    submit() queues a finished utterance and returns at once. A worker calls
+    recognize(utterance), the slow STT/NLU round trips, and several utterances
+    may be in flight together. The results are handed to publish(utterance,
+    result) strictly in recording order per source, one at a time: a fast
+    second command waits for a slow first one, so "lights on" then "lights off"
+    never reach the broker reversed. A result of None (nothing recognized, or
+    recognize raised) is skipped. When the queue is full the oldest waiting
+    utterance is dropped, since a newer command matters more than a stale one.
+    """
+
+    def __init__(self, recognize, publish, workers=PIPELINE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE,
+                 name="voice pipeline"):
+        super().__init__(publish, workers, name)
+        self.recognize = recognize
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name} {index + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        # Lets the workers finish the queued utterances, then ends them
+        for _ in self._threads:
+            self._queue.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+
+    def submit(self, audio, trace=None, source="mic"):
+        utterance = self._utterance(audio, trace, source)
+        while True:
+            try:
+                self._queue.put_nowait(utterance)
+                return utterance
+            except queue.Full:
+                pass
+            try:
+                self._dropped(self._queue.get_nowait())
+            except queue.Empty:
+                continue
+
+    def _run(self):
+        while True:
+            utterance = self._queue.get()
+            if utterance is None:
+                return
+            self._started(utterance)
+            result, outcome = None, "failed"
+            try:
+                result = self.recognize(utterance)
+                outcome = "recognized" if result is not None else "unrecognized"
+            except Exception as e:
+                print(f"[{self.name}] Error recognizing command #{utterance.seq}: {e}", file=sys.stderr)
+            finally:
+                self._ended(utterance, result, outcome)
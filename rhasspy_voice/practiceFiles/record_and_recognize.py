@@ -10,6 +10,10 @@ import time
 import threading
 import os # Import os module for file operations
 
+# Make the project root importable for the shared Rhasspy HTTP session
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from rhasspy_voice.rhasspy_http import rhasspy_session
+
 # --- Configuration ---
 RHASSPY_URL = "http://localhost:12101"
 STT_ENDPOINT = f"{RHASSPY_URL}/api/speech-to-text"
@@ -55,7 +59,7 @@ def send_audio_for_stt(audio_data):
     print("Sending recorded audio data to Rhasspy STT...")
     try:
         headers = {'Content-Type': 'audio/wav'}
-        response = requests.post(STT_ENDPOINT, headers=headers, data=audio_data, timeout=20)
+        response = rhasspy_session().post(STT_ENDPOINT, headers=headers, data=audio_data)
         print(f"STT request sent. Status code: {response.status_code}")
         response.raise_for_status()
         # We don't strictly need the transcription text here,
@@ -7,6 +7,10 @@ from scipy.io.wavfile import write
 import io
 import os
 
+# Make the project root importable for the shared Rhasspy HTTP session
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from rhasspy_voice.rhasspy_http import rhasspy_session
+
 RHASSPY_URL = "http://localhost:12101"
 STT_ENDPOINT = f"{RHASSPY_URL}/api/speech-to-text"
 
@@ -69,7 +73,7 @@ def transcribe_audio_data(audio_data):
         # Send audio data as POST request body
         # Set Content-Type header to audio/wav
         headers = {'Content-Type': 'audio/wav'}
-        response = requests.post(STT_ENDPOINT, headers=headers, data=audio_data, timeout=20)
+        response = rhasspy_session().post(STT_ENDPOINT, headers=headers, data=audio_data)
 
         print(f"Request sent. Status code: {response.status_code}")
         response.raise_for_status() # Raise an exception for bad status codes
@@ -1,6 +1,11 @@
 # filepath: test_rhasspy_stt.py
 import requests
 import sys
+import os
+
+# Make the project root importable for the shared Rhasspy HTTP session
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from rhasspy_voice.rhasspy_http import rhasspy_session
 
 RHASSPY_URL = "http://localhost:12101"
 STT_ENDPOINT = f"{RHASSPY_URL}/api/speech-to-text"
@@ -16,7 +21,7 @@ def transcribe_audio(file_path):
         # Send audio data as POST request body
         # Set Content-Type header to audio/wav
         headers = {'Content-Type': 'audio/wav'}
-        response = requests.post(STT_ENDPOINT, headers=headers, data=audio_data, timeout=20) # Increased timeout for STT
+        response = rhasspy_session().post(STT_ENDPOINT, headers=headers, data=audio_data) # Keep-alive session, 20 s timeout for STT
 
         print(f"Request sent. Status code: {response.status_code}")
         response.raise_for_status() # Raise an exception for bad status codes
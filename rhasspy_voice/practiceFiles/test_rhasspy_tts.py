@@ -2,6 +2,11 @@
 import requests
 import json
 import sys # Import sys module
+import os
+
+# Make the project root importable for the shared Rhasspy HTTP session
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from rhasspy_voice.rhasspy_http import rhasspy_session
 
 RHASSPY_URL = "http://localhost:12101"
 TTS_ENDPOINT = f"{RHASSPY_URL}/api/text-to-speech"
@@ -10,7 +15,7 @@ def speak_text(text):
     """Sends text to Rhasspy's TTS endpoint."""
     print("Attempting to send text to Rhasspy...") # Added print
     try:
-        response = requests.post(TTS_ENDPOINT, data=text, timeout=10) # Added timeout
+        response = rhasspy_session().post(TTS_ENDPOINT, data=text) # Keep-alive session, 10 s timeout
         print(f"Request sent. Status code: {response.status_code}") # Added print
         response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
         print(f"Rhasspy should be speaking: '{text}'")
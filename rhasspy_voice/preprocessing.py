@@ -0,0 +1,123 @@
+import io
+import time
+from math import gcd
+
+import numpy as np
+from scipy.io import wavfile
+from scipy.signal import resample_poly
+
+from common.latency import LatencyHistogram
+
+# Preparation of command audio for Rhasspy's speech-to-text
+STT_SAMPLE_RATE = 16000      # Rate Rhasspy's acoustic models run at (Kaldi / Pocketsphinx profiles)
+TRIM_FRAME_MS = 10           # Frame size of the silence trimming
+TRIM_RANGE_DB = 35.0         # Frames this far below the loudest frame count as silence ...
+TRIM_FLOOR_DB = -50.0        # ... and so does anything quieter than this (dBFS)
+TRIM_PAD = 0.2               # Seconds kept around the speech so word edges are not clipped
+WAV_HEADER_BYTES = 44
+
+
+def remove_dc(samples):
+    # Float copy of the samples without their DC offset (mean), scaled to [-1, 1] for int16 input
+    samples = np.asarray(samples)
+    scale = 32768.0 if np.issubdtype(samples.dtype, np.integer) else 1.0
+    samples = samples.astype(np.float64) / scale
+    return samples - samples.mean(axis=0)
+
+
+def resample(samples, samplerate, target=STT_SAMPLE_RATE):
+    # Polyphase resampling (anti-aliasing FIR included): 44100 -> 16000 is up 160, down 441
+    if samplerate == target:
+        return samples
+    divisor = gcd(int(samplerate), int(target))
+    return resample_poly(samples, target // divisor, int(samplerate) // divisor, axis=0)
+
+
+def speech_bounds(samples, samplerate, frame_ms=TRIM_FRAME_MS, range_db=TRIM_RANGE_DB,
+                  floor_db=TRIM_FLOOR_DB, pad=TRIM_PAD):
+    # (first, last) sample of the audio to keep, or (0, len) when nothing stands out of the silence
+    frame = max(1, int(samplerate * frame_ms / 1000))
+    count = len(samples) // frame
+    if count == 0:
+        return 0, len(samples)
+    frames = samples[:count * frame].reshape(count, frame)
+    levels = 10.0 * np.log10(np.maximum(np.mean(frames * frames, axis=1), 1e-20))
+    loud = np.flatnonzero(levels > max(floor_db, levels.max() - range_db))
+    if loud.size == 0:
+        return 0, len(samples)
+    padding = int(pad * samplerate)
+    return max(0, loud[0] * frame - padding), min(len(samples), (loud[-1] + 1) * frame + padding)
+
+
+class AudioPreprocessor:
+    """
+    Turns a recorded command into what Rhasspy's STT actually needs.
+
+    process() removes the DC offset, mixes down to mono, resamples to 16 kHz
+    and trims the leading and trailing silence (keeping `pad` seconds around
+    the speech). A 44.1 kHz recording shrinks 2.75x before trimming, and
+    Rhasspy no longer resamples it on the server. Totals of the bytes and
+    seconds that were not uploaded are kept for report(). stt_done() records
+    how long STT took per second of audio, which turns the trimmed seconds
+    into an estimate of the STT time saved.
+    """
+
+    def __init__(self, target_rate=STT_SAMPLE_RATE, trim=True, pad=TRIM_PAD):
+        self.target_rate = target_rate
+        self.trim = trim
+        self.pad = pad
+        self.commands = 0
+        self.bytes_in = 0            # WAV bytes as recorded
+        self.bytes_out = 0           # WAV bytes sent to STT
+        self.seconds_in = 0.0
+        self.seconds_out = 0.0
+        self.cost = LatencyHistogram()   # Preprocessing time per command (ms)
+        self.stt_ms = 0.0
+        self.stt_seconds = 0.0       # Audio seconds of the timed STT requests
+
+    def process(self, recording, samplerate):
+        # int16 mono samples at target_rate
+        start = time.perf_counter()
+        samples = remove_dc(recording)
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        samples = resample(samples, samplerate, self.target_rate)
+        if self.trim:
+            first, last = speech_bounds(samples, self.target_rate, pad=self.pad)
+            samples = samples[first:last]
+        processed = np.clip(np.round(samples * 32767.0), -32768, 32767).astype(np.int16)
+
+        channels = recording.shape[1] if np.ndim(recording) > 1 else 1
+        self.commands += 1
+        self.bytes_in += WAV_HEADER_BYTES + len(recording) * channels * 2
+        self.bytes_out += WAV_HEADER_BYTES + processed.nbytes
+        self.seconds_in += len(recording) / samplerate
+        self.seconds_out += len(processed) / self.target_rate
+        self.cost.add((time.perf_counter() - start) * 1000)
+        return processed
+
+    def process_wav(self, wav_bytes):
+        # WAV in, WAV out, for audio that is already a WAV file (voiceControl calls process() on the recorded samples)
+        samplerate, recording = wavfile.read(io.BytesIO(wav_bytes))
+        buffer = io.BytesIO()
+        wavfile.write(buffer, self.target_rate, self.process(recording, samplerate))
+        return buffer.getvalue()
+
+    def stt_done(self, wav_bytes, elapsed_ms):
+        # Time STT took for a processed command (mono int16 at target_rate)
+        self.stt_seconds += (len(wav_bytes) - WAV_HEADER_BYTES) / 2 / self.target_rate
+        self.stt_ms += elapsed_ms
+
+    def report(self):
+        if not self.commands:
+            return "[audio] no commands preprocessed"
+        saved = 1 - self.bytes_out / self.bytes_in if self.bytes_in else 0.0
+        trimmed = self.seconds_in - self.seconds_out
+        line = (f"[audio] {self.commands} commands: sent {self.bytes_out / 1024:.0f} KiB instead of "
+                f"{self.bytes_in / 1024:.0f} KiB ({saved * 100:.0f}% less), {self.seconds_out:.1f} s of "
+                f"{self.seconds_in:.1f} s audio; preprocessing {self.cost.format()}")
+        if self.stt_seconds:
+            per_second = self.stt_ms / self.stt_seconds
+            line += (f"; STT {per_second:.0f}ms per audio second, "
+                     f"~{per_second * trimmed / self.commands:.0f}ms saved per command by trimming")
+        return line
@@ -0,0 +1,90 @@
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP session for the Rhasspy API (keep-alive connections, retries, per-endpoint timeouts)
+HTTP_POOL_SIZE = 4           # Connections kept open per Rhasspy host (at least the voice pipeline workers)
+HTTP_RETRIES = 2             # Retries of a refused connection or a 502/503/504 (Rhasspy restarting)
+HTTP_BACKOFF = 0.3           # Seconds before the first retry, doubled for each further one
+HTTP_CONNECT_TIMEOUT = 3.05  # Seconds to open a connection; a local Rhasspy answers in milliseconds
+ENDPOINT_TIMEOUTS = {        # Seconds to wait for the response, by API path
+    "/api/speech-to-text": 20,
+    "/api/text-to-intent": 10,
+    "/api/text-to-speech": 10,
+}
+DEFAULT_READ_TIMEOUT = 10
+RETRY_STATUSES = (502, 503, 504)
+
+
+class RhasspySession:
+    """
+    One requests.Session for all calls to a Rhasspy server.
+
+    requests.post() opens a new TCP connection for every call, two per spoken
+    command (STT, then NLU). The session keeps up to `pool_size` connections
+    alive and reuses them, so the connection is set up once per process. The
+    timeout is chosen by the endpoint path (ENDPOINT_TIMEOUTS). Refused
+    connections and gateway errors are retried with backoff. These Rhasspy
+    calls are pure functions of their input, so POST is safe to retry; read
+    timeouts are not retried, since a slow STT would only be waited for twice.
+    post() returns the response like requests.post() and raises the same
+    requests exceptions, so callers keep their error handling.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF,
+                 connect_timeout=HTTP_CONNECT_TIMEOUT, timeouts=ENDPOINT_TIMEOUTS):
+        self.connect_timeout = connect_timeout
+        self.timeouts = dict(timeouts)
+        retry = Retry(total=retries, connect=retries, read=False, status=retries, backoff_factor=backoff,
+                      status_forcelist=RETRY_STATUSES, allowed_methods=frozenset({"GET", "POST"}),
+                      raise_on_status=False)
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.requests = Counter()    # API path -> requests sent
+        self._lock = threading.Lock()
+
+    def timeout_for(self, url):
+        return self.connect_timeout, self.timeouts.get(urlsplit(url).path, DEFAULT_READ_TIMEOUT)
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        with self._lock:
+            self.requests[urlsplit(url).path] += 1
+        return self.session.post(url, data=data, headers=headers, timeout=timeout or self.timeout_for(url))
+
+    def get(self, url, timeout=None):
+        with self._lock:
+            self.requests[urlsplit(url).path] += 1
+        return self.session.get(url, timeout=timeout or self.timeout_for(url))
+
+    @property
+    def connections(self):
+        # TCP connections opened so far, over all hosts
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def close(self):
+        self.session.close()
+
+    def report(self):
+        paths = ", ".join(f"{path.rsplit('/', 1)[-1]} {count}" for path, count in self.requests.most_common()) or "none"
+        return (f"[rhasspy http] requests {sum(self.requests.values())} ({paths}), "
+                f"connections opened {self.connections}")
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def rhasspy_session():
+    # The process-wide session, created on first use
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = RhasspySession()
+        return _session
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import numpy as np
+
+from common.latency import LatencyHistogram
+
+# Rejection of recordings without speech before they are WAV-encoded and sent to STT
+GATE_FRAME_MS = 20           # Analysis frame size
+GATE_MARGIN_DB = 10.0        # Voiced frames are at least this much louder than the noise floor
+GATE_MIN_THRESHOLD_DB = -50.0  # ... and never quieter than this (dBFS)
+GATE_ZCR_RANGE = (300.0, 5000.0)  # Zero crossings per second of voiced speech; below: hum/rumble, above: hiss/clicks
+GATE_MIN_VOICED = 0.12       # Seconds of voiced frames a recording needs to go to STT
+GATE_NOISE_PERCENTILE = 20   # Frame level percentile of a recording taken as its noise level
+GATE_NOISE_FALL = 0.5        # Weight of a quieter recording in the noise floor (follows a quieter room quickly)
+GATE_NOISE_RISE = 0.1        # Weight of a louder one (speech-heavy recordings barely lift the floor)
+
+
+def frame_features(recording, samplerate, frame_ms=GATE_FRAME_MS):
+    # (level in dBFS, zero crossings per second) of every whole frame, after removing each frame's mean
+    samples = np.asarray(recording)
+    scale = 32768.0 if np.issubdtype(samples.dtype, np.integer) else 1.0
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    frame = max(1, int(samplerate * frame_ms / 1000))
+    count = len(samples) // frame
+    if count == 0:
+        return np.empty(0), np.empty(0)
+    frames = samples[:count * frame].reshape(count, frame).astype(np.float64) / scale
+    frames -= frames.mean(axis=1, keepdims=True)
+    levels = 10.0 * np.log10(np.maximum(np.mean(frames * frames, axis=1), 1e-20))
+    signs = np.signbit(frames)
+    crossings = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) * (samplerate / frame)
+    return levels, crossings
+
+
+class SilenceGate:
+    """
+    Decides from the recorded samples whether a recording is worth an STT call.
+
+    check() splits the recording into `frame_ms` frames and counts the voiced
+    ones: louder than `margin_db` above the noise floor (and than
+    `min_threshold_db`) with a zero-crossing rate in `zcr_range`, which leaves
+    out steady hum, fan hiss and clicks as loud as speech. With less than
+    `min_voiced` seconds of them it returns False and the recording is dropped
+    before WAV encoding. The noise floor is kept per source (microphone) from
+    a low percentile of each recording's frame levels; it follows a quieter
+    room quickly and a louder one slowly. The rejected recordings are the STT
+    calls avoided in report().
+    """
+
+    def __init__(self, frame_ms=GATE_FRAME_MS, margin_db=GATE_MARGIN_DB, min_threshold_db=GATE_MIN_THRESHOLD_DB,
+                 zcr_range=GATE_ZCR_RANGE, min_voiced=GATE_MIN_VOICED, noise_percentile=GATE_NOISE_PERCENTILE,
+                 noise_fall=GATE_NOISE_FALL, noise_rise=GATE_NOISE_RISE):
+        self.frame_ms = frame_ms
+        self.margin_db = margin_db
+        self.min_threshold_db = min_threshold_db
+        self.zcr_range = zcr_range
+        self.min_voiced = min_voiced
+        self.noise_percentile = noise_percentile
+        self.noise_fall = noise_fall
+        self.noise_rise = noise_rise
+        self.noise_floors = {}       # Source -> noise floor (dBFS)
+        self.checked = 0
+        self.rejected = 0            # Recordings not sent to STT
+        self.seconds_rejected = 0.0
+        self.cost = LatencyHistogram()   # check() time per recording (ms)
+        self._lock = threading.Lock()
+
+    def threshold_db(self, source="mic"):
+        floor = self.noise_floors.get(source)
+        if floor is None:
+            return self.min_threshold_db
+        return max(self.min_threshold_db, floor + self.margin_db)
+
+    def check(self, recording, samplerate, source="mic"):
+        # True when the recording has enough voiced frames to go to STT
+        start = time.perf_counter()
+        levels, crossings = frame_features(recording, samplerate, self.frame_ms)
+        with self._lock:
+            if levels.size:
+                # Quieter than min_threshold_db - margin_db makes no difference to the threshold
+                quiet = max(float(np.percentile(levels, self.noise_percentile)),
+                            self.min_threshold_db - self.margin_db)
+                floor = self.noise_floors.setdefault(source, quiet)
+                threshold = self.threshold_db(source)
+                weight = self.noise_fall if quiet < floor else self.noise_rise
+                self.noise_floors[source] = floor + weight * (quiet - floor)
+            else:
+                threshold = self.threshold_db(source)
+            low, high = self.zcr_range
+            voiced = np.count_nonzero((levels > threshold) & (crossings >= low) & (crossings <= high))
+            speech = voiced * self.frame_ms / 1000 >= self.min_voiced
+            self.checked += 1
+            if not speech:
+                self.rejected += 1
+                self.seconds_rejected += len(recording) / samplerate
+            self.cost.add((time.perf_counter() - start) * 1000)
+        return speech
+
+    def report(self):
+        floors = ", ".join(f"{source} {floor:.0f}" for source, floor in sorted(self.noise_floors.items())) or "none yet"
+        return (f"[silence gate] {self.checked} recordings checked, STT calls avoided {self.rejected} "
+                f"({self.seconds_rejected:.1f} s of audio without speech); noise floor dBFS {floors}; "
+                f"check {self.cost.format()}")
@@ -1,4 +1,4 @@
-import requests
+import asyncio
 import sys
 import sounddevice as sd
 import numpy as np
@@ -7,10 +7,32 @@ import io
 import json
 import os
 import paho.mqtt.client as mqtt
+import queue
+import threading
 import time
+from contextlib import nullcontext
 
+from common.ack_tracker import AckTracker, ACK_TIMEOUT, ACK_RETRIES
+from common.latency import LatencyTracer, VOICE_STAGES
+from common.mqtt5 import MQTT5Publisher, protocol_for
+from common.mqtt_connect import BrokerConnector
+from common.outbox import Outbox, expiry_for
+from common.payloads import PayloadCache, ENCODING_JSON, describe_payload
+from common.profiling import StageTimers, start_profile_session
+from common.rate_limit import RateLimiter, DEVICE_RATE_LIMIT, SOURCE_RATE_LIMIT
+from common.state_cache import DeviceStateCache
+from common.topics import TopicRouter, ROUTING_LEGACY
+
+from .async_engine import AsyncUtterancePipeline, capture_commands
+from .endpointing import Endpointer, VAD_BLOCK_MS, VAD_SILENCE_AFTER
 # Import the new parser function
-from .intent_parser import parse_rhasspy_intent
+from .intent_parser import parse_rhasspy_intent, INTENT_COMMANDS
+from .intent_cache import IntentCache, INTENT_CACHE_SIZE, INTENT_CACHE_TTL, INTENT_CACHE_SNAPSHOT
+from .local_intents import LocalIntentRecognizer, SENTENCES_PATH
+from .pipeline import UtterancePipeline, PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE
+from .preprocessing import AudioPreprocessor
+from .rhasspy_http import rhasspy_session
+from .silence_gate import SilenceGate
 
 # --- Configuration ---
 RHASSPY_URL = "http://localhost:12101"
@@ -21,176 +43,624 @@ NLU_ENDPOINT = f"{RHASSPY_URL}/api/text-to-intent"
 EXTERNAL_MQTT_BROKER = "mqtt.localhost"#"broker.localhost" #"test.mosquitto.org" #"localhost"
 EXTERNAL_MQTT_PORT = 1883
 EXTERNAL_MQTT_INTENT_TOPIC = "central_main/control"#"rhasspy/intent/recognized"
+EXTERNAL_MQTT_FALLBACK_BROKERS = [("localhost", 1883)] # Tried in order when the main broker is unreachable
+EXTERNAL_MQTT_V5 = False # MQTT v5: per-command message expiry and a topic alias for the intent topic
+EXTERNAL_MQTT_TOPIC_ROUTING = ROUTING_LEGACY # "device": publish to home/<device>/set as well (see common/topics.py)
+EXTERNAL_MQTT_MIRROR_LEGACY = True # In "device" routing, keep publishing to the intent topic for old subscribers
+EXTERNAL_MQTT_PAYLOAD_ENCODING = ENCODING_JSON # "msgpack": compact MessagePack intent payloads (see common/payloads.py)
 
 # Recording parameters
 SAMPLE_RATE = 44100#16000  # Hz
-COMMAND_DURATION = 5 # Seconds to record command
+COMMAND_DURATION = 5 # Seconds to record command (the maximum when VAD_ENABLED)
 CHANNELS = 1       # mono
 INPUT_DEVICE_ID = 0 # <--- ADD THIS LINE (Use the device ID for your microphone)
+VAD_ENABLED = True # Stop recording once the command is followed by VAD_SILENCE_SECONDS of silence
+VAD_SILENCE_SECONDS = VAD_SILENCE_AFTER
+
+# Resolve transcripts that exactly match a sentence.ini phrase locally, ask Rhasspy NLU only on a miss
+LOCAL_INTENTS_ENABLED = True
+LOCAL_INTENTS_PATH = SENTENCES_PATH
+
+# Reuse Rhasspy NLU results of repeated transcripts (LRU with TTL, dropped when sentence.ini or the
+# intent mapping changes); INTENT_CACHE_SNAPSHOT (env SMART_HOME_INTENT_CACHE) keeps them across restarts
+INTENT_CACHE_ENABLED = True
+INTENT_CACHE_ENTRIES = INTENT_CACHE_SIZE
+INTENT_CACHE_SECONDS = INTENT_CACHE_TTL
+INTENT_CACHE_PATH = INTENT_CACHE_SNAPSHOT
+
+# Drop recordings without speech (RMS level over an adaptive noise floor and a speech-like
+# zero-crossing rate, see silence_gate.py) before they are encoded and sent to STT
+SILENCE_GATE_ENABLED = True
+
+# Send STT 16 kHz mono audio without DC offset and surrounding silence (see preprocessing.py)
+AUDIO_PREPROCESSING = True
+
+# Keep listening while STT/NLU run: recorded commands go to a pool of recognition workers
+# and are published in recording order (False: record, recognize and publish in turn)
+PIPELINE_ENABLED = True
+PIPELINE_WORKER_COUNT = PIPELINE_WORKERS
+PIPELINE_MAX_QUEUED = PIPELINE_QUEUE_SIZE
+
+# "threads": the recording loop with worker threads; "async" (opt-in): microphone capture and recognition as
+# asyncio tasks, listening on every device in ASYNC_INPUT_DEVICES (None = INPUT_DEVICE_ID). Its blocking steps,
+# the Rhasspy HTTP calls included, still run on worker threads, one per command in flight.
+# "threads" is also used when VAD_ENABLED is off (fixed-length recordings need the blocking sd.rec())
+ENGINE_ASYNC = "async"
+ENGINE_THREADS = "threads"
+VOICE_ENGINE = ENGINE_THREADS
+ASYNC_INPUT_DEVICES = None
+ASYNC_MAX_IN_FLIGHT = 4 # Commands in STT/NLU at the same time, across all microphones
+MAINTENANCE_INTERVAL = 0.5 # Seconds between ack checks / rate-limit releases in the async engine
+
+# Keep intents published while the broker is unreachable and send them on reconnect
+# (opt-in: they are actuated late, within outbox.EXPIRY_BY_STATE)
+OUTBOX_ENABLED = False
+
+# Drop a repeated intent for a device already in that state within this many seconds (0 = off)
+SUPPRESS_REPEAT_WINDOW = 0.0
+
+# Wait for devices to confirm intents on home/<device>/state, republish or report the unconfirmed ones
+ACK_TRACKING_ENABLED = False
+ACK_TIMEOUT_SECONDS = ACK_TIMEOUT
+ACK_RETRY_COUNT = ACK_RETRIES
+
+# Token-bucket limits (commands per second, burst) per device and for all voice intents;
+# intents over the limit are coalesced to the latest per device and published when tokens refill
+RATE_LIMIT_PER_DEVICE = DEVICE_RATE_LIMIT
+RATE_LIMIT_VOICE = SOURCE_RATE_LIMIT
+
+# MQTT payloads of every mapped intent, encoded once at startup
+INTENT_PAYLOADS = PayloadCache(INTENT_COMMANDS.values(), encoding=EXTERNAL_MQTT_PAYLOAD_ENCODING)
+
+# Per-device topics of every mapped intent, derived once at startup
+INTENT_TOPICS = TopicRouter(EXTERNAL_MQTT_TOPIC_ROUTING, INTENT_COMMANDS.values(),
+                            mirror_legacy=EXTERNAL_MQTT_MIRROR_LEGACY)
 
 # --- MQTT Client ---
 external_mqtt_client = None
+outbox = None  # Opened in run_voice_control_system() when OUTBOX_ENABLED
+state_cache = None  # Created in run_voice_control_system()
+mqtt5 = None  # MQTT5Publisher when EXTERNAL_MQTT_V5 and we own the client
+ack_tracker = None  # AckTracker when ACK_TRACKING_ENABLED and we own the client
+rate_limiter = None  # Created in run_voice_control_system()
+audio_preprocessor = None  # AudioPreprocessor when AUDIO_PREPROCESSING
+silence_gate = None  # SilenceGate when SILENCE_GATE_ENABLED
+local_intents = None  # LocalIntentRecognizer when LOCAL_INTENTS_ENABLED
+intent_cache = None  # IntentCache when INTENT_CACHE_ENABLED
+publish_lock = threading.Lock()  # Pipeline workers and the voice loop publish from different threads
+stream_noise_floor = None  # Endpointer noise floor (dBFS) carried between commands on the open stream
+
+# End of recording -> STT -> decision -> publish -> ack latency of every voice command
+latency_tracer = LatencyTracer("voice", VOICE_STAGES)
+own_connection = True  # False when the publisher service acks our messages (no on_publish here)
 
 # --- MQTT Callbacks (External Broker) ---
 def on_connect_external(client, userdata, flags, reason_code, properties):
     if reason_code == 0:
-        print(f"Connected to External MQTT Broker: {EXTERNAL_MQTT_BROKER}")
+        print(f"Connected to External MQTT Broker: {client.host}")
+        if mqtt5 is not None:
+            mqtt5.on_connect(properties)
+        if ack_tracker is not None:
+            ack_tracker.subscribe(client)
+        if outbox is not None:
+            outbox.drain_to(client, mqtt5, ack_tracker.drained if ack_tracker is not None else None)
     else:
         print(f"Failed to connect to External MQTT Broker, reason code {reason_code}")
 
 def on_publish_external(client, userdata, mid, reason_code, properties):
     # print(f"External message {mid} published (Reason Code: {reason_code})")
-    pass
+    latency_tracer.acked(mid)
 
 # --- Audio & Processing Functions ---
-def record_audio(duration, samplerate, channels):
-    # Use the globally defined INPUT_DEVICE_ID
-    print(f"Listening for command ({duration} seconds) on device ID {INPUT_DEVICE_ID}...")
+def open_command_stream(samplerate, channels, blocks, device=None):
+    # Microphone stream (INPUT_DEVICE_ID unless `device`) that puts every audio block on the `blocks` queue
+    def on_audio(indata, frames, time_info, status):
+        if status:
+            print(f"Audio input status: {status}", file=sys.stderr)
+        blocks.put(indata.copy())
+
+    return sd.InputStream(samplerate=samplerate, channels=channels, dtype='int16',
+                          device=INPUT_DEVICE_ID if device is None else device, blocksize=int(samplerate * VAD_BLOCK_MS / 1000), callback=on_audio)
+
+def capture_command(max_duration, samplerate, channels, blocks=None):
+    # Feeds microphone blocks to the endpointer until the command ends; returns int16 samples.
+    # With `blocks` the caller keeps a stream open across commands (no gap between recordings),
+    # and the noise floor is carried over from the previous command on it.
+    global stream_noise_floor
+    endpointer = Endpointer(samplerate, max_duration, silence_after=VAD_SILENCE_SECONDS,
+                            noise_floor_db=stream_noise_floor if blocks is not None else None)
+    stream = nullcontext()
+    if blocks is None:
+        blocks = queue.Queue()
+        stream = open_command_stream(samplerate, channels, blocks)
+    with stream:
+        while endpointer.feed(blocks.get(timeout=1.0)) is None:
+            pass
+    stream_noise_floor = endpointer.noise_floor_db
+    print(f"Command recording finished after {endpointer.duration:.2f} s ({endpointer.reason}).")
+    return endpointer.audio()
+
+def encode_wav(recording, samplerate):
+    wav_buffer = io.BytesIO()
+    write(wav_buffer, samplerate, recording)
+    return wav_buffer.getvalue()
+
+def record_command(duration, samplerate, channels, blocks=None):
+    # Use the globally defined INPUT_DEVICE_ID; returns the int16 samples, or None on error
+    print(f"Listening for command ({'up to ' if VAD_ENABLED else ''}{duration} seconds) on device ID {INPUT_DEVICE_ID}...")
     try:
-        # Pass the device ID to sd.rec()
-        recording = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=channels, dtype='int16', device=INPUT_DEVICE_ID)
-        sd.wait()
-        print("Command recording finished.")
-        wav_buffer = io.BytesIO()
-        write(wav_buffer, samplerate, recording)
-        wav_buffer.seek(0)
-        return wav_buffer.read()
+        if VAD_ENABLED:
+            recording = capture_command(duration, samplerate, channels, blocks)
+        else:
+            # Pass the device ID to sd.rec()
+            recording = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=channels, dtype='int16', device=INPUT_DEVICE_ID)
+            sd.wait()
+            print("Command recording finished.")
+        return recording
     except Exception as e:
         print(f"Error during command recording: {e}", file=sys.stderr)
         return None
 
-def get_text_from_audio(audio_data):
-    if not audio_data: return None
+def record_audio(duration, samplerate, channels, blocks=None):
+    # The recorded command as WAV bytes, or None on error
+    recording = record_command(duration, samplerate, channels, blocks)
+    return encode_wav(recording, samplerate) if recording is not None else None
+
+def has_speech(recording, samplerate, source="mic"):
+    # Silence gate between recording and WAV encoding; False when the recording is not worth an STT call
+    if silence_gate is None or silence_gate.check(recording, samplerate, source):
+        return True
+    print(f"No speech in the recording ({source}), not sent to STT.")
+    return False
+
+def stt_request(audio_data):
+    # One blocking STT round trip through the shared session: (transcript, True), or (None, False) on an error
     print("Sending command audio to Rhasspy STT...")
     try:
         headers = {'Content-Type': 'audio/wav'}
-        response = requests.post(STT_ENDPOINT, headers=headers, data=audio_data, timeout=20)
+        response = rhasspy_session().post(STT_ENDPOINT, headers=headers, data=audio_data) # Keep-alive, 20 s
         print(f"STT request sent. Status code: {response.status_code}")
         response.raise_for_status()
         transcribed_text = response.text
         print(f"STT API Result (text): '{transcribed_text}'")
-        return transcribed_text
+        return transcribed_text, True
     except Exception as e:
         print(f"Error during STT request: {e}", file=sys.stderr)
-        time.sleep(2)
-        return None
+        return None, False
 
-def get_intent_from_text(text):
-    if not text: return None
+def nlu_request(text):
+    # One blocking NLU round trip through the shared session: (intent JSON, True), or (None, False) on an error
     print(f"Sending text '{text}' to Rhasspy NLU...")
     try:
-        response = requests.post(NLU_ENDPOINT, data=text.encode('utf-8'), timeout=10)
+        response = rhasspy_session().post(NLU_ENDPOINT, data=text.encode('utf-8')) # Keep-alive, 10 s
         print(f"NLU request sent. Status code: {response.status_code}")
         response.raise_for_status()
         intent_data = response.json()
         print(f"NLU API Result (JSON): {json.dumps(intent_data, indent=2)}")
-        return intent_data
+        return intent_data, True
     except Exception as e:
         print(f"Error during NLU request: {e}", file=sys.stderr)
+        return None, False
+
+def get_text_from_audio(audio_data):
+    if not audio_data: return None
+    transcribed_text, ok = stt_request(audio_data)
+    if not ok:
         time.sleep(2)
-        return None
+    return transcribed_text
+
+def get_intent_from_text(text):
+    if not text: return None
+    intent_data, ok = nlu_request(text)
+    if not ok:
+        time.sleep(2)
+    return intent_data
+
+# asyncio versions: the same blocking requests on a thread of the loop's default executor, not non-blocking I/O.
+# Each request in flight holds one thread until Rhasspy answers; that stays small because at most
+# ASYNC_MAX_IN_FLIGHT commands are in STT/NLU at once, over HTTP_POOL_SIZE kept-alive connections.
+async def get_text_from_audio_async(audio_data):
+    if not audio_data: return None
+    transcribed_text, ok = await asyncio.to_thread(stt_request, audio_data)
+    if not ok:
+        await asyncio.sleep(2)
+    return transcribed_text
+
+async def get_intent_from_text_async(text):
+    if not text: return None
+    intent_data, ok = await asyncio.to_thread(nlu_request, text)
+    if not ok:
+        await asyncio.sleep(2)
+    return intent_data
 
 # Modified to accept a payload dictionary
-def publish_intent_external(topic, payload_dict):
+def publish_intent_external(topic, payload_dict, trace=None, rate_limited=True):
     global external_mqtt_client
-    if not external_mqtt_client or not external_mqtt_client.is_connected():
+    connected = bool(external_mqtt_client) and external_mqtt_client.is_connected()
+    payload = INTENT_PAYLOADS.encode(payload_dict) # Pre-encoded JSON bytes for mapped intents
+    topics = INTENT_TOPICS.topics(topic, payload_dict) # Device topic (and legacy mirror) in device routing
+
+    if state_cache is not None and state_cache.should_suppress(payload_dict):
+        print(f"Suppressed repeated intent for EXTERNAL topic {topic}: {payload_dict}")
+        return True # Device is already in the requested state
+
+    if rate_limited and rate_limiter is not None and not rate_limiter.allow(topic, payload_dict):
+        print(f"Rate limit reached, deferred intent for EXTERNAL topic {topic}: {payload_dict}")
+        return False # Published later by the voice loop, or replaced by a newer intent
+
+    if outbox is not None and (not connected or outbox.has_pending()):
+        # Queue behind older undelivered intents so the broker receives them in order
+        for send_topic in topics:
+            outbox.add(send_topic, payload, expiry=expiry_for(payload_dict), source="voice")
+            print(f"Intent for EXTERNAL topic {send_topic} kept in outbox: {describe_payload(payload)}")
+        if connected:
+            outbox.drain_to(external_mqtt_client, mqtt5, ack_tracker.drained if ack_tracker is not None else None)
+            return not outbox.has_pending()
+        return False # Not delivered yet
+
+    if not connected:
         print("External MQTT client not connected. Cannot publish intent.", file=sys.stderr)
         return False # Indicate failure
     
-    message_json = json.dumps(payload_dict) # Convert the dictionary to a JSON string
-    
-    result = external_mqtt_client.publish(topic, message_json)
-    status = result.rc
-    if status == mqtt.MQTT_ERR_SUCCESS:
-        print(f"Intent published to EXTERNAL MQTT topic {topic}: {message_json}")
-        return True # Indicate success
-    else:
-        print(f"Failed to send message to EXTERNAL topic {topic} (Error code: {status})")
-        return False # Indicate failure
+    delivered = 0
+    for send_topic in topics:
+        if mqtt5 is not None:
+            result = mqtt5.publish(external_mqtt_client, send_topic, payload, expiry=expiry_for(payload_dict))
+        else:
+            result = external_mqtt_client.publish(send_topic, payload)
+        if trace is not None and send_topic == topics[0]:
+            latency_tracer.published(trace, result, wait_for_ack=own_connection)
+        status = result.rc
+        if status == mqtt.MQTT_ERR_SUCCESS:
+            print(f"Intent published to EXTERNAL MQTT topic {send_topic}: {describe_payload(payload)}")
+            if ack_tracker is not None:
+                ack_tracker.sent(payload_dict, send_topic, payload)
+            delivered += 1
+        else:
+            print(f"Failed to send message to EXTERNAL topic {send_topic} (Error code: {status})")
+            if outbox is not None:
+                outbox.add(send_topic, payload, expiry=expiry_for(payload_dict), source="voice")
+    if delivered and state_cache is not None:
+        state_cache.record(payload_dict)
+    return delivered == len(topics) # Success only if every topic got the intent
+
+def lookup_intent(text):
+    # sentence.ini lookup first (microseconds), then cached NLU results; None when Rhasspy NLU is needed
+    if intent_cache is not None:
+        intent_cache.check_config() # Drops cached NLU results of an outdated configuration
+    if local_intents is not None:
+        local_intents.check_reload() # Recompiles an edited sentence.ini
+        intent_result = local_intents.recognize(text)
+        if intent_result is not None:
+            print(f"Local intent match for '{text}': {intent_result['intent']['name']}")
+            return intent_result
+    if intent_cache is not None:
+        intent_result = intent_cache.get(text)
+        if intent_result is not None:
+            print(f"Cached NLU result for '{text}': {intent_result.get('intent', {}).get('name')}")
+            return intent_result
+    return None
+
+def remember_intent(text, intent_result):
+    if intent_result is not None and intent_cache is not None:
+        intent_cache.put(text, intent_result)
+    return intent_result
+
+def recognize_intent(text):
+    # Local lookup, or a Rhasspy NLU round trip on a miss
+    return lookup_intent(text) or remember_intent(text, get_intent_from_text(text))
+
+def prepare_command_audio(recording, stage_timers):
+    # WAV bytes for STT: the preprocessed recording, or the recording as it is; encoded once
+    if audio_preprocessor is not None:
+        try:
+            with stage_timers.stage("preprocess"):
+                return encode_wav(audio_preprocessor.process(recording, SAMPLE_RATE), audio_preprocessor.target_rate)
+        except Exception as e:
+            print(f"Error during audio preprocessing, sending the recording as is: {e}", file=sys.stderr)
+    return encode_wav(recording, SAMPLE_RATE)
+
+def transcribed(command_audio, text, stt_start, trace):
+    # Bookkeeping after STT; True when there is text to recognize an intent from
+    trace.mark("stt")
+    if text and audio_preprocessor is not None:
+        audio_preprocessor.stt_done(command_audio, (time.perf_counter() - stt_start) * 1000)
+    if not text:
+        print("Could not transcribe audio.")
+    return bool(text)
+
+def intent_payload(intent_result, trace):
+    # Custom payload of a recognized intent, or None
+    if not (intent_result and intent_result.get('intent')):
+        print("Could not recognize intent from text.")
+        return None
+
+    intent_name = intent_result['intent'].get('name', 'UnknownIntent')
+    # Confidence is available in intent_result['intent'].get('confidence')
+    # but not used in the new payload format as per your example.
+
+    print("\n--- Recognized Intent (Raw from Rhasspy) ---")
+    print(f"Intent: {intent_name}")
+    print(f"Confidence: {intent_result['intent'].get('confidence', 'N/A')}")
+    print("------------------------------------------")
+
+    # Parse the Rhasspy intent to your custom format
+    custom_payload = parse_rhasspy_intent(intent_name)
+    if not custom_payload:
+        # If parse_rhasspy_intent returned None, it means the intent
+        # was not mapped in intent_parser.py.
+        print(f"Intent '{intent_name}' not mapped to custom payload. Not publishing.")
+        return None
+    trace.label = intent_name
+    trace.mark("decision")
+    return custom_payload
+
+def recognize_command(recording, trace, stage_timers):
+    # Preprocessing, STT and NLU of one recorded command; returns its custom payload, or None
+    command_audio = prepare_command_audio(recording, stage_timers)
+    stt_start = time.perf_counter()
+    with stage_timers.stage("stt"):
+        text = get_text_from_audio(command_audio)
+    if not transcribed(command_audio, text, stt_start, trace):
+        return None
+    with stage_timers.stage("nlu"):
+        intent_result = recognize_intent(text)
+    return intent_payload(intent_result, trace)
+
+async def recognize_command_async(recording, trace, stage_timers):
+    # recognize_command() with preprocessing and the STT and NLU round trips on worker threads
+    command_audio = await asyncio.to_thread(prepare_command_audio, recording, stage_timers)
+    stt_start = time.perf_counter()
+    with stage_timers.stage("stt"):
+        text = await get_text_from_audio_async(command_audio)
+    if not transcribed(command_audio, text, stt_start, trace):
+        return None
+    with stage_timers.stage("nlu"):
+        intent_result = lookup_intent(text) or remember_intent(text, await get_intent_from_text_async(text))
+    return intent_payload(intent_result, trace)
+
+def publish_command(custom_payload, trace, stage_timers):
+    with stage_timers.stage("publish"), publish_lock:
+        publish_intent_external(EXTERNAL_MQTT_INTENT_TOPIC, custom_payload, trace)
+
+# Publish an unconfirmed intent again (AckTracker retries)
+def republish_intent(topic, payload):
+    if mqtt5 is not None:
+        return mqtt5.publish(external_mqtt_client, topic, payload)
+    return external_mqtt_client.publish(topic, payload)
 
 # --- Main Execution ---
-# Encapsulate the main logic into a function
-def run_voice_control_system():
-    global external_mqtt_client # Ensure we're using the global client
+def setup_voice_control(mqtt_client=None):
+    # Module state shared by both engines; returns (shared_client, stage_timers, profiler)
+    global external_mqtt_client, outbox, state_cache, mqtt5, own_connection, ack_tracker, rate_limiter, audio_preprocessor, silence_gate, local_intents, intent_cache # Ensure we're using the global client
+    if OUTBOX_ENABLED and outbox is None:
+        outbox = Outbox()
+    state_cache = DeviceStateCache(SUPPRESS_REPEAT_WINDOW)
+    rate_limiter = RateLimiter("voice", RATE_LIMIT_PER_DEVICE, RATE_LIMIT_VOICE)
+    audio_preprocessor = AudioPreprocessor() if AUDIO_PREPROCESSING else None
+    silence_gate = SilenceGate() if SILENCE_GATE_ENABLED else None
+    if LOCAL_INTENTS_ENABLED:
+        try:
+            local_intents = LocalIntentRecognizer(LOCAL_INTENTS_PATH)
+            print(f"Compiled {len(local_intents.phrases)} phrases from {LOCAL_INTENTS_PATH} for local intent matching")
+        except OSError as e:
+            print(f"Local intent matching off, cannot read {LOCAL_INTENTS_PATH}: {e}", file=sys.stderr)
+            local_intents = None
+    if INTENT_CACHE_ENABLED:
+        intent_cache = IntentCache(INTENT_CACHE_ENTRIES, INTENT_CACHE_SECONDS, (LOCAL_INTENTS_PATH,),
+                                   snapshot_path=INTENT_CACHE_PATH)
+        loaded = intent_cache.load()
+        if loaded:
+            print(f"Restored {loaded} cached NLU results from {INTENT_CACHE_PATH}")
 
-    # Initialize External MQTT Client
-    external_mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-    external_mqtt_client.on_connect = on_connect_external
-    external_mqtt_client.on_publish = on_publish_external
+    # Always-on stage timers, plus a cProfile / sampling session when PROFILE is set
+    stage_timers = StageTimers("voice")
+    profiler = start_profile_session("voice")
 
-    try:
-        # Connect to External Broker
-        print(f"Connecting to External MQTT broker {EXTERNAL_MQTT_BROKER}...")
-        external_mqtt_client.connect(EXTERNAL_MQTT_BROKER, EXTERNAL_MQTT_PORT, 60)
-        external_mqtt_client.loop_start() # Start background thread
-        # Wait briefly for connection to establish
-        time.sleep(1)
-        if not external_mqtt_client.is_connected():
-             raise ConnectionError("Failed to connect to external MQTT broker.")
+    # Use the provided MQTT client (shared publisher service) or create our own
+    shared_client = mqtt_client is not None
+    if shared_client:
+        external_mqtt_client = mqtt_client
+        mqtt5 = None # The publisher service owns the connection and its protocol options
+        own_connection = False
+        ack_tracker = None # The publisher service's connection does not subscribe to state topics
+    else:
+        # Initialize External MQTT Client
+        external_mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=protocol_for(EXTERNAL_MQTT_V5))
+        mqtt5 = MQTT5Publisher([EXTERNAL_MQTT_INTENT_TOPIC] + INTENT_TOPICS.device_topics()) if EXTERNAL_MQTT_V5 else None
+        own_connection = True
+        ack_tracker = AckTracker(republish_intent, ACK_TIMEOUT_SECONDS, ACK_RETRY_COUNT, state_cache,
+                                 name="voice ack") if ACK_TRACKING_ENABLED else None
+        external_mqtt_client.on_connect = on_connect_external
+        external_mqtt_client.on_publish = on_publish_external
+    return shared_client, stage_timers, profiler
 
-        # --- Continuous Loop ---
-        print("\nStarting continuous voice control loop (Press Ctrl+C to stop)...")
-        while True:
-            print("-" * 30)
-            # 1. Record command audio
-            command_audio = record_audio(COMMAND_DURATION, SAMPLE_RATE, CHANNELS)
+def connect_voice_control(shared_client):
+    # Connect to External Broker in the background (with backoff and broker failover).
+    # Intents recognized while the broker is unreachable wait in the outbox with
+    # OUTBOX_ENABLED, and are dropped without it. paho's network loop runs on its own
+    # thread, so publishing never waits for the broker.
+    if shared_client:
+        return None
+    if outbox is None:
+        print("Outbox off: intents recognized while the broker is unreachable are dropped.")
+    connector = BrokerConnector(external_mqtt_client,
+                                [(EXTERNAL_MQTT_BROKER, EXTERNAL_MQTT_PORT)] + EXTERNAL_MQTT_FALLBACK_BROKERS,
+                                name="voice")
+    connector.start()
+    return connector
 
-            if command_audio:
-                # 2. Get text
-                text = get_text_from_audio(command_audio)
+def voice_control_maintenance(stage_timers, profiler):
+    # Periodic work between commands: reports, ack timeouts and rate-limited intents due for publishing
+    stage_timers.maybe_report()
+    latency_tracer.maybe_report()
+    with publish_lock:
+        if ack_tracker is not None:
+            ack_tracker.check()
+        for deferred_topic, deferred_payload in rate_limiter.release():
+            publish_intent_external(deferred_topic, deferred_payload, rate_limited=False)
+    profiler.maybe_dump()
 
-                if text:
-                    # 3. Get intent
-                    intent_result = get_intent_from_text(text)
+def shutdown_voice_control(shared_client, connector, stage_timers, profiler, pipeline=None):
+    if connector is not None:
+        connector.stop()
+    if shared_client:
+        print("\nVoice control released the shared MQTT publisher.")
+    elif external_mqtt_client and external_mqtt_client.is_connected():
+        external_mqtt_client.loop_stop()
+        external_mqtt_client.disconnect()
+        print("\nVoice control external MQTT client stopped and disconnected.")
+    elif external_mqtt_client:
+         try:
+             external_mqtt_client.disconnect()
+             external_mqtt_client.loop_stop() # Also ends a connection attempt still in progress
+         except Exception: pass
+         print("\nVoice control external MQTT client stopped (was not connected or loop not started).")
 
-                    if intent_result and intent_result.get('intent'):
-                        intent_name = intent_result['intent'].get('name', 'UnknownIntent')
-                        # Confidence is available in intent_result['intent'].get('confidence')
-                        # but not used in the new payload format as per your example.
+    profiler.stop()
+    print(stage_timers.report())
+    if latency_tracer.segments:
+        print(latency_tracer.report())
+    if outbox is not None:
+        print(outbox.report())
+    if state_cache.enabled:
+        print(state_cache.report())
+    if mqtt5 is not None:
+        print(mqtt5.report())
+    if ack_tracker is not None:
+        print(ack_tracker.report())
+    if rate_limiter.limited:
+        print(rate_limiter.report())
+    if pipeline is not None:
+        print(pipeline.report())
+    if silence_gate is not None:
+        print(silence_gate.report())
+    if audio_preprocessor is not None:
+        print(audio_preprocessor.report())
+    if local_intents is not None:
+        print(local_intents.report())
+    if intent_cache is not None:
+        if intent_cache.snapshot_path:
+            print(f"Saved {intent_cache.save()} cached NLU results to {intent_cache.snapshot_path}")
+        print(intent_cache.report())
 
-                        print("\n--- Recognized Intent (Raw from Rhasspy) ---")
-                        print(f"Intent: {intent_name}")
-                        print(f"Confidence: {intent_result['intent'].get('confidence', 'N/A')}")
-                        print("------------------------------------------")
+def run_threaded_voice_control(mqtt_client=None):
+    # Record in this thread; STT/NLU on PIPELINE_WORKER_COUNT worker threads (or inline)
+    shared_client, stage_timers, profiler = setup_voice_control(mqtt_client)
+    connector = None
+    pipeline = None
+    try:
+        connector = connect_voice_control(shared_client)
 
-                        # 4. Parse the Rhasspy intent to your custom format
-                        custom_payload = parse_rhasspy_intent(intent_name)
+        # Recognition workers: the loop below goes back to recording while STT/NLU are in flight
+        if PIPELINE_ENABLED:
+            pipeline = UtterancePipeline(
+                lambda utterance: recognize_command(utterance.audio, utterance.trace, stage_timers),
+                lambda utterance, payload: publish_command(payload, utterance.trace, stage_timers),
+                workers=PIPELINE_WORKER_COUNT, queue_size=PIPELINE_MAX_QUEUED).start()
+        # With VAD the microphone stream stays open between commands, so no speech falls in a gap
+        blocks = queue.Queue() if PIPELINE_ENABLED and VAD_ENABLED else None
+        command_stream = open_command_stream(SAMPLE_RATE, CHANNELS, blocks) if blocks is not None else nullcontext()
 
-                        if custom_payload:
-                            # 5. Publish the new custom payload
-                            publish_intent_external(EXTERNAL_MQTT_INTENT_TOPIC, custom_payload)
-                        else:
-                            # If parse_rhasspy_intent returned None, it means the intent
-                            # was not mapped in intent_parser.py.
-                            # You can decide to log this, do nothing, or publish a default/error.
-                            print(f"Intent '{intent_name}' not mapped to custom payload. Not publishing.")
+        # --- Continuous Loop ---
+        print("\nStarting continuous voice control loop (Press Ctrl+C to stop)...")
+        with command_stream:
+            while True:
+                print("-" * 30)
+                # 1. Record command audio
+                with stage_timers.stage("record"):
+                    recording = record_command(COMMAND_DURATION, SAMPLE_RATE, CHANNELS, blocks)
+
+                if recording is None:
+                    print("Failed to record command audio. Retrying...")
+                    time.sleep(1)
+                elif has_speech(recording, SAMPLE_RATE):
+                    trace = latency_tracer.begin(time.monotonic())
+                    if pipeline is not None:
+                        # 2.-5. STT, NLU and publish on a worker, in recording order
+                        pipeline.submit(recording, trace)
                     else:
-                        print("Could not recognize intent from text.")
-                else:
-                    print("Could not transcribe audio.")
-            else:
-                print("Failed to record command audio. Retrying...")
-                time.sleep(1)
-
-    except ConnectionError as e:
-         print(f"MQTT Connection Error: {e}", file=sys.stderr)
+                        custom_payload = recognize_command(recording, trace, stage_timers)
+                        if custom_payload:
+                            publish_command(custom_payload, trace, stage_timers)
+
+                voice_control_maintenance(stage_timers, profiler)
+
     except KeyboardInterrupt:
         print("\nCtrl+C detected. Stopping voice control loop...")
     except Exception as e:
         print(f"An unexpected error occurred in voice control: {e}", file=sys.stderr)
     finally:
-        if external_mqtt_client and external_mqtt_client.is_connected():
-            external_mqtt_client.loop_stop()
-            external_mqtt_client.disconnect()
-            print("\nVoice control external MQTT client stopped and disconnected.")
-        elif external_mqtt_client:
-             try:
-                 external_mqtt_client.disconnect()
-             except Exception: pass
-             print("\nVoice control external MQTT client stopped (was not connected or loop not started).")
+        if pipeline is not None:
+            pipeline.stop(timeout=COMMAND_DURATION) # Commands already recorded still get published
+        shutdown_voice_control(shared_client, connector, stage_timers, profiler, pipeline)
+        print(rhasspy_session().report())
+        print("Voice control script finished.")
 
+async def run_voice_control_async(mqtt_client=None, devices=None):
+    # One event loop: a capture task per microphone, ASYNC_MAX_IN_FLIGHT recognition tasks, periodic maintenance
+    shared_client, stage_timers, profiler = setup_voice_control(mqtt_client)
+    devices = list(devices or ASYNC_INPUT_DEVICES or [INPUT_DEVICE_ID])
+    connector = None
+    pipeline = None
+    captures = []
+    try:
+        connector = connect_voice_control(shared_client)
+        pipeline = AsyncUtterancePipeline(
+            lambda utterance: recognize_command_async(utterance.audio, utterance.trace, stage_timers),
+            lambda utterance, payload: publish_command(payload, utterance.trace, stage_timers),
+            workers=ASYNC_MAX_IN_FLIGHT, queue_size=PIPELINE_MAX_QUEUED).start()
+
+        async def on_command(source, recording, endpointer):
+            print("-" * 30)
+            print(f"Command recording on {source} finished after {endpointer.duration:.2f} s ({endpointer.reason}).")
+            stage_timers.add("record", endpointer.duration)
+            trace = latency_tracer.begin(time.monotonic())
+            # The silence gate is numpy work: on a worker thread, the loop keeps capturing
+            if not await asyncio.to_thread(has_speech, recording, SAMPLE_RATE, source):
+                return
+            # 2.-5. Preprocessing, STT, NLU and publish on a recognition task, in recording order per microphone
+            pipeline.submit(recording, trace, source=source)
+
+        for device in devices:
+            open_stream = lambda blocks, device=device: open_command_stream(SAMPLE_RATE, CHANNELS, blocks, device)
+            captures.append(asyncio.create_task(
+                capture_commands(open_stream, f"mic {device}", SAMPLE_RATE, COMMAND_DURATION, on_command,
+                                 silence_after=VAD_SILENCE_SECONDS), name=f"capture mic {device}"))
+
+        print(f"\nStarting asyncio voice control on input device(s) {devices} (Press Ctrl+C to stop)...")
+        running = set(captures)
+        while running:
+            done, running = await asyncio.wait(running, timeout=MAINTENANCE_INTERVAL)
+            for capture in done:
+                print(f"Stopped listening ({capture.get_name()}): {capture.exception()!r}", file=sys.stderr)
+            await asyncio.to_thread(voice_control_maintenance, stage_timers, profiler) # Publishes under publish_lock
+        print("No microphone left to listen on.", file=sys.stderr)
+
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        print("\nCtrl+C detected. Stopping voice control loop...")
+    except Exception as e:
+        print(f"An unexpected error occurred in voice control: {e}", file=sys.stderr)
+    finally:
+        for capture in captures:
+            capture.cancel()
+        await asyncio.gather(*captures, return_exceptions=True)
+        if pipeline is not None:
+            await pipeline.stop(timeout=COMMAND_DURATION) # Commands already recorded still get published
+        shutdown_voice_control(shared_client, connector, stage_timers, profiler, pipeline)
+        print(rhasspy_session().report())
         print("Voice control script finished.")
 
+# Encapsulate the main logic into a function
+def run_voice_control_system(mqtt_client=None):
+    if VOICE_ENGINE != ENGINE_ASYNC or not VAD_ENABLED:
+        run_threaded_voice_control(mqtt_client)
+        return
+    try:
+        asyncio.run(run_voice_control_async(mqtt_client))
+    except KeyboardInterrupt:
+        pass # Ctrl+C outside the engine's own handling (e.g. during shutdown)
+
 
 if __name__ == "__main__":
-    run_voice_control_system()
\ No newline at end of file
+    run_voice_control_system()
@@ -0,0 +1,7 @@
+# Stand-ins shared by the tests in this folder
+
+
+class SharedFlag:
+    # Stand-in for multiprocessing.Value
+    def __init__(self, value=0):
+        self.value = value
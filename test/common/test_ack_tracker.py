@@ -0,0 +1,149 @@
+'''
+test cases :
+1   A state report with the commanded state confirms the command and records its round trip
+2   A report without a name (here MessagePack) is matched by its home/<device>/state topic
+3   An unconfirmed command is republished, then reported once and its cached state dropped
+4   A newer command supersedes an unconfirmed one; a report of another state confirms nothing
+5   A command past its validity (outbox expiry) is not republished
+6   Confirmations arrive through a real subscription on the in-process broker
+7   A command sent to several topics, or drained from the outbox, is republished to all of them
+'''
+import sys
+import os
+import io
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import paho.mqtt.client as mqtt
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.ack_tracker import AckTracker
+from common.local_broker import LocalBroker
+from common.outbox import Outbox
+from common.payloads import pack
+from common.state_cache import DeviceStateCache
+
+DOOR = {"name": "Front Door", "state": "lock"}
+LIGHTS = {"name": "CMD_LIGHT_ALL", "state": "on"}
+
+class TestAckTracker(unittest.TestCase):
+    def setUp(self):
+        self.republish = MagicMock(return_value=MagicMock(rc=0))
+        self.state_cache = DeviceStateCache(window=10)
+        self.tracker = AckTracker(self.republish, timeout=2.0, retries=1, state_cache=self.state_cache)
+        self._original_stdout, self._original_stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+
+    def tearDown(self):
+        sys.stdout, sys.stderr = self._original_stdout, self._original_stderr
+
+    def test_confirmation(self):
+        self.tracker.sent(DOOR, "central_main/control", b"{}", now=100.0)
+        confirmed = self.tracker.confirm("home/front_door/state", json.dumps(DOOR).encode(), now=100.25)
+        self.assertEqual(confirmed.name, "Front Door")
+        self.assertEqual(self.tracker.pending, 0)
+        self.assertAlmostEqual(self.tracker.latency["Front Door"].total, 250.0)
+        self.assertEqual(self.state_cache.state("Front Door"), "lock")
+
+    def test_match_by_topic(self):
+        self.tracker.sent(LIGHTS, "home/light_all/set", b"{}", now=100.0)
+        self.assertIsNotNone(self.tracker.confirm("home/light_all/state", pack({"state": "on"}), now=100.1))
+        self.assertEqual(self.tracker.counts["confirmed"], 1)
+        self.assertEqual(self.state_cache.state("CMD_LIGHT_ALL"), "on")
+
+    def test_retry_then_report(self):
+        self.tracker.sent(DOOR, "home/front_door/set", b"payload", now=100.0)
+        self.tracker.check(now=101.0)
+        self.republish.assert_not_called()
+        self.tracker.check(now=102.0)
+        self.republish.assert_called_once_with("home/front_door/set", b"payload")
+        self.state_cache.record(DOOR)
+        self.tracker.check(now=104.0)
+        self.tracker.check(now=110.0)
+        self.assertEqual(self.republish.call_count, 1)
+        self.assertEqual(self.tracker.counts["timed_out"], 1)
+        self.assertEqual(sys.stderr.getvalue().count("did not confirm"), 1)
+        self.assertIsNone(self.state_cache.state("Front Door"))
+
+    def test_superseded_and_other_state(self):
+        self.tracker.sent(DOOR, "central_main/control", b"{}", now=100.0)
+        self.tracker.sent({"name": "Front Door", "state": "unlock"}, "central_main/control", b"{}", now=100.5)
+        self.assertIsNone(self.tracker.confirm("home/front_door/state", json.dumps(DOOR).encode(), now=100.6))
+        self.assertEqual(self.tracker.counts["superseded"], 1)
+        self.assertEqual(self.tracker.pending, 1)
+        self.assertEqual(self.state_cache.state("Front Door"), "lock")
+
+    def test_expired_command_not_retried(self):
+        tracker = AckTracker(self.republish, timeout=40.0, retries=3)
+        tracker.sent({"name": "Front Door", "state": "unlock"}, "central_main/control", b"{}", now=100.0)
+        tracker.check(now=140.0)
+        self.republish.assert_not_called()
+        self.assertEqual(tracker.counts["timed_out"], 1)
+
+    def test_through_local_broker(self):
+        with LocalBroker() as broker:
+            subscribed = threading.Event()
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+            client.on_connect = lambda c, userdata, flags, rc, properties: self.tracker.subscribe(c)
+            client.on_subscribe = lambda *args: subscribed.set()
+            client.connect("127.0.0.1", broker.port)
+            client.loop_start()
+            device = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+            device.connect("127.0.0.1", broker.port)
+            device.loop_start()
+            try:
+                self.assertTrue(subscribed.wait(5))
+                self.tracker.sent(DOOR, "central_main/control", b"{}")
+                device.publish("home/front_door/state", json.dumps(DOOR), qos=1).wait_for_publish(5)
+                deadline = time.monotonic() + 5
+                while self.tracker.pending and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            finally:
+                for c in (client, device):
+                    c.disconnect()
+                    c.loop_stop()
+        self.assertEqual(self.tracker.counts["confirmed"], 1)
+        self.assertEqual(self.tracker.latency["Front Door"].count, 1)
+
+    def test_retry_all_topics(self):
+        self.tracker.sent(DOOR, "home/front_door/set", b"payload", now=100.0)
+        self.tracker.sent(DOOR, "central_main/control", b"payload", now=100.0)
+        self.assertEqual((self.tracker.pending, self.tracker.counts["sent"]), (1, 1))
+        self.tracker.check(now=102.0)
+        self.assertEqual([c.args for c in self.republish.call_args_list],
+                         [("home/front_door/set", b"payload"), ("central_main/control", b"payload")])
+
+        self.republish.reset_mock()
+        outbox = Outbox(":memory:")
+        for topic in ("home/light_all/set", "central_main/control"):
+            outbox.add(topic, json.dumps(LIGHTS).encode())
+        client = MagicMock()
+        client.publish.return_value = MagicMock(rc=0)
+        self.assertEqual(outbox.drain_to(client, on_sent=self.tracker.drained), 2)
+        self.assertEqual(self.tracker.pending, 2)
+        self.tracker.check(now=time.monotonic() + 3)
+        self.assertEqual([c.args[0] for c in self.republish.call_args_list],
+                         ["home/light_all/set", "central_main/control"])
+        outbox.close()
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,80 @@
+'''
+test cases :
+1   The histogram counts samples per bucket and reports bucket-bound percentiles
+2   A command traced through all stages records every segment, the total and its label
+3   An ack that arrives before published() returns is still matched to its trace
+4   A failed publish, or an ack that never comes, counts the trace as lost
+5   Without waiting for an ack (shared publisher service) the trace ends at publish
+'''
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.latency import LatencyHistogram, LatencyTracer, GESTURE_STAGES
+
+class TestLatencyTracer(unittest.TestCase):
+    def setUp(self):
+        self.tracer = LatencyTracer("gesture", GESTURE_STAGES, pending_timeout=10)
+
+    def test_histogram(self):
+        histogram = LatencyHistogram(buckets=(10, 100))
+        for ms in (5, 6, 50, 500):
+            histogram.add(ms)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.percentile(0.5), 10)
+        self.assertEqual(histogram.percentile(0.95), 500)
+        self.assertAlmostEqual(histogram.summary()["mean_ms"], 140.25)
+
+    def test_full_trace(self):
+        trace = self.tracer.begin(100.0, "CMD_LIGHT_ALL:on")
+        trace.mark("decision", 100.030)
+        self.tracer.published(trace, MagicMock(rc=0, mid=5), now=100.032)
+        self.tracer.acked(5, now=100.040)
+        stats = self.tracer.summary()
+        self.assertAlmostEqual(stats["capture->decision"]["mean_ms"], 30.0)
+        self.assertAlmostEqual(stats["publish->ack"]["mean_ms"], 8.0)
+        self.assertAlmostEqual(stats["capture->ack"]["mean_ms"], 40.0)
+        self.assertEqual(self.tracer.commands["CMD_LIGHT_ALL:on"].count, 1)
+
+    def test_early_ack(self):
+        self.tracer.acked(7, now=100.010)
+        trace = self.tracer.begin(100.0)
+        self.tracer.published(trace, MagicMock(rc=0, mid=7), now=100.005)
+        self.assertAlmostEqual(self.tracer.summary()["publish->ack"]["mean_ms"], 5.0)
+        trace = self.tracer.begin(100.0)
+        self.tracer.acked(8, now=100.001)
+        self.tracer.published(trace, MagicMock(rc=0, mid=8), now=100.002)
+        self.assertAlmostEqual(self.tracer.segments["publish->ack"].total, 5.0)
+
+    def test_lost_traces(self):
+        self.tracer.published(self.tracer.begin(100.0), MagicMock(rc=4, mid=0), now=100.0)
+        self.tracer.published(self.tracer.begin(100.0), MagicMock(rc=0, mid=1), now=100.0)
+        self.tracer.published(self.tracer.begin(200.0), MagicMock(rc=0, mid=2), now=200.0)
+        self.assertEqual(self.tracer.lost, 2)
+        self.assertEqual(self.tracer.summary(), {})
+
+    def test_no_ack_wait(self):
+        trace = self.tracer.begin(100.0)
+        self.tracer.published(trace, MagicMock(rc=0, mid=0), now=100.020, wait_for_ack=False)
+        self.assertAlmostEqual(self.tracer.summary()["capture->publish"]["mean_ms"], 20.0)
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
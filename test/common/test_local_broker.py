@@ -0,0 +1,143 @@
+'''
+test cases :
+1   A 3.1.1 client receives QoS 0/1 publishes matching its + and # subscriptions, and no others
+2   Retained messages reach later subscribers and an empty retained payload clears them
+3   After unsubscribing a client receives nothing more on that filter
+4   v5 topic aliases set by MQTT5Publisher are resolved, and properties reach v5 subscribers
+5   Every received PUBLISH is recorded, and stop() disconnects the clients
+'''
+import sys
+import os
+import time
+import queue
+import unittest
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.properties import Properties
+from paho.mqtt.packettypes import PacketTypes
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.local_broker import LocalBroker, USER_PROPERTY
+from common.mqtt5 import MQTT5Publisher
+
+class TestLocalBroker(unittest.TestCase):
+    def setUp(self):
+        self.broker = LocalBroker().start()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.disconnect()
+            client.loop_stop()
+        self.broker.stop()
+
+    def connect(self, protocol=mqtt.MQTTv311):
+        # Connected client whose messages and CONNACK properties are put on queues
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=protocol)
+        client.received = queue.Queue()
+        client.connack = queue.Queue()
+        client.on_message = lambda c, userdata, message: c.received.put(message)
+        client.on_connect = lambda c, userdata, flags, rc, properties: c.connack.put(properties)
+        client.connect("127.0.0.1", self.broker.port)
+        client.loop_start()
+        client.connack_properties = client.connack.get(timeout=5)
+        self.clients.append(client)
+        return client
+
+    def subscribe(self, client, *subscriptions):
+        subscribed = queue.Queue()
+        client.on_subscribe = lambda *args: subscribed.put(True)
+        client.subscribe(list(subscriptions))
+        subscribed.get(timeout=5)
+
+    def receive(self, client, count):
+        return [client.received.get(timeout=5) for _ in range(count)]
+
+    def test_wildcard_subscriptions(self):
+        subscriber = self.connect()
+        self.subscribe(subscriber, ("home/+/set", 1), ("central_main/#", 0))
+        publisher = self.connect()
+        publisher.publish("home/light/set", b"on", qos=1).wait_for_publish(5)
+        publisher.publish("home/light/state", b"ignored")
+        publisher.publish("central_main/control", b"{}", qos=1)
+        messages = self.receive(subscriber, 2)
+        self.assertEqual([(m.topic, m.payload, m.qos) for m in messages],
+                         [("home/light/set", b"on", 1), ("central_main/control", b"{}", 0)])
+        self.assertTrue(subscriber.received.empty())
+
+    def test_retained_messages(self):
+        publisher = self.connect()
+        publisher.publish("central_main/health/gesture", b"ok", qos=1, retain=True).wait_for_publish(5)
+        subscriber = self.connect()
+        self.subscribe(subscriber, ("central_main/health/+", 1))
+        message = self.receive(subscriber, 1)[0]
+        self.assertEqual((message.payload, message.retain), (b"ok", True))
+        publisher.publish("central_main/health/gesture", b"", qos=1, retain=True).wait_for_publish(5)
+        self.assertEqual(self.receive(subscriber, 1)[0].retain, False)
+        self.assertEqual(self.broker.retained, {})
+
+    def test_unsubscribe(self):
+        subscriber = self.connect()
+        self.subscribe(subscriber, ("home/#", 0))
+        unsubscribed = queue.Queue()
+        subscriber.on_unsubscribe = lambda *args: unsubscribed.put(True)
+        subscriber.unsubscribe("home/#")
+        unsubscribed.get(timeout=5)
+        publisher = self.connect()
+        publisher.publish("home/light/set", b"on", qos=1).wait_for_publish(5)
+        self.assertTrue(self.broker.wait_for_messages(1))
+        time.sleep(0.1)
+        self.assertTrue(subscriber.received.empty())
+
+    def test_mqtt5_aliases_and_properties(self):
+        subscriber = self.connect(mqtt.MQTTv5)
+        self.subscribe(subscriber, ("central_main/#", 0))
+        publisher = self.connect(mqtt.MQTTv5)
+        mqtt5 = MQTT5Publisher()
+        mqtt5.on_connect(publisher.connack_properties)
+        for state in ("on", "off", "on"):
+            mqtt5.publish(publisher, "central_main/control", state.encode(), expiry=30)
+        properties = Properties(PacketTypes.PUBLISH)
+        properties.UserProperty = ("content-type", "application/json")
+        publisher.publish("central_main/status", b"{}", properties=properties)
+        messages = self.receive(subscriber, 4)
+        self.assertEqual([m.topic for m in messages], ["central_main/control"] * 3 + ["central_main/status"])
+        self.assertEqual(messages[1].payload, b"off")
+        self.assertEqual(mqtt5.aliased, 2)
+        self.assertFalse(hasattr(messages[1].properties, "TopicAlias"))
+        self.assertEqual(messages[0].properties.MessageExpiryInterval, 30)
+        self.assertEqual(messages[3].properties.UserProperty, [("content-type", "application/json")])
+        self.assertEqual(self.broker.messages[3].properties[USER_PROPERTY], [("content-type", "application/json")])
+
+    def test_records_and_stops(self):
+        publisher = self.connect()
+        publisher.publish("central_main/control", b"1")
+        publisher.publish("central_main/control", b"2", qos=1)
+        self.assertTrue(self.broker.wait_for_messages(2))
+        self.assertEqual([m.payload for m in self.broker.messages], [b"1", b"2"])
+        self.assertEqual(self.broker.messages[1].qos, 1)
+        self.assertEqual(self.broker.client_count, 1)
+        self.broker.stop()
+        deadline = time.monotonic() + 5
+        while publisher.is_connected() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(publisher.is_connected())
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,117 @@
+'''
+test cases :
+1   Commands carry a message expiry interval, rounded to whole seconds and at least 1
+2   Without a TopicAliasMaximum from the broker no alias is used
+3   The first publish sends topic and alias, later ones only the alias
+4   Aliases are limited to the broker maximum and reset on reconnect
+5   QoS 1 publishes always send the full topic
+6   A failed first publish sends the full topic again next time
+7   Payloads carry no content type by default; announced, MessagePack ones carry ContentType "msgpack"
+'''
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.mqtt5 import MQTT5Publisher
+from common.payloads import encode_command, decode_payload, content_type_of, ENCODING_MSGPACK
+
+TOPIC = "central_main/control"
+
+def connack_properties(alias_maximum):
+    props = Properties(PacketTypes.CONNACK)
+    props.TopicAliasMaximum = alias_maximum
+    return props
+
+class TestMQTT5Publisher(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.publish.return_value = MagicMock(rc=0)
+        self.publisher = MQTT5Publisher((TOPIC, "home/other"))
+
+    def sent(self):
+        args, kwargs = self.client.publish.call_args
+        return args[0], kwargs["properties"]
+
+    def test_message_expiry(self):
+        self.publisher.publish(self.client, TOPIC, b"{}", expiry=29.7)
+        topic, props = self.sent()
+        self.assertEqual(props.MessageExpiryInterval, 29)
+        self.publisher.publish(self.client, TOPIC, b"{}", expiry=0.2)
+        self.assertEqual(self.sent()[1].MessageExpiryInterval, 1)
+
+    def test_no_alias_without_broker_maximum(self):
+        self.publisher.on_connect(None)
+        for _ in range(2):
+            self.publisher.publish(self.client, TOPIC, b"{}")
+            topic, props = self.sent()
+            self.assertEqual(topic, TOPIC)
+            self.assertFalse(hasattr(props, "TopicAlias"))
+
+    def test_alias_after_first_publish(self):
+        self.publisher.on_connect(connack_properties(10))
+        self.publisher.publish(self.client, TOPIC, b"{}")
+        self.assertEqual(self.sent()[0], TOPIC)
+        self.assertEqual(self.sent()[1].TopicAlias, 1)
+        self.publisher.publish(self.client, TOPIC, b"{}")
+        self.assertEqual(self.sent()[0], "")
+        self.assertEqual(self.sent()[1].TopicAlias, 1)
+        self.assertEqual(self.publisher.bytes_saved, len(TOPIC) - 3)
+
+    def test_alias_limit_and_reset(self):
+        self.publisher.on_connect(connack_properties(1))
+        self.publisher.publish(self.client, TOPIC, b"{}")
+        self.publisher.publish(self.client, "home/other", b"{}")
+        self.assertFalse(hasattr(self.sent()[1], "TopicAlias"))
+        self.publisher.on_connect(connack_properties(1))
+        self.publisher.publish(self.client, TOPIC, b"{}")
+        self.assertEqual(self.sent()[0], TOPIC)
+
+    def test_qos1_keeps_topic(self):
+        self.publisher.on_connect(connack_properties(10))
+        for _ in range(2):
+            self.publisher.publish(self.client, TOPIC, b"{}", qos=1)
+            self.assertEqual(self.sent()[0], TOPIC)
+
+    def test_failed_first_publish(self):
+        self.publisher.on_connect(connack_properties(10))
+        self.client.publish.return_value = MagicMock(rc=4)
+        self.publisher.publish(self.client, TOPIC, b"{}")
+        self.client.publish.return_value = MagicMock(rc=0)
+        self.publisher.publish(self.client, TOPIC, b"{}")
+        self.assertEqual(self.sent()[0], TOPIC)
+
+    def test_content_type(self):
+        self.publisher.publish(self.client, "home/l1/set", encode_command("l1", "on", ENCODING_MSGPACK))
+        self.assertFalse(hasattr(self.sent()[1], "ContentType"))
+        self.assertFalse(hasattr(self.sent()[1], "UserProperty"))
+        announcing = MQTT5Publisher(announce_content_type=True)
+        announcing.publish(self.client, "home/l1/set", encode_command("l1", "on", ENCODING_MSGPACK))
+        self.assertEqual(self.sent()[1].ContentType, "msgpack")
+        self.assertEqual(decode_payload(self.client.publish.call_args[0][1], content_type_of(self.sent()[1])),
+                         {"name": "l1", "state": "on"})
+        announcing.publish(self.client, "home/l1/set", encode_command("l1", "on"))
+        self.assertFalse(hasattr(self.sent()[1], "ContentType"))
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
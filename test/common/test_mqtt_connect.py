@@ -0,0 +1,105 @@
+'''
+test cases :
+1   The backoff doubles per failure, is capped, and jitter only shortens it
+2   start() connects asynchronously to the first broker and starts the network loop
+3   A failed attempt moves on to the next broker, wrapping around the list
+4   A successful connect resets the backoff and still calls the client's own on_connect
+5   With a real client, start() returns at once and fails over between unreachable brokers
+'''
+import sys
+import os
+import io
+import socket
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import paho.mqtt.client as mqtt
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.mqtt_connect import BrokerConnector, backoff_delay
+
+def closed_port():
+    # A loopback port nothing listens on, so connecting is refused immediately
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class TestBrokerConnector(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.brokers = [("mqtt.localhost", 1883), ("localhost", 1883)]
+        self._original_stdout, self._original_stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+
+    def tearDown(self):
+        sys.stdout, sys.stderr = self._original_stdout, self._original_stderr
+
+    def test_backoff_delay(self):
+        no_jitter = lambda: 0.0
+        self.assertEqual(backoff_delay(1, 1.0, 30.0, 0.5, rand=no_jitter), 1.0)
+        self.assertEqual(backoff_delay(3, 1.0, 30.0, 0.5, rand=no_jitter), 4.0)
+        self.assertEqual(backoff_delay(10, 1.0, 30.0, 0.5, rand=no_jitter), 30.0)
+        self.assertEqual(backoff_delay(3, 1.0, 30.0, 0.5, rand=lambda: 1.0), 2.0)
+
+    def test_start_is_asynchronous(self):
+        connector = BrokerConnector(self.client, self.brokers).start()
+        self.client.connect_async.assert_called_once_with("mqtt.localhost", 1883, 60)
+        self.client.loop_start.assert_called_once()
+        self.client.connect.assert_not_called()
+        self.assertEqual(connector.broker, ("mqtt.localhost", 1883))
+
+    def test_failover_rotates_brokers(self):
+        connector = BrokerConnector(self.client, self.brokers, initial_delay=0.0).start()
+        connector._on_connect_fail(self.client, None)
+        self.client.connect_async.assert_called_with("localhost", 1883, 60)
+        connector._on_connect_fail(self.client, None)
+        self.client.connect_async.assert_called_with("mqtt.localhost", 1883, 60)
+        self.assertEqual(connector.failures, 2)
+
+    def test_success_resets_backoff(self):
+        user_on_connect = MagicMock()
+        self.client.on_connect = user_on_connect
+        connector = BrokerConnector(self.client, self.brokers, initial_delay=0.0).start()
+        connector._on_connect_fail(self.client, None)
+        self.client.on_connect(self.client, None, {}, 0, None)
+        self.assertEqual(connector.failures, 0)
+        self.assertEqual(connector.connects, 1)
+        user_on_connect.assert_called_once_with(self.client, None, {}, 0, None)
+
+    def test_real_client_fails_over_without_blocking(self):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        brokers = [("127.0.0.1", closed_port()), ("127.0.0.1", closed_port())]
+        started = time.monotonic()
+        connector = BrokerConnector(client, brokers, initial_delay=0.01, max_delay=0.01).start()
+        self.assertLess(time.monotonic() - started, 0.5)
+        try:
+            deadline = time.monotonic() + 5
+            while connector.attempts < 3 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertGreaterEqual(connector.failures, 2)
+            self.assertGreaterEqual(connector.attempts, 3)
+            self.assertFalse(client.is_connected())
+        finally:
+            connector.stop()
+            client.disconnect()
+            client.loop_stop()
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,150 @@
+'''
+test cases :
+1   Stored commands are drained oldest first and removed once published
+2   Draining stops at the first failed publish and keeps the rest for later
+3   Expired commands are discarded instead of sent
+4   The outbox keeps at most max_entries commands, dropping the oldest
+5   Commands survive reopening the outbox file (process restart)
+6   On/off and unlock commands expire within seconds, lock commands stay valid longer
+7   The publisher service stores failed publishes and drains them once connected
+8   OutboxWriter queues writes without waiting for a locked database, keeps their order and closes the outbox
+'''
+import sys
+import os
+import io
+import queue
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.outbox import Outbox, OutboxWriter, expiry_for, DEFAULT_EXPIRY, EXPIRY_BY_STATE
+from common.publisher_service import PublisherService
+from fakes import SharedFlag
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "outbox.db")
+        self.outbox = Outbox(self.path)
+        self.sent = []
+        self._original_stdout = sys.stdout
+        self._original_stderr = sys.stderr
+        sys.stdout = io.StringIO()
+        sys.stderr = io.StringIO()
+
+    def tearDown(self):
+        self.outbox.close()
+        shutil.rmtree(self.dir)
+        sys.stdout = self._original_stdout
+        sys.stderr = self._original_stderr
+
+    def publish(self, topic, payload, qos, retain, ttl):
+        self.sent.append(payload)
+        return True
+
+    def test_drain_in_order(self):
+        for i in range(3):
+            self.outbox.add("central_main/control", f"cmd{i}")
+        self.assertEqual(self.outbox.drain(self.publish), 3)
+        self.assertEqual(self.sent, [b"cmd0", b"cmd1", b"cmd2"])
+        self.assertFalse(self.outbox.has_pending())
+
+    def test_drain_stops_on_failure(self):
+        for i in range(3):
+            self.outbox.add("t", f"cmd{i}")
+        results = iter([True, False])
+        self.assertEqual(self.outbox.drain(lambda *args: next(results)), 1)
+        self.assertEqual(self.outbox.pending(), 2)
+        self.outbox.drain(self.publish)
+        self.assertEqual(self.sent, [b"cmd1", b"cmd2"])
+
+    def test_expired_commands_discarded(self):
+        self.outbox.add("t", "old", expiry=0.01)
+        self.outbox.add("t", "new")
+        time.sleep(0.02)
+        self.outbox.drain(self.publish)
+        self.assertEqual(self.sent, [b"new"])
+        self.assertEqual(self.outbox.expired, 1)
+
+    def test_bounded_size(self):
+        self.outbox.max_entries = 2
+        for i in range(4):
+            self.outbox.add("t", f"cmd{i}")
+        self.assertEqual(self.outbox.pending(), 2)
+        self.assertEqual(self.outbox.dropped, 2)
+        self.outbox.drain(self.publish)
+        self.assertEqual(self.sent, [b"cmd2", b"cmd3"])
+
+    def test_survives_reopen(self):
+        self.outbox.add("t", "kept")
+        self.outbox.close()
+        self.outbox = Outbox(self.path)
+        self.outbox.drain(self.publish)
+        self.assertEqual(self.sent, [b"kept"])
+
+    def test_expiry_per_command(self):
+        self.assertEqual(expiry_for({"name": "front_door", "state": "unlock"}), EXPIRY_BY_STATE["unlock"])
+        self.assertEqual(expiry_for('{"name": "l1", "state": "on"}'), DEFAULT_EXPIRY)
+        self.assertLessEqual(DEFAULT_EXPIRY, 10.0)
+        self.assertLessEqual(EXPIRY_BY_STATE["unlock"], DEFAULT_EXPIRY)
+        self.assertGreater(EXPIRY_BY_STATE["lock"], DEFAULT_EXPIRY)
+
+    def test_publisher_service_uses_outbox(self):
+        connected = SharedFlag(1)
+        service = PublisherService(queue.Queue(), connected, outbox=self.outbox)
+        service.client = MagicMock()
+        service.client.publish.return_value = MagicMock(rc=4, mid=0)
+        service.handle(("voice", "central_main/control", '{"name": "l1", "state": "on"}', 0, False, time.monotonic()))
+        self.assertEqual(self.outbox.pending(), 1)
+
+        service.client.publish.return_value = MagicMock(rc=0, mid=1)
+        service.client.is_connected.return_value = True
+        service._on_connect(service.client, None, None, 0, None)
+        self.assertFalse(self.outbox.has_pending())
+        service.client.publish.assert_called_with("central_main/control", b'{"name": "l1", "state": "on"}',
+                                                  qos=0, retain=False)
+
+    def test_writer_does_not_block(self):
+        other = sqlite3.connect(self.path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")  # Another process is draining the shared file
+        writer = OutboxWriter(self.outbox)
+        start = time.monotonic()
+        for i in range(3):
+            writer.add("central_main/control", f"cmd{i}")
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertTrue(writer.has_pending())
+        other.execute("COMMIT")
+        other.close()
+        client = MagicMock()
+        client.is_connected.return_value = True
+        client.publish.return_value = MagicMock(rc=0)
+        writer.drain_to(client)
+        writer.close()
+        self.assertFalse(writer.has_pending())
+        self.assertIn("delivered 3", writer.report())
+        with self.assertRaises(sqlite3.ProgrammingError):   # The writer closed the outbox
+            self.outbox.pending()
+        self.assertEqual([c.args[1] for c in client.publish.call_args_list], [b"cmd0", b"cmd1", b"cmd2"])
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
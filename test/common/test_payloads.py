@@ -0,0 +1,100 @@
+'''
+test cases :
+1   Cached payloads are byte-identical to json.dumps of the command dict
+2   Known commands return the same bytes object every time and count as hits
+3   Messages outside the vocabulary are encoded on the fly and count as misses
+4   Every mapped intent is compiled into the payload table
+5   MessagePack payloads round-trip commands and other values and are smaller than JSON
+6   Payloads decode by their content type, or by their first byte without one
+7   Malformed payloads and unknown encodings raise ValueError
+'''
+import sys
+import os
+import json
+import unittest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from common.payloads import (PayloadCache, encode_command, pack, unpack, decode_payload, describe_payload,
+                             content_type_of, ENCODING_MSGPACK)
+from rhasspy_voice.intent_parser import INTENT_COMMANDS, parse_rhasspy_intent
+
+class TestPayloadCache(unittest.TestCase):
+
+    def test_matches_json_dumps(self):
+        self.assertEqual(encode_command("l1", "on"), json.dumps({"name": "l1", "state": "on"}).encode())
+
+    def test_known_command_hits(self):
+        cache = PayloadCache([("CMD_LIGHT_ALL", "on")])
+        first = cache.encode({"name": "CMD_LIGHT_ALL", "state": "on"})
+        second = cache.encode({"name": "CMD_LIGHT_ALL", "state": "on"})
+        self.assertIs(first, second)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 0)
+
+    def test_unknown_message_misses(self):
+        cache = PayloadCache([("l1", "on")])
+        message = {"device_id": "unknown", "action": "none"}
+        self.assertEqual(cache.encode(message), json.dumps(message).encode())
+        self.assertEqual(cache.encode({"name": "l2", "state": "on"}), encode_command("l2", "on"))
+        self.assertEqual(cache.misses, 2)
+
+    def test_intent_table_compiled(self):
+        cache = PayloadCache(INTENT_COMMANDS.values())
+        self.assertEqual(len(cache), len(INTENT_COMMANDS))
+        for intent_name in INTENT_COMMANDS:
+            payload = parse_rhasspy_intent(intent_name)
+            self.assertEqual(cache.encode(payload), json.dumps(payload).encode())
+        self.assertEqual(cache.misses, 0)
+
+    def test_msgpack_round_trip(self):
+        for value in (None, True, 70000, -1, 2.5, "\u00e9", [1, "a"], {"k": {"nested": [None]}}):
+            self.assertEqual(unpack(pack(value)), value)
+        command = encode_command("CMD_LIGHT_ALL", "on", ENCODING_MSGPACK)
+        self.assertEqual(command, bytes.fromhex("82a46e616d65ad434d445f4c494748545f414c4ca57374617465a26f6e"))
+        self.assertLess(len(command), len(encode_command("CMD_LIGHT_ALL", "on")))
+        cache = PayloadCache([("l1", "on")], encoding=ENCODING_MSGPACK)
+        self.assertEqual(unpack(cache.encode({"name": "l1", "state": "on"})), {"name": "l1", "state": "on"})
+        self.assertEqual(unpack(cache.encode({"device_id": "unknown"})), {"device_id": "unknown"})
+        self.assertEqual(cache.content_type, "application/msgpack")
+
+    def test_decode_both_formats(self):
+        message = {"name": "Front Door", "state": "unlock"}
+        self.assertEqual(decode_payload(encode_command("Front Door", "unlock")), message)
+        self.assertEqual(decode_payload(encode_command("Front Door", "unlock", ENCODING_MSGPACK)), message)
+        self.assertEqual(decode_payload(pack([1, 2]), "application/msgpack"), [1, 2])
+        self.assertEqual(decode_payload(pack([1, 2]), "msgpack"), [1, 2])
+        properties = Properties(PacketTypes.PUBLISH)
+        properties.UserProperty = ("content-type", "application/msgpack")
+        self.assertEqual(content_type_of(properties), "application/msgpack")
+        self.assertIsNone(content_type_of(None))
+        self.assertEqual(describe_payload(b'{"name": "l1"}'), '{"name": "l1"}')
+        self.assertTrue(describe_payload(pack({"name": "l1"})).startswith('{"name": "l1"} (msgpack'))
+
+    def test_invalid_payloads(self):
+        for payload in (b"\x82\xa4name", b"\x81\xc1\x00", pack({}) + b"\x00", b"not json"):
+            with self.assertRaises(ValueError):
+                decode_payload(payload)
+        with self.assertRaises(ValueError):
+            PayloadCache(encoding="cbor")
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,119 @@
+'''
+test cases :
+1   PROFILE selects cProfile, the sampling profiler, or no profiling
+2   Stage timers accumulate count, mean and max per stage
+3   The report window is reset after each periodic report
+4   A cProfile session writes a loadable stats file on every dump and records nothing after stop()
+5   A sampling session writes collapsed stacks of every thread, rooted at the thread name
+6   Without PROFILE a no-op session is returned
+'''
+import sys
+import os
+import io
+import pstats
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+import unittest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.profiling import profile_mode, StageTimers, ProfileSession, NullProfileSession, start_profile_session
+
+def after_stop():
+    return sum(range(10))
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self._original_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+
+    def tearDown(self):
+        sys.stdout = self._original_stdout
+
+    def test_profile_mode_from_env(self):
+        with patch.dict(os.environ, {"PROFILE": "1"}):
+            self.assertEqual(profile_mode(), "cprofile")
+        with patch.dict(os.environ, {"PROFILE": "sample"}):
+            self.assertEqual(profile_mode(), "sample")
+        with patch.dict(os.environ, {"PROFILE": ""}):
+            self.assertIsNone(profile_mode())
+
+    def test_stage_timers(self):
+        timers = StageTimers("test")
+        timers.add("stt", 0.2)
+        timers.add("stt", 0.4)
+        with timers.stage("nlu"):
+            pass
+        stats = timers.summary()
+        self.assertEqual(stats["stt"]["count"], 2)
+        self.assertAlmostEqual(stats["stt"]["mean_ms"], 300.0)
+        self.assertAlmostEqual(stats["stt"]["max_ms"], 400.0)
+        self.assertEqual(stats["nlu"]["count"], 1)
+
+    def test_stage_timers_window_reset(self):
+        timers = StageTimers("test", report_interval=10)
+        timers.add("capture", 0.01)
+        timers.maybe_report(now=time.monotonic() + 11)
+        self.assertEqual(timers.summary(window=True), {})
+        self.assertEqual(timers.summary()["capture"]["count"], 1)
+
+    def test_cprofile_session_dumps(self):
+        session = ProfileSession("unit", "cprofile", out_dir=self.out_dir, dump_interval=1000).start()
+        sum(range(1000))
+        first = session.dump()
+        profiler = session._profiler
+        session.stop()
+        after_stop()
+        self.assertEqual(session.dumps, 2)
+        self.assertGreater(pstats.Stats(first).total_calls, 0)
+        recorded = {function for _, _, function in pstats.Stats(profiler).stats}
+        self.assertNotIn("after_stop", recorded)
+
+    def test_sampling_session_dumps(self):
+        session = ProfileSession("unit", "sample", out_dir=self.out_dir, dump_interval=1000).start()
+        def worker_busy_loop():
+            deadline = time.monotonic() + 0.1
+            while time.monotonic() < deadline:
+                sum(range(100))
+
+        worker = threading.Thread(target=worker_busy_loop, name="unit-worker")
+        worker.start()
+        worker_busy_loop()
+        worker.join()
+        session.stop()
+        path = os.path.join(self.out_dir, f"unit-{os.getpid()}-001.folded")
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any(line.startswith("MainThread;") and "test_sampling_session_dumps" in line for line in lines))
+        self.assertTrue(any(line.startswith("unit-worker;") and "worker_busy_loop" in line for line in lines))
+        self.assertFalse(any(line.startswith("sampling-profiler;") for line in lines))
+
+    def test_disabled_session(self):
+        with patch.dict(os.environ, {"PROFILE": ""}):
+            session = start_profile_session("unit")
+        self.assertIsInstance(session, NullProfileSession)
+        session.maybe_dump()
+        session.stop()
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
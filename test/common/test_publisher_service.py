@@ -0,0 +1,94 @@
+'''
+test cases :
+1   QueuePublisher puts the message on the queue with its source and returns a paho-like success result
+2   QueuePublisher reports an error instead of blocking when the queue is full
+3   QueuePublisher reports the connection state kept by the service
+4   The service publishes queued messages on its single client and counts them per source
+5   The service records the time until paho confirms the publish (on_publish)
+6   A failed publish is counted as failed
+'''
+import sys
+import os
+import io
+import queue
+import time
+import unittest
+from unittest.mock import MagicMock
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.publisher_service import QueuePublisher, PublisherService
+from fakes import SharedFlag
+
+class TestPublisherService(unittest.TestCase):
+    def setUp(self):
+        self.queue = queue.Queue(maxsize=2)
+        self.connected = SharedFlag(1)
+        self.service = PublisherService(self.queue, self.connected)
+        self.service.client = MagicMock()
+        self._original_stderr = sys.stderr
+        sys.stderr = io.StringIO()
+
+    def tearDown(self):
+        sys.stderr = self._original_stderr
+
+    def test_queue_publisher_enqueues(self):
+        publisher = QueuePublisher(self.queue, self.connected, "gesture")
+        result = publisher.publish("central_main/control", '{"name": "l1", "state": "on"}')
+        self.assertEqual(result.rc, 0)
+        self.assertEqual(result[0], 0)
+        source, topic, payload, qos, retain, enqueued = self.queue.get_nowait()
+        self.assertEqual((source, topic, qos, retain), ("gesture", "central_main/control", 0, False))
+        self.assertEqual(payload, '{"name": "l1", "state": "on"}')
+
+    def test_queue_publisher_full_queue(self):
+        publisher = QueuePublisher(self.queue, self.connected, "voice")
+        publisher.publish("t", "1")
+        publisher.publish("t", "2")
+        result = publisher.publish("t", "3")
+        self.assertNotEqual(result.rc, 0)
+
+    def test_queue_publisher_connection_state(self):
+        publisher = QueuePublisher(self.queue, self.connected, "voice")
+        self.assertTrue(publisher.is_connected())
+        self.connected.value = 0
+        self.assertFalse(publisher.is_connected())
+
+    def test_service_publishes_and_counts(self):
+        self.service.client.publish.return_value = MagicMock(rc=0, mid=7)
+        self.service.handle(("voice", "central_main/control", "payload", 0, False, time.monotonic()))
+        self.service.client.publish.assert_called_once_with("central_main/control", "payload", qos=0, retain=False)
+        self.assertEqual(self.service.published["voice"], 1)
+        self.assertEqual(self.service.timers.summary()["queue"]["count"], 1)
+
+    def test_service_records_publish_confirmation(self):
+        self.service.client.publish.return_value = MagicMock(rc=0, mid=3)
+        self.service.handle(("gesture", "t", "p", 0, False, time.monotonic() - 0.05))
+        self.service._on_publish(self.service.client, None, 3, 0, None)
+        ack = self.service.timers.summary()["ack"]
+        self.assertEqual(ack["count"], 1)
+        self.assertGreaterEqual(ack["mean_ms"], 50.0)
+
+    def test_service_counts_failures(self):
+        self.service.client.publish.return_value = MagicMock(rc=4, mid=0)
+        self.service.handle(("gesture", "t", "p", 0, False, time.monotonic()))
+        self.assertEqual(self.service.failed, 1)
+        self.assertEqual(sum(self.service.published.values()), 0)
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,86 @@
+'''
+test cases :
+1   A token bucket refills at its rate and never beyond its burst
+2   Each device has its own bucket; the source bucket limits all devices together
+3   Commands over the limit are coalesced to the latest per device and released after refill
+4   A command allowed while an older one is deferred makes the deferred one obsolete
+5   Deferred commands past their validity are dropped; a zero rate disables a bucket
+'''
+import sys
+import os
+import unittest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.rate_limit import RateLimiter, TokenBucket
+
+TOPIC = "central_main/control"
+
+def command(name, state):
+    return {"name": name, "state": state}
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+        self.assertTrue(bucket.take(0.0))
+        self.assertTrue(bucket.take(0.0))
+        self.assertFalse(bucket.take(0.0))
+        self.assertTrue(bucket.take(0.5))
+        bucket.refill(100.0)
+        self.assertEqual(bucket.tokens, 2.0)
+
+    def test_device_and_source_buckets(self):
+        limiter = RateLimiter("gesture", device_limit=(1.0, 2), source_limit=(1.0, 3))
+        self.assertTrue(limiter.allow(TOPIC, command("l1", "on"), now=0.0))
+        self.assertTrue(limiter.allow(TOPIC, command("l1", "off"), now=0.0))
+        self.assertFalse(limiter.allow(TOPIC, command("l1", "on"), now=0.0))
+        self.assertTrue(limiter.allow(TOPIC, command("l2", "on"), now=0.0))
+        self.assertFalse(limiter.allow(TOPIC, command("l3", "on"), now=0.0))
+        self.assertEqual(limiter.limited, {"l1": 1, "l3": 1})
+        self.assertEqual(limiter.allowed, 3)
+
+    def test_coalesce_and_release(self):
+        limiter = RateLimiter("voice", device_limit=(1.0, 1), source_limit=(0, 0))
+        self.assertTrue(limiter.allow(TOPIC, command("l1", "on"), now=0.0))
+        self.assertFalse(limiter.allow(TOPIC, command("l1", "off"), now=0.1))
+        self.assertFalse(limiter.allow(TOPIC, command("l1", "on"), now=0.2))
+        self.assertEqual(limiter.deferred, 1)
+        self.assertEqual(limiter.release(now=0.5), [])
+        self.assertEqual(limiter.release(now=1.0), [(TOPIC, command("l1", "on"))])
+        self.assertEqual((limiter.coalesced, limiter.released, limiter.deferred), (1, 1, 0))
+
+    def test_newer_command_replaces_deferred(self):
+        limiter = RateLimiter("voice", device_limit=(1.0, 1), source_limit=(0, 0))
+        limiter.allow(TOPIC, command("l1", "on"), now=0.0)
+        limiter.allow(TOPIC, command("l1", "off"), now=0.1)
+        self.assertTrue(limiter.allow(TOPIC, command("l1", "on"), now=1.5))
+        self.assertEqual(limiter.release(now=10.0), [])
+        self.assertEqual(limiter.coalesced, 1)
+
+    def test_expiry_and_disabled(self):
+        limiter = RateLimiter("gesture", device_limit=(0.01, 1), source_limit=(0, 0))
+        limiter.allow(TOPIC, command("Front Door", "lock"), now=0.0)
+        limiter.allow(TOPIC, command("Front Door", "unlock"), now=0.0)
+        self.assertEqual(limiter.release(now=31.0), [])
+        self.assertEqual(limiter.expired, 1)
+        unlimited = RateLimiter("gesture", device_limit=(0, 0), source_limit=(0, 0))
+        self.assertFalse(unlimited.enabled)
+        self.assertTrue(all(unlimited.allow(TOPIC, command("l1", "on"), now=0.0) for _ in range(100)))
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,107 @@
+'''
+test cases :
+1   With a zero window nothing is suppressed
+2   A repeated command for a device in the recorded state is suppressed within the window
+3   A command for a different state, or after the window, is passed
+4   JSON and MessagePack payloads are matched like command dicts; other payloads are never suppressed
+5   Invalidating a device lets the next command through
+6   The publisher service drops suppressed commands and counts them
+7   With device routing and the legacy mirror the publisher service sends a command to both topics once
+'''
+import sys
+import os
+import json
+import queue
+import time
+import unittest
+from unittest.mock import MagicMock
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.payloads import encode_command, ENCODING_MSGPACK
+from common.state_cache import DeviceStateCache
+from common.publisher_service import PublisherService
+from common.topics import TopicRouter, ROUTING_DEVICE
+from fakes import SharedFlag
+
+LIGHTS_ON = {"name": "CMD_LIGHT_ALL", "state": "on"}
+LIGHTS_OFF = {"name": "CMD_LIGHT_ALL", "state": "off"}
+
+class TestDeviceStateCache(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        cache = DeviceStateCache()
+        cache.record(LIGHTS_ON)
+        self.assertFalse(cache.enabled)
+        self.assertFalse(cache.should_suppress(LIGHTS_ON))
+
+    def test_repeat_suppressed_within_window(self):
+        cache = DeviceStateCache(window=10)
+        cache.record(LIGHTS_ON, now=100.0)
+        self.assertTrue(cache.should_suppress(LIGHTS_ON, now=105.0))
+        self.assertEqual(cache.suppressed["CMD_LIGHT_ALL"], 1)
+
+    def test_different_state_or_expired_window_passes(self):
+        cache = DeviceStateCache(window=10)
+        cache.record(LIGHTS_ON, now=100.0)
+        self.assertFalse(cache.should_suppress(LIGHTS_OFF, now=101.0))
+        self.assertFalse(cache.should_suppress(LIGHTS_ON, now=111.0))
+        self.assertEqual(cache.passed, 2)
+
+    def test_json_payloads(self):
+        cache = DeviceStateCache(window=10)
+        cache.record('{"name": "l1", "state": "on"}')
+        self.assertTrue(cache.should_suppress(b'{"name": "l1", "state": "on"}'))
+        self.assertTrue(cache.should_suppress(encode_command("l1", "on", ENCODING_MSGPACK)))
+        self.assertFalse(cache.should_suppress("not json"))
+        self.assertEqual(cache.state("l1"), "on")
+
+    def test_invalidate(self):
+        cache = DeviceStateCache(window=10)
+        cache.record(LIGHTS_ON)
+        cache.invalidate("CMD_LIGHT_ALL")
+        self.assertFalse(cache.should_suppress(LIGHTS_ON))
+
+    def test_publisher_service_suppresses(self):
+        service = PublisherService(queue.Queue(), SharedFlag(1), state_cache=DeviceStateCache(window=10))
+        service.client = MagicMock()
+        service.client.publish.return_value = MagicMock(rc=0, mid=1)
+        payload = '{"name": "CMD_LIGHT_ALL", "state": "on"}'
+        service.handle(("gesture", "central_main/control", payload, 0, False, time.monotonic()))
+        service.handle(("voice", "central_main/control", payload, 0, False, time.monotonic()))
+        service.client.publish.assert_called_once()
+        self.assertEqual(service.published["gesture"], 1)
+        self.assertEqual(service.state_cache.suppressed["CMD_LIGHT_ALL"], 1)
+
+    def test_publisher_service_device_routing_with_mirror(self):
+        service = PublisherService(queue.Queue(), SharedFlag(1), state_cache=DeviceStateCache(window=10))
+        service.client = MagicMock()
+        service.client.publish.return_value = MagicMock(rc=0, mid=1)
+        router = TopicRouter(ROUTING_DEVICE, mirror_legacy=True)
+        payload = '{"name": "CMD_LIGHT_ALL", "state": "on"}'
+        for _ in range(2):   # The second command is a repeat on both topics
+            for topic in router.topics("central_main/control", json.loads(payload)):
+                service.handle(("voice", topic, payload, 0, False, time.monotonic()))
+        self.assertEqual([c.args[0] for c in service.client.publish.call_args_list],
+                         ["home/light_all/set", "central_main/control"])
+        self.assertEqual(service.state_cache.suppressed["CMD_LIGHT_ALL"], 2)
+        service.state_cache.invalidate("CMD_LIGHT_ALL")
+        self.assertFalse(service.state_cache.should_suppress(payload, topic="central_main/control"))
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
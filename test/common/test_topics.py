@@ -0,0 +1,67 @@
+'''
+test cases :
+1   Device names become lower-case topic levels without the CMD_ prefix
+2   Consumers subscribe to all devices with one wildcard, or to the topics of their devices
+3   In "legacy" routing every command keeps the topic the caller passed
+4   In "device" routing a command goes to its device topic, plus the legacy topic as a mirror
+5   An unknown routing mode is rejected
+'''
+import sys
+import os
+import unittest
+
+import paho.mqtt.client as mqtt
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.topics import TopicRouter, device_id, device_subscriptions, ROUTING_DEVICE, ROUTING_LEGACY
+
+LEGACY = "central_main/control"
+
+class TestTopicRouter(unittest.TestCase):
+    def test_device_id(self):
+        self.assertEqual(device_id("Front Door"), "front_door")
+        self.assertEqual(device_id("CMD_LIGHT_ALL"), "light_all")
+        self.assertEqual(device_id("l1"), "l1")
+        self.assertEqual(device_id("Garage/Door #2"), "garage_door_2")
+
+    def test_subscriptions(self):
+        self.assertEqual(device_subscriptions(), ["home/+/set"])
+        self.assertEqual(device_subscriptions(["Front Door", "l1"]), ["home/front_door/set", "home/l1/set"])
+        self.assertTrue(mqtt.topic_matches_sub(device_subscriptions()[0], "home/front_door/set"))
+
+    def test_legacy_routing(self):
+        router = TopicRouter(ROUTING_LEGACY, [("Front Door", "lock")])
+        self.assertFalse(router.enabled)
+        self.assertEqual(router.topics(LEGACY, {"name": "Front Door", "state": "lock"}), (LEGACY,))
+
+    def test_device_routing(self):
+        router = TopicRouter(ROUTING_DEVICE, [("Front Door", "lock"), ("Front Door", "unlock"), ("l1", "on")])
+        self.assertEqual(router.device_topics(), ["home/front_door/set", "home/l1/set"])
+        self.assertEqual(router.topics(LEGACY, {"name": "l1", "state": "on"}), ("home/l1/set", LEGACY))
+        self.assertEqual(router.topics(LEGACY, {"name": "fan", "state": "on"}), ("home/fan/set", LEGACY))
+        self.assertEqual(router.topics(LEGACY, {"device_id": "unknown"}), (LEGACY,))
+        router = TopicRouter(ROUTING_DEVICE, prefix="flat1", mirror_legacy=False)
+        self.assertEqual(router.topics(LEGACY, {"name": "l1", "state": "on"}), ("flat1/l1/set",))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            TopicRouter("per-room")
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
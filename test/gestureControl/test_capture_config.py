@@ -0,0 +1,96 @@
+'''
+test cases :
+1   open_capture requests FOURCC, resolution, FPS and buffer size on the selected backend
+2   The GStreamer backend builds an MJPG pipeline with a dropping appsink
+3   probe_capture reports throughput and read latency for a working camera
+4   probe_capture reports a failure when the camera cannot be opened
+5   best_settings prefers configurations without stale frames
+'''
+import sys
+import os
+from unittest.mock import patch
+import unittest
+import numpy as np  # Import NumPy to create mock images
+
+# Add the parent directory of 'gestureControl' to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..','..')))
+
+from gestureControl import capture_config
+from gestureControl.capture_config import CaptureSettings, open_capture, gstreamer_pipeline, probe_capture, best_settings
+
+class TestCaptureConfig(unittest.TestCase):
+
+    def test_open_capture_applies_settings(self):
+        settings = CaptureSettings(backend="v4l2", fourcc="MJPG", width=320, height=240, fps=15, buffer_size=1)
+        with patch('gestureControl.capture_config.cv2.VideoCapture') as MockVideoCapture:
+            mock_video_instance = MockVideoCapture.return_value
+            open_capture(settings)
+
+        MockVideoCapture.assert_called_once_with(0, capture_config.cv2.CAP_V4L2)
+        applied = {call.args[0]: call.args[1] for call in mock_video_instance.set.call_args_list}
+        cv2 = capture_config.cv2
+        self.assertEqual(applied[cv2.CAP_PROP_FOURCC], cv2.VideoWriter_fourcc(*"MJPG"))
+        self.assertEqual(applied[cv2.CAP_PROP_FRAME_WIDTH], 320)
+        self.assertEqual(applied[cv2.CAP_PROP_FRAME_HEIGHT], 240)
+        self.assertEqual(applied[cv2.CAP_PROP_FPS], 15)
+        self.assertEqual(applied[cv2.CAP_PROP_BUFFERSIZE], 1)
+
+    def test_gstreamer_pipeline(self):
+        pipeline = gstreamer_pipeline(CaptureSettings(backend="gstreamer", fourcc="MJPG", width=640, height=480, fps=30))
+        self.assertIn("image/jpeg,width=640,height=480,framerate=30/1", pipeline)
+        self.assertIn("jpegdec", pipeline)
+        self.assertIn("appsink drop=true max-buffers=1", pipeline)
+
+    def test_probe_capture_success(self):
+        with patch('gestureControl.capture_config.cv2.VideoCapture') as MockVideoCapture, \
+             patch('gestureControl.capture_config.time.sleep'):
+            mock_video_instance = MockVideoCapture.return_value
+            mock_video_instance.isOpened.return_value = True
+            mock_video_instance.read.return_value = (True, np.zeros((480, 640, 3), dtype=np.uint8))
+            mock_video_instance.get.return_value = 0
+            result = probe_capture(CaptureSettings(backend="v4l2"), frames=10, idle_checks=2)
+
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["frames"], 10)
+        self.assertGreater(result["fps"], 0)
+        self.assertIn("read_p95_ms", result)
+        mock_video_instance.release.assert_called_once()
+
+    def test_probe_capture_not_opened(self):
+        with patch('gestureControl.capture_config.cv2.VideoCapture') as MockVideoCapture:
+            mock_video_instance = MockVideoCapture.return_value
+            mock_video_instance.isOpened.return_value = False
+            result = probe_capture(CaptureSettings(backend="v4l2"))
+
+        self.assertFalse(result["ok"])
+        mock_video_instance.release.assert_called_once()
+
+    def test_best_settings_prefers_fresh_frames(self):
+        buffered = CaptureSettings(buffer_size=0)
+        fresh = CaptureSettings(buffer_size=1)
+        results = [
+            {"settings": buffered, "ok": True, "stale_reads": 4, "fps": 30.0, "read_mean_ms": 1.0},
+            {"settings": fresh, "ok": True, "stale_reads": 0, "fps": 29.8, "read_mean_ms": 30.0},
+            {"settings": CaptureSettings(backend="gstreamer"), "ok": False, "error": "no frames"},
+        ]
+        self.assertEqual(best_settings(results), fresh)
+
+if __name__ == '__main__':
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    class CustomTestRunner(unittest.TextTestRunner):
+        resultclass = CustomTestResult
+
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestCaptureConfig)
+    CustomTestRunner(verbosity=0).run(suite)
@@ -0,0 +1,115 @@
+'''
+test cases :
+1   A frame written to the bus is readable by an attached reader without copying
+2   Frames handed to readers are read-only views into shared memory
+3   A reader can detect that the slot of its frame has been overwritten
+4   read_after waits for a newer frame and returns None when the writer has closed the bus
+5   FrameBusCapture behaves like cv2.VideoCapture for the gesture loop
+6   FrameBusCapture waits for the first frame of a capture process that starts late
+'''
+import sys
+import os
+import threading
+import time
+import unittest
+import numpy as np  # Import NumPy to create mock images
+
+# Add the parent directory of 'gestureControl' to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..','..')))
+
+from gestureControl.frame_bus import FrameBus, FrameBusCapture
+
+class TestFrameBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = FrameBus.create((48, 64, 3), slots=3)
+        self.reader = FrameBus.attach(self.bus.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.bus.close()
+        self.bus.unlink()
+
+    def _frame(self, value):
+        return np.full((48, 64, 3), value, dtype=np.uint8)
+
+    def test_write_and_read_latest(self):
+        self.assertIsNone(self.reader.latest())
+        seq = self.bus.write(self._frame(7), timestamp=12.5)
+
+        latest_seq, timestamp, view = self.reader.latest()
+        self.assertEqual(latest_seq, seq)
+        self.assertEqual(timestamp, 12.5)
+        self.assertTrue(np.all(view == 7))
+        self.assertFalse(view.flags.owndata)
+
+    def test_frames_are_read_only(self):
+        self.bus.write(self._frame(1))
+        _, _, view = self.reader.latest()
+        with self.assertRaises(ValueError):
+            view[0, 0, 0] = 5
+
+    def test_overwritten_slot_detected(self):
+        first = self.bus.write(self._frame(1))
+        self.assertTrue(self.reader.is_current(first))
+        for value in range(2, 5):
+            self.bus.write(self._frame(value))
+        self.assertFalse(self.reader.is_current(first))
+
+    def test_read_after_and_close(self):
+        seq = self.bus.write(self._frame(3))
+        self.assertIsNone(self.reader.read_after(seq, timeout=0.01))
+        newer = self.bus.write(self._frame(4))
+        self.assertEqual(self.reader.read_after(seq, timeout=0.01)[0], newer)
+        self.bus.mark_closed()
+        self.assertIsNone(self.reader.read_after(newer, timeout=1.0))
+
+    def test_frame_bus_capture(self):
+        cap = FrameBusCapture(FrameBus.attach(self.bus.name), timeout=0.01, startup_timeout=0.01)
+        self.assertTrue(cap.isOpened())
+        self.assertEqual(cap.read(), (False, None))
+
+        self.bus.write(self._frame(9), timestamp=3.0)
+        success, image = cap.read()
+        self.assertTrue(success)
+        self.assertEqual(image.shape, (48, 64, 3))
+        self.assertEqual(cap.last_timestamp, 3.0)
+
+        del image
+        self.bus.mark_closed()
+        self.assertFalse(cap.isOpened())
+        cap.release()
+
+    def test_capture_starts_late(self):
+        cap = FrameBusCapture(FrameBus.attach(self.bus.name), timeout=0.01, startup_timeout=5.0)
+        producer = threading.Timer(0.3, lambda: self.bus.write(self._frame(5)))  # Still importing main.py
+        start = time.monotonic()
+        producer.start()
+        success, image = cap.read()
+        self.assertTrue(success)
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+        self.assertEqual(image[0, 0, 0], 5)
+        del image
+        self.assertEqual(cap.read(), (False, None))  # Later frames use the normal timeout
+        producer.join()
+        cap.release()
+
+if __name__ == '__main__':
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    class CustomTestRunner(unittest.TextTestRunner):
+        resultclass = CustomTestResult
+
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestFrameBus)
+    CustomTestRunner(verbosity=0).run(suite)
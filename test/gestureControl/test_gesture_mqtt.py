@@ -9,6 +9,9 @@ test cases :
 7   Test detection of number one gesture (index finger up) with mock hand landmarks	Gesture is correctly identified as number one	
 8   Test detection of number two gesture (victory sign) with mock hand landmarks	Gesture is correctly identified as number two	
 9   Test detection of rock on gesture (index and pinky up) with mock hand landmarks	Gesture is correctly identified as rock on
+10  publish_message delivers the command to a subscriber through the in-process broker
+11  In "device" topic routing, a subscriber of home/front_door/set receives only the door commands
+12  With the shared publisher's client (main.py mode 3), a gesture command's capture->publish latency is recorded
 '''
 import sys
 import os
@@ -19,6 +22,13 @@ import numpy as np  # Import NumPy to create mock images
 # Add the parent directory of 'gestureControl' to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..','..')))
 
+import paho.mqtt.client as mqtt
+
+import gestureControl.gesture_mqtt as gesture_mqtt
+from common.latency import LatencyTracer, GESTURE_STAGES
+from common.local_broker import LocalBroker
+from common.publisher_service import QueuedMessageInfo
+from common.topics import TopicRouter, ROUTING_DEVICE
 from gestureControl.gesture_mqtt import main, is_thumb_up, is_thumb_down, is_open_palm, is_number_one, is_number_two, is_rock_on
 
 class TestGestureMQTT(unittest.TestCase):
@@ -39,7 +49,7 @@ class TestGestureMQTT(unittest.TestCase):
                     main()
 
             # Verify that the MQTT client methods were called
-            mock_client_instance.connect.assert_called_once()
+            mock_client_instance.connect_async.assert_called_once()
             mock_client_instance.loop_start.assert_called_once()
             mock_client_instance.loop_stop.assert_called_once()
             mock_client_instance.disconnect.assert_called_once()
@@ -204,6 +214,66 @@ class TestGestureMQTT(unittest.TestCase):
             result = is_rock_on(mock_landmarks, mock_image)
             self.assertTrue(result)
 
+    def test_publish_message_through_local_broker(self):
+        with LocalBroker() as broker:
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+            client.connect("127.0.0.1", broker.port)
+            client.loop_start()
+            try:
+                with patch.object(gesture_mqtt, 'client', client), patch.object(gesture_mqtt, 'outbox', None), \
+                     patch.object(gesture_mqtt, 'state_cache', None), patch.object(gesture_mqtt, 'mqtt5', None):
+                    gesture_mqtt.publish_message("central_main/control", {"name": "Front Door", "state": "unlock"})
+                self.assertTrue(broker.wait_for_messages(1))
+            finally:
+                client.disconnect()
+                client.loop_stop()
+        self.assertEqual(broker.messages[0].topic, "central_main/control")
+        self.assertEqual(broker.messages[0].payload, b'{"name": "Front Door", "state": "unlock"}')
+
+    def test_publish_message_device_routing(self):
+        with LocalBroker() as broker:
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+            client.connect("127.0.0.1", broker.port)
+            client.loop_start()
+            try:
+                with patch.object(gesture_mqtt, 'client', client), patch.object(gesture_mqtt, 'outbox', None), \
+                     patch.object(gesture_mqtt, 'state_cache', None), patch.object(gesture_mqtt, 'mqtt5', None), \
+                     patch.object(gesture_mqtt, 'GESTURE_TOPICS', TopicRouter(ROUTING_DEVICE, mirror_legacy=False)):
+                    gesture_mqtt.publish_message("central_main/control", {"name": "Front Door", "state": "lock"})
+                    gesture_mqtt.publish_message("central_main/control", {"name": "CMD_LIGHT_ALL", "state": "on"})
+                self.assertTrue(broker.wait_for_messages(2))
+            finally:
+                client.disconnect()
+                client.loop_stop()
+        self.assertEqual([message.topic for message in broker.messages], ["home/front_door/set", "home/light_all/set"])
+
+    def test_main_shared_client_records_latency(self):
+        shared_client = MagicMock()
+        shared_client.is_connected.return_value = True
+        shared_client.publish.return_value = QueuedMessageInfo(0)  # QueuePublisher: no mid, no on_publish
+        tracer = LatencyTracer("gesture", GESTURE_STAGES)
+        results = MagicMock()
+        results.multi_hand_landmarks = [MagicMock()]
+        command = ("DOOR UNLOCK", {"name": "front_door", "state": "unlock"})
+
+        with patch('gestureControl.gesture_mqtt.cv2.VideoCapture') as MockVideoCapture, \
+             patch.object(gesture_mqtt, 'latency_tracer', tracer), \
+             patch.object(gesture_mqtt, 'outbox', None), \
+             patch.object(gesture_mqtt.hands, 'process', return_value=results), \
+             patch('gestureControl.gesture_mqtt.mp_drawing.draw_landmarks'), \
+             patch('gestureControl.gesture_mqtt.debug_finger_positions'), \
+             patch('gestureControl.gesture_mqtt.classify_gesture', return_value=command), \
+             patch('gestureControl.gesture_mqtt.cv2.imshow'), \
+             patch('gestureControl.gesture_mqtt.cv2.waitKey', return_value=27):
+            mock_video_instance = MockVideoCapture.return_value
+            mock_video_instance.isOpened.return_value = True
+            mock_video_instance.read.return_value = (True, np.zeros((480, 640, 3), dtype=np.uint8))
+            main(mqtt_client=shared_client)
+
+        shared_client.publish.assert_any_call(gesture_mqtt.mqtt_topic, b'{"name": "front_door", "state": "unlock"}')
+        self.assertEqual(tracer.segments["capture->publish"].count, 1)
+        self.assertEqual(tracer._pending, {})
+
 if __name__ == '__main__':
     class CustomTestResult(unittest.TextTestResult):
         def addSuccess(self, test):
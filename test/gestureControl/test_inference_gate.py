@@ -0,0 +1,81 @@
+'''
+test cases :
+1   In "full" mode inference runs on every frame, even during the cooldown
+2   In "skip" mode no inference runs during the cooldown until the resume margin is reached
+3   In "thin" mode inference runs on every Nth cooldown frame
+4   The summary estimates the saved inference time from the average inference cost
+5   An unknown mode is rejected
+'''
+import sys
+import os
+import unittest
+
+# Add the parent directory of 'gestureControl' to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..','..')))
+
+from gestureControl.inference_gate import InferenceGate
+
+class TestInferenceGate(unittest.TestCase):
+
+    def test_full_mode_always_infers(self):
+        gate = InferenceGate("full")
+        cooldown_end = 10.0
+        self.assertTrue(all(gate.should_infer(9.0, cooldown_end) for _ in range(5)))
+        self.assertEqual(gate.skipped, 0)
+
+    def test_skip_mode_resumes_before_cooldown_end(self):
+        gate = InferenceGate("skip", resume_margin=0.3)
+        cooldown_end = 10.0
+        self.assertFalse(gate.should_infer(9.0, cooldown_end))
+        self.assertFalse(gate.should_infer(9.6, cooldown_end))
+        self.assertTrue(gate.should_infer(9.8, cooldown_end))
+        self.assertTrue(gate.should_infer(10.5, cooldown_end))
+        self.assertEqual(gate.skipped, 2)
+        self.assertFalse(gate.reuse_results)
+
+    def test_thin_mode_infers_every_nth_frame(self):
+        gate = InferenceGate("thin", thin_stride=3, resume_margin=0.0)
+        cooldown_end = 10.0
+        decisions = [gate.should_infer(9.0, cooldown_end) for _ in range(6)]
+        self.assertEqual(decisions, [False, False, True, False, False, True])
+        self.assertEqual(gate.skipped, 4)
+        self.assertTrue(gate.reuse_results)
+
+    def test_summary_estimates_saved_time(self):
+        gate = InferenceGate("skip", resume_margin=0.0)
+        gate.should_infer(20.0, 10.0)
+        gate.record_inference(0.02)
+        gate.should_infer(20.0, 10.0)
+        gate.record_inference(0.04)
+        for _ in range(4):
+            gate.should_infer(5.0, 10.0)
+
+        stats = gate.summary()
+        self.assertEqual(stats["skipped"], 4)
+        self.assertAlmostEqual(stats["avg_inference_ms"], 30.0)
+        self.assertAlmostEqual(stats["saved_seconds"], 0.12)
+        self.assertAlmostEqual(stats["saved_percent"], 100.0 * 0.12 / 0.18)
+
+    def test_unknown_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            InferenceGate("sometimes")
+
+if __name__ == '__main__':
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    class CustomTestRunner(unittest.TextTestRunner):
+        resultclass = CustomTestResult
+
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestInferenceGate)
+    CustomTestRunner(verbosity=0).run(suite)
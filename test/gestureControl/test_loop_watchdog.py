@@ -0,0 +1,95 @@
+'''
+test cases :
+1   Stages that finish within their deadline keep the health status "ok" and record their durations
+2   A stage running past its deadline reports "stalled" once, with the stage name, to the health callback
+3   The shared health flag is set to stalled and cleared again when the stage completes
+4   No stage starting for longer than the loop deadline is reported as a "loop" stall
+5   The timing breakdown lists the running stage
+'''
+import sys
+import os
+import io
+from unittest.mock import MagicMock
+import unittest
+
+# Add the parent directory of 'gestureControl' to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..','..')))
+
+from gestureControl.loop_watchdog import LoopWatchdog, HEALTH_OK, HEALTH_STALLED
+
+class TestLoopWatchdog(unittest.TestCase):
+
+    def setUp(self):
+        self.on_health = MagicMock()
+        self.health_value = MagicMock()
+        self.health_value.value = HEALTH_OK
+        self.watchdog = LoopWatchdog(deadlines={"publish": 1.0}, loop_deadline=3.0, health_interval=1000,
+                                     on_health=self.on_health, health_value=self.health_value)
+        self._original_stdout, self._original_stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+
+    def tearDown(self):
+        sys.stdout, sys.stderr = self._original_stdout, self._original_stderr
+
+    def test_healthy_stages(self):
+        with self.watchdog.stage("capture"):
+            pass
+        self.watchdog.check()
+        self.assertEqual(self.watchdog.health()["status"], "ok")
+        self.assertIn("capture", self.watchdog.last_durations)
+        self.on_health.assert_not_called()
+
+    def test_stage_past_deadline_reports_stall_once(self):
+        self.watchdog.enter("publish")
+        started = self.watchdog._current[1]
+        self.watchdog.check(now=started + 1.5)
+        self.watchdog.check(now=started + 2.0)
+
+        self.on_health.assert_called_once()
+        status = self.on_health.call_args.args[0]
+        self.assertEqual(status["status"], "stalled")
+        self.assertEqual(status["stage"], "publish")
+        self.assertEqual(self.watchdog.stalls, 1)
+
+    def test_health_flag_set_and_cleared(self):
+        self.watchdog.enter("publish")
+        self.watchdog.check(now=self.watchdog._current[1] + 5)
+        self.assertEqual(self.health_value.value, HEALTH_STALLED)
+
+        self.watchdog.exit("publish")
+        self.assertEqual(self.health_value.value, HEALTH_OK)
+        self.assertEqual(self.on_health.call_args.args[0]["status"], "ok")
+
+    def test_loop_stall_between_stages(self):
+        with self.watchdog.stage("render"):
+            pass
+        self.watchdog.check(now=self.watchdog.last_heartbeat["render"] + 4)
+        self.assertEqual(self.watchdog.health()["stage"], "loop")
+
+    def test_breakdown_shows_running_stage(self):
+        with self.watchdog.stage("capture"):
+            pass
+        self.watchdog.enter("inference")
+        breakdown = self.watchdog.breakdown()
+        self.assertIn("capture=", breakdown)
+        self.assertIn("inference=RUNNING", breakdown)
+
+if __name__ == '__main__':
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    class CustomTestRunner(unittest.TextTestRunner):
+        resultclass = CustomTestResult
+
+    suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestLoopWatchdog)
+    CustomTestRunner(verbosity=0).run(suite)
@@ -0,0 +1,194 @@
+'''
+test cases :
+1   The asyncio pipeline publishes in recording order, off the event loop, even when the first recognition is the slowest
+2   Recognitions of several commands run concurrently on one event loop
+3   A full queue drops the oldest waiting command and keeps the newest
+4   STT and NLU go through the shared Rhasspy session on worker threads, not on the event loop
+5   capture_commands cuts the blocks of an open stream into one command per utterance
+6   Blocks put after the event loop closed are dropped without an error
+'''
+import sys
+import os
+import io
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rhasspy_voice.async_engine import AsyncUtterancePipeline, BlockQueue, capture_commands
+from rhasspy_voice import voiceControl
+from common.profiling import StageTimers
+
+RATE = 16000
+BLOCK = RATE // 50  # 20 ms
+
+class TestAsyncUtterancePipeline(unittest.TestCase):
+    def setUp(self):
+        self.published = []
+        self.publish_threads = set()
+        self._original_stderr = sys.stderr
+        sys.stderr = io.StringIO()
+
+    def tearDown(self):
+        sys.stderr = self._original_stderr
+
+    def publish(self, utterance, result):
+        self.published.append(result)
+        self.publish_threads.add(threading.current_thread())
+
+    def test_publishes_in_recording_order(self):
+        delays = {"on": 0.2, "off": 0.0, "lock": 0.05}
+
+        async def recognize(utterance):
+            await asyncio.sleep(delays[utterance.audio])
+            return utterance.audio
+
+        async def scenario():
+            pipeline = AsyncUtterancePipeline(recognize, self.publish, workers=3).start()
+            for command in ("on", "off", "lock"):
+                pipeline.submit(command)
+            await pipeline.stop(timeout=5)
+            return pipeline
+
+        pipeline = asyncio.run(scenario())
+        self.assertEqual(self.published, ["on", "off", "lock"])
+        self.assertNotIn(threading.main_thread(), self.publish_threads)
+        self.assertEqual(pipeline.counts["published"], 3)
+        self.assertEqual(pipeline.pending, 0)
+
+    def test_recognitions_run_concurrently(self):
+        async def recognize(utterance):
+            await asyncio.sleep(0.2)
+            return utterance.audio
+
+        async def scenario():
+            pipeline = AsyncUtterancePipeline(recognize, self.publish, workers=4).start()
+            start = time.monotonic()
+            for command in "abcd":
+                pipeline.submit(command)
+            await pipeline.stop(timeout=5)
+            return pipeline, time.monotonic() - start
+
+        pipeline, elapsed = asyncio.run(scenario())
+        self.assertLess(elapsed, 0.6)  # Four 0.2 s recognitions, not 0.8 s in turn
+        self.assertEqual(pipeline.max_in_flight, 4)
+        self.assertEqual(self.published, list("abcd"))
+
+    def test_full_queue_drops_oldest(self):
+        async def recognize(utterance):
+            await asyncio.sleep(0.1)
+            return utterance.audio
+
+        async def scenario():
+            pipeline = AsyncUtterancePipeline(recognize, self.publish, workers=1, queue_size=1).start()
+            pipeline.submit("a")
+            await asyncio.sleep(0.02)  # "a" is being recognized
+            for command in ("b", "c", "d"):
+                pipeline.submit(command)
+            await pipeline.stop(timeout=5)
+            return pipeline
+
+        pipeline = asyncio.run(scenario())
+        self.assertEqual(self.published, ["a", "d"])
+        self.assertEqual(pipeline.counts["dropped"], 2)
+
+class FakeSession:
+    # RhasspySession stand-in answering STT with a transcript and NLU with an intent, from the calling thread
+    def __init__(self):
+        self.threads = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.threads.append(threading.current_thread())
+        response = MagicMock(status_code=200, text="light one on")
+        response.json.return_value = {"intent": {"name": "Light1_On", "confidence": 1.0}}
+        return response
+
+class TestAsyncRecognition(unittest.TestCase):
+    def test_rhasspy_calls_off_the_event_loop(self):
+        session = FakeSession()
+        original_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            with patch.object(voiceControl, "rhasspy_session", return_value=session), \
+                 patch.object(voiceControl, "audio_preprocessor", None), \
+                 patch.object(voiceControl, "local_intents", None), \
+                 patch.object(voiceControl, "intent_cache", None):
+                payload = asyncio.run(voiceControl.recognize_command_async(
+                    np.zeros(1600, dtype=np.int16), voiceControl.latency_tracer.begin(time.monotonic()), StageTimers("test")))
+        finally:
+            sys.stdout = original_stdout
+        self.assertEqual(payload, {"name": "l1", "state": "on"})
+        self.assertEqual(len(session.threads), 2)   # STT and NLU
+        self.assertNotIn(threading.main_thread(), session.threads)
+
+class FakeStream:
+    # Puts pre-recorded blocks from a "PortAudio" thread, like sd.InputStream's callback
+    def __init__(self, blocks, samples):
+        self.blocks = blocks
+        self.samples = samples
+
+    def __enter__(self):
+        def play():
+            for start in range(0, len(self.samples), BLOCK):
+                self.blocks.put(self.samples[start:start + BLOCK].reshape(-1, 1))
+                time.sleep(0.001)
+        threading.Thread(target=play, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class TestCaptureCommands(unittest.TestCase):
+    def test_one_command_per_utterance(self):
+        rng = np.random.default_rng(0)
+        levels = ([0.001] * 10 + [0.3] * 30 + [0.001] * 50) * 2  # Two utterances of 0.6 s in 20 ms blocks
+        samples = np.concatenate([rng.standard_normal(BLOCK) * level for level in levels])
+        samples = (samples * 32767).astype(np.int16)
+        commands = []
+
+        async def on_command(source, audio, endpointer):
+            commands.append((source, endpointer.reason, len(audio)))
+
+        async def scenario():
+            capture = asyncio.create_task(capture_commands(
+                lambda blocks: FakeStream(blocks, samples), "mic 1", RATE, 5, on_command, silence_after=0.5))
+            while len(commands) < 2 and not capture.done():
+                await asyncio.sleep(0.01)
+            capture.cancel()
+            await asyncio.gather(capture, return_exceptions=True)
+
+        asyncio.run(asyncio.wait_for(scenario(), 10))
+        self.assertEqual([(source, reason) for source, reason, _ in commands], [("mic 1", "silence")] * 2)
+
+    def test_block_after_loop_closed(self):
+        loop = asyncio.new_event_loop()
+        blocks = BlockQueue(loop)
+        blocks.put(np.zeros((BLOCK, 1), dtype=np.int16))
+        loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(blocks.queue.qsize(), 1)
+        loop.close()
+        blocks.put(np.zeros((BLOCK, 1), dtype=np.int16))   # A late PortAudio callback
+        self.assertEqual(blocks.queue.qsize(), 1)
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
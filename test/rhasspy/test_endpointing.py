@@ -0,0 +1,92 @@
+'''
+test cases :
+1   Recording stops the configured silence after a spoken command and keeps the pre-roll
+2   A command still going on at the cap stops with "max_duration"
+3   Without speech the whole recording is returned with "no_speech"
+4   A click shorter than the minimum speech time does not start a command
+5   The threshold follows a louder noise floor, so steady background noise is not speech
+6   A command that starts with speech is detected with the noise floor carried over from the previous one
+'''
+import sys
+import os
+import unittest
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rhasspy_voice.endpointing import Endpointer, block_level_db
+
+RATE = 16000
+BLOCK = 480  # 30 ms
+
+def signal(seconds, amplitude, seed=0):
+    # int16 noise of the given amplitude (fraction of full scale)
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * RATE)) * amplitude * 32767).clip(-32768, 32767).astype(np.int16)
+
+def feed(endpointer, audio):
+    for start in range(0, len(audio), BLOCK):
+        if endpointer.feed(audio[start:start + BLOCK]) is not None:
+            break
+    return endpointer.reason
+
+class TestEndpointer(unittest.TestCase):
+    def test_stops_after_silence(self):
+        audio = np.concatenate([signal(0.6, 0.001), signal(0.8, 0.3, seed=1), signal(3.0, 0.001, seed=2)])
+        endpointer = Endpointer(RATE, max_duration=5.0, silence_after=0.5, pre_roll=0.2)
+        self.assertEqual(feed(endpointer, audio), "silence")
+        self.assertAlmostEqual(endpointer.speech_start, 0.6, delta=0.04)
+        self.assertAlmostEqual(endpointer.duration, 1.9, delta=0.07)
+        self.assertAlmostEqual(len(endpointer.audio()) / RATE, 1.9 - 0.4, delta=0.07)
+
+    def test_max_duration(self):
+        endpointer = Endpointer(RATE, max_duration=1.0)
+        self.assertEqual(feed(endpointer, np.concatenate([signal(0.3, 0.001), signal(2.0, 0.3)])), "max_duration")
+        self.assertAlmostEqual(endpointer.duration, 1.0, delta=0.03)
+
+    def test_no_speech(self):
+        endpointer = Endpointer(RATE, max_duration=1.5)
+        self.assertEqual(feed(endpointer, signal(2.0, 0.001)), "no_speech")
+        self.assertFalse(endpointer.speech_detected)
+        self.assertEqual(len(endpointer.audio()), int(1.5 * RATE))
+
+    def test_short_click_ignored(self):
+        audio = np.concatenate([signal(0.3, 0.001), signal(0.06, 0.5), signal(1.0, 0.001)])
+        endpointer = Endpointer(RATE, max_duration=1.0, min_speech=0.15)
+        self.assertEqual(feed(endpointer, audio), "no_speech")
+
+    def test_adaptive_threshold(self):
+        self.assertAlmostEqual(block_level_db(np.full(100, 16384, dtype=np.int16)), -6.02, places=2)
+        noisy_room = signal(3.0, 0.05)
+        endpointer = Endpointer(RATE, max_duration=3.0, min_threshold_db=-60.0)
+        self.assertEqual(feed(endpointer, noisy_room), "no_speech")
+        self.assertGreater(endpointer.threshold_db, block_level_db(noisy_room) + 6)
+
+    def test_starts_with_speech(self):
+        previous = Endpointer(RATE, max_duration=1.0)
+        self.assertEqual(feed(previous, signal(1.5, 0.001)), "no_speech")
+        audio = np.concatenate([signal(0.8, 0.3, seed=1), signal(2.0, 0.001, seed=2)])  # Speaking already
+        endpointer = Endpointer(RATE, max_duration=5.0, silence_after=0.5, noise_floor_db=previous.noise_floor_db)
+        self.assertEqual(feed(endpointer, audio), "silence")
+        self.assertAlmostEqual(endpointer.speech_start, 0.0, delta=0.04)
+        self.assertLess(endpointer.noise_floor_db, -50)
+        self.assertEqual(feed(Endpointer(RATE, max_duration=2.5), audio), "no_speech")  # Without the carried floor
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
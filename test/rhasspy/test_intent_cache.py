@@ -0,0 +1,106 @@
+'''
+test cases :
+1   A stored NLU result is returned for the same transcript in another case or punctuation
+2   Entries older than the TTL are misses
+3   The least recently used entry is evicted when the cache is full
+4   A change of the intent configuration file clears the cache
+5   A snapshot restores the entries after a restart, but not under another configuration
+'''
+import sys
+import os
+import io
+import tempfile
+import unittest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rhasspy_voice.intent_cache import IntentCache
+
+LIGHT_ON = {"intent": {"name": "Light1_On", "confidence": 0.9}}
+LIGHT_OFF = {"intent": {"name": "Light1_Off", "confidence": 0.9}}
+
+class TestIntentCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sentences = os.path.join(self.directory.name, "sentence.ini")
+        with open(self.sentences, "w") as sentences:
+            sentences.write("[Light1_On]\nlight one on\n")
+        self._original_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+
+    def tearDown(self):
+        sys.stdout = self._original_stdout
+        self.directory.cleanup()
+
+    def cache(self, **kwargs):
+        kwargs.setdefault("snapshot_path", None)
+        return IntentCache(config_paths=(self.sentences,), **kwargs)
+
+    def test_hit_after_put(self):
+        cache = self.cache()
+        self.assertIsNone(cache.get("please switch light one on"))
+        cache.put("please switch light one on", LIGHT_ON)
+        self.assertEqual(cache.get("Please switch light ONE on."), LIGHT_ON)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_ttl(self):
+        cache = self.cache(ttl=10)
+        cache.put("lights on", LIGHT_ON, now=100.0)
+        self.assertEqual(cache.get("lights on", now=109.0), LIGHT_ON)
+        self.assertIsNone(cache.get("lights on", now=110.0))
+        self.assertEqual((cache.expired, len(cache)), (1, 0))
+
+    def test_lru_eviction(self):
+        cache = self.cache(max_entries=2)
+        cache.put("a", LIGHT_ON)
+        cache.put("b", LIGHT_OFF)
+        cache.get("a")              # "b" is now the least recently used
+        cache.put("c", LIGHT_ON)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), LIGHT_ON)
+        self.assertEqual(cache.evicted, 1)
+
+    def test_config_change_invalidates(self):
+        cache = self.cache(check_interval=0)
+        cache.put("lights on", LIGHT_ON)
+        self.assertFalse(cache.check_config())
+        with open(self.sentences, "a") as sentences:
+            sentences.write("lights on\n")
+        os.utime(self.sentences, ns=(0, os.stat(self.sentences).st_mtime_ns + 1_000_000))
+        self.assertTrue(cache.check_config())
+        self.assertIsNone(cache.get("lights on"))
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_snapshot(self):
+        path = os.path.join(self.directory.name, "cache", "intents.json")
+        cache = self.cache(snapshot_path=path)
+        cache.put("lights on", LIGHT_ON)
+        cache.put("lights off", LIGHT_OFF)
+        self.assertEqual(cache.save(), 2)
+
+        restarted = self.cache(snapshot_path=path)
+        self.assertEqual(restarted.load(), 2)
+        self.assertEqual(restarted.get("lights off"), LIGHT_OFF)
+
+        with open(self.sentences, "a") as sentences:
+            sentences.write("lights on\n")
+        reconfigured = self.cache(snapshot_path=path)
+        self.assertEqual(reconfigured.load(), 0)
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,103 @@
+'''
+test cases :
+1   Optional parts, alternatives, tags and substitutions of a sentence template are expanded
+2   Every phrase of the shipped sentence.ini resolves locally to a mapped intent
+3   Case, punctuation and extra spaces of a transcript do not prevent a match
+4   A transcript outside sentence.ini is a miss, counted for the report
+5   Rules and slots are left to Rhasspy; a phrase in two intents keeps the first
+6   An edited sentences file is recompiled on the next check, keeping the hit and miss counters
+'''
+import sys
+import os
+import io
+import tempfile
+import time
+import unittest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rhasspy_voice.intent_parser import INTENT_COMMANDS
+from rhasspy_voice.local_intents import LocalIntentRecognizer, expand, load_sentences, SENTENCES_PATH
+
+class TestLocalIntents(unittest.TestCase):
+    def test_expand_template(self):
+        self.assertEqual(sorted(expand("turn (on | off) [the] light")),
+                         ["turn off light", "turn off the light", "turn on light", "turn on the light"])
+        self.assertEqual(expand("switch (kitchen|hall:hallway){room} lamp on"),
+                         ["switch kitchen lamp on", "switch hall lamp on"])
+
+    def test_shipped_sentences(self):
+        recognizer = LocalIntentRecognizer()
+        with open(SENTENCES_PATH, encoding="utf-8") as sentences:
+            lines = [line.strip() for line in sentences if line.strip() and not line.startswith("[")]
+        self.assertEqual(len(recognizer.phrases), len(lines))
+        for phrase, intent in recognizer.phrases.items():
+            self.assertIn(intent, INTENT_COMMANDS)
+        self.assertEqual(recognizer.recognize("l1 on")["intent"]["name"], "Light1_On")
+
+    def test_normalized_match(self):
+        recognizer = LocalIntentRecognizer()
+        result = recognizer.recognize("  Turn OFF light   two. ")
+        self.assertEqual(result["intent"], {"name": "Light2_Off", "confidence": 1.0})
+        self.assertEqual(result["text"], "turn off light two")
+
+    def test_miss_reported(self):
+        recognizer = LocalIntentRecognizer()
+        self.assertIsNone(recognizer.recognize("please turn on the porch light"))
+        self.assertIsNotNone(recognizer.recognize("light one on"))
+        self.assertEqual(recognizer.hit_rate, 0.5)
+        self.assertIn("'please turn on the porch light' x1", recognizer.report())
+
+    def test_rules_slots_and_conflicts(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".ini", delete=False) as sentences:
+            sentences.write("[Lamp_On]\nlamp on\nrooms = (kitchen | hall)\nturn on <rooms> lamp\nset $color\n\n"
+                            "[Lamp_Off]\nlamp on # duplicate\nlamp off\n")
+        original_stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            phrases, skipped = load_sentences(sentences.name)
+        finally:
+            sys.stderr = original_stderr
+            os.unlink(sentences.name)
+        self.assertEqual(phrases, {"lamp on": "Lamp_On", "lamp off": "Lamp_Off"})
+        self.assertEqual(skipped, 3)
+
+    def test_reload_on_change(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".ini", delete=False) as sentences:
+            sentences.write("[Lamp_On]\nlamp on\n")
+        original_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            recognizer = LocalIntentRecognizer(sentences.name, check_interval=5.0)
+            self.assertIsNone(recognizer.recognize("lamp off"))
+            self.assertIsNotNone(recognizer.recognize("lamp on"))
+            with open(sentences.name, "a", encoding="utf-8") as edited:
+                edited.write("\n[Lamp_Off]\nlamp off\n")
+            stat = os.stat(sentences.name)
+            os.utime(sentences.name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertFalse(recognizer.check_reload(now=0.0))   # Not due yet
+            self.assertTrue(recognizer.check_reload(now=time.monotonic() + 6))
+            self.assertFalse(recognizer.check_reload(now=time.monotonic() + 12))   # Unchanged since
+        finally:
+            sys.stdout = original_stdout
+            os.unlink(sentences.name)
+        self.assertEqual(recognizer.recognize("lamp off")["intent"]["name"], "Lamp_Off")
+        self.assertEqual((sum(recognizer.hits.values()), recognizer.misses, recognizer.reloads), (2, 1, 1))
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
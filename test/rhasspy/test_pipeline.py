@@ -0,0 +1,127 @@
+'''
+test cases :
+1   Results are published in recording order even when the first recognition is the slowest
+2   Recognitions of several commands overlap on the worker pool
+3   A command that is not recognized (or fails) does not hold back the ones recorded after it
+4   A full queue drops the oldest waiting command and keeps the newest
+5   Ordering is kept per source; a slow source does not hold back another one
+'''
+import sys
+import os
+import io
+import threading
+import time
+import unittest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rhasspy_voice.pipeline import UtterancePipeline
+
+class TestUtterancePipeline(unittest.TestCase):
+    def setUp(self):
+        self.published = []
+        self._original_stderr = sys.stderr
+        sys.stderr = io.StringIO()
+
+    def tearDown(self):
+        sys.stderr = self._original_stderr
+
+    def publish(self, utterance, result):
+        self.published.append(result)
+
+    def test_publishes_in_recording_order(self):
+        delays = {"on": 0.2, "off": 0.0, "lock": 0.05}
+
+        def recognize(utterance):
+            time.sleep(delays[utterance.audio])
+            return utterance.audio
+
+        pipeline = UtterancePipeline(recognize, self.publish, workers=3).start()
+        for command in ("on", "off", "lock"):
+            pipeline.submit(command)
+        pipeline.stop(timeout=5)
+        self.assertEqual(self.published, ["on", "off", "lock"])
+        self.assertEqual(pipeline.pending, 0)
+
+    def test_recognitions_overlap(self):
+        release = threading.Event()
+
+        def recognize(utterance):
+            release.wait(5)
+            return utterance.audio
+
+        pipeline = UtterancePipeline(recognize, self.publish, workers=2).start()
+        start = time.monotonic()
+        pipeline.submit("a")
+        pipeline.submit("b")
+        self.assertLess(time.monotonic() - start, 0.1)  # submit() never waits for recognition
+        time.sleep(0.1)
+        self.assertEqual(pipeline.max_in_flight, 2)
+        release.set()
+        pipeline.stop(timeout=5)
+        self.assertEqual(self.published, ["a", "b"])
+
+    def test_unrecognized_and_failed_are_skipped(self):
+        def recognize(utterance):
+            if utterance.audio == "boom":
+                time.sleep(0.1)
+                raise RuntimeError("STT unreachable")
+            return None if utterance.audio == "noise" else utterance.audio
+
+        pipeline = UtterancePipeline(recognize, self.publish, workers=2).start()
+        for command in ("boom", "noise", "on"):
+            pipeline.submit(command)
+        pipeline.stop(timeout=5)
+        self.assertEqual(self.published, ["on"])
+        self.assertEqual((pipeline.counts["failed"], pipeline.counts["unrecognized"]), (1, 1))
+
+    def test_full_queue_drops_oldest(self):
+        busy = threading.Event()
+        release = threading.Event()
+
+        def recognize(utterance):
+            busy.set()
+            release.wait(5)
+            return utterance.audio
+
+        pipeline = UtterancePipeline(recognize, self.publish, workers=1, queue_size=2).start()
+        pipeline.submit("first")
+        busy.wait(5)  # "first" is with the worker, the queue holds two more
+        for command in ("second", "third", "fourth"):
+            pipeline.submit(command)
+        release.set()
+        pipeline.stop(timeout=5)
+        self.assertEqual(self.published, ["first", "third", "fourth"])
+        self.assertEqual(pipeline.counts["dropped"], 1)
+
+    def test_order_per_source(self):
+        def recognize(utterance):
+            time.sleep(0.3 if utterance.source == "kitchen" else 0.0)
+            return f"{utterance.source} {utterance.audio}"
+
+        pipeline = UtterancePipeline(recognize, self.publish, workers=2).start()
+        pipeline.submit("on", source="kitchen")
+        pipeline.submit("on", source="hall")
+        pipeline.submit("off", source="hall")
+        time.sleep(0.15)
+        self.assertEqual(self.published, ["hall on", "hall off"])
+        pipeline.stop(timeout=5)
+        self.assertEqual(self.published[-1], "kitchen on")
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
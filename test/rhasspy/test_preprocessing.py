@@ -0,0 +1,91 @@
+'''
+test cases :
+1   A 44.1 kHz recording is resampled to 16 kHz; a 1 kHz tone survives, a 10 kHz tone (above 8 kHz) is filtered out
+2   A DC offset is removed
+3   Leading and trailing silence are trimmed, keeping the padding around the speech
+4   A recording without anything above the silence is left at full length
+5   process_wav() returns a 16 kHz WAV and the report counts the bytes not sent
+'''
+import sys
+import os
+import io
+import unittest
+
+import numpy as np
+from scipy.io import wavfile
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rhasspy_voice.preprocessing import AudioPreprocessor, remove_dc, speech_bounds
+
+def tone(frequency, seconds, rate, amplitude=0.5):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * 32767 * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+def rms(samples):
+    return np.sqrt(np.mean(samples.astype(np.float64) ** 2))
+
+class TestAudioPreprocessor(unittest.TestCase):
+    def test_resample_to_16k(self):
+        preprocessor = AudioPreprocessor(trim=False)
+        kept = preprocessor.process(tone(1000, 1.0, 44100), 44100)
+        filtered = preprocessor.process(tone(10000, 1.0, 44100), 44100)
+        self.assertEqual(len(kept), 16000)
+        self.assertEqual(kept.dtype, np.int16)
+        spectrum = np.abs(np.fft.rfft(kept))
+        self.assertAlmostEqual(np.argmax(spectrum) * 16000 / len(kept), 1000, delta=2)
+        self.assertLess(rms(filtered), rms(kept) / 100)
+
+    def test_remove_dc(self):
+        recording = tone(300, 0.5, 16000, amplitude=0.3) + 8000
+        self.assertAlmostEqual(remove_dc(recording).mean(), 0.0, places=6)
+        processed = AudioPreprocessor(trim=False).process(recording.astype(np.int16), 16000)
+        self.assertLess(abs(processed.mean()), 20)
+
+    def test_trim_silence(self):
+        rate = 16000
+        noise = (np.random.default_rng(0).standard_normal(rate) * 30).astype(np.int16)
+        recording = np.concatenate([noise, tone(440, 0.5, rate), noise, noise])
+        first, last = speech_bounds(remove_dc(recording), rate, pad=0.2)
+        self.assertAlmostEqual(first / rate, 0.8, delta=0.02)
+        self.assertAlmostEqual(last / rate, 1.7, delta=0.02)
+        processed = AudioPreprocessor(pad=0.2).process(recording, rate)
+        self.assertAlmostEqual(len(processed) / rate, 0.9, delta=0.03)
+
+    def test_silence_not_trimmed(self):
+        silence = np.zeros(16000, dtype=np.int16)
+        self.assertEqual(speech_bounds(remove_dc(silence), 16000), (0, 16000))
+        self.assertEqual(len(AudioPreprocessor().process(silence, 16000)), 16000)
+
+    def test_process_wav_and_report(self):
+        buffer = io.BytesIO()
+        wavfile.write(buffer, 44100, np.concatenate([np.zeros(44100, dtype=np.int16), tone(440, 1.0, 44100)]))
+        preprocessor = AudioPreprocessor()
+        processed = preprocessor.process_wav(buffer.getvalue())
+        rate, samples = wavfile.read(io.BytesIO(processed))
+        self.assertEqual(rate, 16000)
+        self.assertAlmostEqual(len(samples) / rate, 1.2, delta=0.03)
+        self.assertEqual(preprocessor.bytes_in, len(buffer.getvalue()))
+        self.assertEqual(preprocessor.bytes_out, len(processed))
+        preprocessor.stt_done(processed, 600.0)
+        report = preprocessor.report()
+        self.assertIn("% less", report)
+        self.assertIn("saved per command", report)
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,104 @@
+'''
+test cases :
+1   Consecutive STT and NLU requests reuse one keep-alive connection
+2   The timeout is chosen by the endpoint path
+3   A 503 from a restarting Rhasspy is retried and the request succeeds
+4   A read timeout is raised to the caller as ReadTimeout, without a retry
+'''
+import sys
+import os
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rhasspy_voice.rhasspy_http import RhasspySession, HTTP_CONNECT_TIMEOUT
+
+class FakeRhasspy(BaseHTTPRequestHandler):
+    # Echoes the body in upper case; /api/busy answers 503 once, /api/slow answers after 0.5 s
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # TCP_NODELAY like real servers: headers and body are separate writes
+    connections = 0
+    hits = {}
+    busy = 0
+
+    def setup(self):
+        FakeRhasspy.connections += 1
+        super().setup()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        FakeRhasspy.hits[self.path] = FakeRhasspy.hits.get(self.path, 0) + 1
+        status, reply = 200, body.upper()
+        if self.path == "/api/busy" and FakeRhasspy.busy:
+            FakeRhasspy.busy -= 1
+            status, reply = 503, b"busy"
+        elif self.path == "/api/slow":
+            time.sleep(0.5)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+class TestRhasspySession(unittest.TestCase):
+    def setUp(self):
+        FakeRhasspy.connections, FakeRhasspy.hits, FakeRhasspy.busy = 0, {}, 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeRhasspy)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.session = RhasspySession(backoff=0, timeouts={"/api/slow": 0.2})
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused(self):
+        for _ in range(3):
+            self.assertEqual(self.session.post(f"{self.url}/api/speech-to-text", data=b"wav").text, "WAV")
+            self.assertEqual(self.session.post(f"{self.url}/api/text-to-intent", data=b"text").text, "TEXT")
+        self.assertEqual(FakeRhasspy.connections, 1)
+        self.assertEqual(self.session.connections, 1)
+        self.assertIn("requests 6", self.session.report())
+
+    def test_timeout_per_endpoint(self):
+        session = RhasspySession()
+        self.assertEqual(session.timeout_for(f"{self.url}/api/speech-to-text"), (HTTP_CONNECT_TIMEOUT, 20))
+        self.assertEqual(session.timeout_for(f"{self.url}/api/text-to-intent"), (HTTP_CONNECT_TIMEOUT, 10))
+
+    def test_gateway_error_retried(self):
+        FakeRhasspy.busy = 1
+        response = self.session.post(f"{self.url}/api/busy", data=b"ok")
+        self.assertEqual((response.status_code, response.text), (200, "OK"))
+        self.assertEqual(FakeRhasspy.hits["/api/busy"], 2)
+
+    def test_read_timeout_not_retried(self):
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.session.post(f"{self.url}/api/slow", data=b"wav")
+        time.sleep(0.4)
+        self.assertEqual(FakeRhasspy.hits["/api/slow"], 1)
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
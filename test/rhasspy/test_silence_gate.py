@@ -0,0 +1,99 @@
+'''
+test cases :
+1   A recording with a voiced command passes the gate
+2   Room noise and digital silence are rejected and counted as STT calls avoided
+3   Hum and hiss as loud as speech are rejected by their zero-crossing rate
+4   The noise floor follows a quieter room quickly, a louder one slowly, and is kept per source
+5   Stereo, float and too-short recordings are handled without errors
+'''
+import sys
+import os
+import unittest
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rhasspy_voice.silence_gate import SilenceGate, GATE_NOISE_RISE
+
+RATE = 16000
+
+def noise(seconds, level, seed=0):
+    return np.random.default_rng(seed).standard_normal(int(seconds * RATE)) * level
+
+def voiced(seconds, level=0.2):
+    # Harmonics of a 140 Hz voice with a syllable-rate envelope
+    t = np.arange(int(seconds * RATE)) / RATE
+    signal = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((140, 280, 420, 700, 1100), 1))
+    return signal * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2) * level
+
+def int16(signal):
+    return np.clip(signal * 32767, -32768, 32767).astype(np.int16)
+
+def command(level=0.2, noise_level=0.002):
+    return int16(np.concatenate([noise(0.5, noise_level), voiced(1.0, level), noise(1.0, noise_level, seed=1)]))
+
+class TestSilenceGate(unittest.TestCase):
+    def test_voiced_command_passes(self):
+        gate = SilenceGate()
+        self.assertTrue(gate.check(command(), RATE))
+        self.assertTrue(gate.check(command(level=0.05), RATE))
+        self.assertEqual((gate.checked, gate.rejected), (2, 0))
+
+    def test_silence_rejected_and_counted(self):
+        gate = SilenceGate()
+        self.assertFalse(gate.check(int16(noise(5.0, 0.002)), RATE))
+        self.assertFalse(gate.check(np.zeros(5 * RATE, dtype=np.int16), RATE))
+        self.assertEqual(gate.rejected, 2)
+        self.assertAlmostEqual(gate.seconds_rejected, 10.0)
+        self.assertIn("STT calls avoided 2", gate.report())
+
+    def test_hum_and_hiss_rejected(self):
+        t = np.arange(3 * RATE) / RATE
+        hum = np.concatenate([noise(0.5, 0.002), 0.2 * np.sin(2 * np.pi * 50 * t), noise(1.0, 0.002)])
+        hiss = np.concatenate([noise(0.5, 0.002), noise(3.0, 0.1, seed=2), noise(1.0, 0.002)])
+        for sound in (hum, hiss):
+            gate = SilenceGate()
+            self.assertFalse(gate.check(int16(sound), RATE))   # Loud enough, but not speech-like
+            self.assertLess(gate.threshold_db(), -20)
+            self.assertTrue(gate.check(command(), RATE))
+
+    def test_adaptive_noise_floor(self):
+        gate = SilenceGate()
+        gate.check(int16(noise(2.0, 0.01)), RATE)                # -40 dBFS room
+        loud = gate.noise_floors["mic"]
+        self.assertAlmostEqual(loud, -40, delta=1.5)
+        gate.check(int16(noise(2.0, 0.002)), RATE)               # -54 dBFS: half way down at once
+        self.assertAlmostEqual(gate.noise_floors["mic"], (loud - 54) / 2, delta=1.5)
+        quiet = gate.noise_floors["mic"]
+        gate.check(int16(noise(2.0, 0.05)), RATE)                # -26 dBFS: a small step up
+        self.assertAlmostEqual(gate.noise_floors["mic"], quiet + GATE_NOISE_RISE * (-26 - quiet), delta=1.5)
+        gate.check(int16(noise(2.0, 0.002)), RATE, source="mic 2")
+        self.assertEqual(sorted(gate.noise_floors), ["mic", "mic 2"])
+        self.assertEqual(gate.threshold_db("mic 3"), gate.min_threshold_db)
+
+    def test_other_formats(self):
+        gate = SilenceGate()
+        stereo = np.stack([command(), command()], axis=1)
+        self.assertTrue(gate.check(stereo, RATE))
+        self.assertTrue(gate.check(command() / 32768.0, RATE))
+        self.assertFalse(gate.check(np.zeros(10, dtype=np.int16), RATE))
+        self.assertEqual(gate.checked, 3)
+
+if __name__ == "__main__":
+    class CustomTestResult(unittest.TextTestResult):
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            print(f"PASS: {test._testMethodName}")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            print(f"FAIL: {test._testMethodName}")
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            print(f"ERROR: {test._testMethodName}")
+
+    runner = unittest.TextTestRunner(resultclass=CustomTestResult, verbosity=0)
+    unittest.main(testRunner=runner)
@@ -22,19 +22,41 @@ Expected result: The function returns True (assuming publish succeeds).
 test_publish_intent_external_null_client:
 
 6. Tests the case where the external_mqtt_client is None.
-Expected result: The function returns False.'''
+Expected result: The function returns False.
+test_publish_intent_external_device_routing:
+
+7. Tests the "device" topic routing: the intent goes to home/<device>/set and to the legacy topic as a mirror.
+Expected result: The function returns True after publishing to both topics.
+test_publish_intent_external_rate_limited:
+
+8. Tests an intent over the per-device rate limit.
+Expected result: The function returns False without publishing and keeps the intent as the deferred one.
+test_record_audio_stops_on_silence:
+
+9. Tests command recording with voice activity detection on a stream of 1 s noise, 1 s speech and 5 s silence.
+Expected result: The recording stops after the trailing silence and returns a WAV shorter than the 5 s cap.
+test_prepare_command_audio_encodes_once:
+
+10. Tests preprocessing of a 44.1 kHz recording before STT.
+Expected result: One 16 kHz WAV is encoded from the recorded samples, without a WAV being decoded on the way.'''
 
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 import json
 import sys
 import os
 import io
 
+import numpy as np
+
 # Add parent folder to path so "rhasspy" package can be imported
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
+from common.rate_limit import RateLimiter
+from common.profiling import StageTimers
+from common.topics import TopicRouter, ROUTING_DEVICE
 from rhasspy_voice import voiceControl
+from rhasspy_voice.preprocessing import AudioPreprocessor
 
 class TestPublishIntentExternal(unittest.TestCase):
     def setUp(self):
@@ -63,7 +85,7 @@ class TestPublishIntentExternal(unittest.TestCase):
         result = voiceControl.publish_intent_external(
             topic="test/topic", payload_dict=sample_payload)
         self.assertTrue(result)
-        self.mock_mqtt_client.publish.assert_called_once_with("test/topic", json.dumps(sample_payload))
+        self.mock_mqtt_client.publish.assert_called_once_with("test/topic", json.dumps(sample_payload).encode())
 
     def test_publish_intent_external_failure_not_connected(self):
         self.mock_mqtt_client.is_connected.return_value = False
@@ -92,7 +114,7 @@ class TestPublishIntentExternal(unittest.TestCase):
         result = voiceControl.publish_intent_external(
             topic="test/topic", payload_dict=valid_payload)
         self.assertTrue(result)
-        self.mock_mqtt_client.publish.assert_called_once_with("test/topic", json.dumps(valid_payload))
+        self.mock_mqtt_client.publish.assert_called_once_with("test/topic", json.dumps(valid_payload).encode())
 
 
     # This test case also needs re-evaluation.
@@ -107,7 +129,7 @@ class TestPublishIntentExternal(unittest.TestCase):
         result = voiceControl.publish_intent_external(
             topic="test/topic", payload_dict=generic_payload)
         self.assertTrue(result)
-        self.mock_mqtt_client.publish.assert_called_once_with("test/topic", json.dumps(generic_payload))
+        self.mock_mqtt_client.publish.assert_called_once_with("test/topic", json.dumps(generic_payload).encode())
 
 
     def test_publish_intent_external_null_client(self):
@@ -117,6 +139,84 @@ class TestPublishIntentExternal(unittest.TestCase):
             topic="test/topic", payload_dict=sample_payload)
         self.assertFalse(result)
 
+    def test_publish_intent_external_device_routing(self):
+        self.mock_mqtt_client.is_connected.return_value = True
+        self.mock_mqtt_client.publish.return_value.rc = 0
+        sample_payload = {"name": "l1", "state": "on"}
+        original_router = voiceControl.INTENT_TOPICS
+        voiceControl.INTENT_TOPICS = TopicRouter(ROUTING_DEVICE)
+        try:
+            result = voiceControl.publish_intent_external(
+                topic="test/topic", payload_dict=sample_payload)
+        finally:
+            voiceControl.INTENT_TOPICS = original_router
+        self.assertTrue(result)
+        self.assertEqual([call.args[0] for call in self.mock_mqtt_client.publish.call_args_list],
+                         ["home/l1/set", "test/topic"])
+
+    def test_publish_intent_external_rate_limited(self):
+        self.mock_mqtt_client.is_connected.return_value = True
+        self.mock_mqtt_client.publish.return_value.rc = 0
+        sample_payload = {"name": "l1", "state": "on"}
+        voiceControl.rate_limiter = RateLimiter("voice", device_limit=(0.001, 1), source_limit=(0, 0))
+        try:
+            self.assertTrue(voiceControl.publish_intent_external("test/topic", sample_payload))
+            self.assertFalse(voiceControl.publish_intent_external("test/topic", sample_payload))
+            self.assertEqual(self.mock_mqtt_client.publish.call_count, 1)
+            self.assertEqual(voiceControl.rate_limiter.deferred, 1)
+        finally:
+            voiceControl.rate_limiter = None
+
+class FakeInputStream:
+    # Delivers a prepared int16 signal to the stream callback in blocks, as the microphone would
+    signal = None
+
+    def __init__(self, samplerate, channels, dtype, device, blocksize, callback):
+        self.blocksize = blocksize
+        self.callback = callback
+
+    def __enter__(self):
+        for start in range(0, len(self.signal), self.blocksize):
+            block = self.signal[start:start + self.blocksize].reshape(-1, 1)
+            self.callback(block, len(block), None, None)
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class TestRecordAudio(unittest.TestCase):
+    def test_record_audio_stops_on_silence(self):
+        rate = 16000
+        rng = np.random.default_rng(0)
+        levels = [0.001] * rate + [0.3] * rate + [0.001] * (5 * rate)
+        FakeInputStream.signal = (rng.standard_normal(len(levels)) * levels * 32767).astype(np.int16)
+        original_stream, original_stdout = voiceControl.sd.InputStream, sys.stdout
+        voiceControl.sd.InputStream = FakeInputStream
+        sys.stdout = io.StringIO()
+        try:
+            audio = voiceControl.record_audio(5, rate, 1)
+        finally:
+            voiceControl.sd.InputStream, sys.stdout = original_stream, original_stdout
+        self.assertEqual(audio[:4], b"RIFF")
+        seconds = (len(audio) - 44) / 2 / rate
+        self.assertLess(seconds, 3.0)
+        self.assertGreater(seconds, 1.0)
+
+class TestPrepareCommandAudio(unittest.TestCase):
+    def test_prepare_command_audio_encodes_once(self):
+        rate = voiceControl.SAMPLE_RATE
+        rng = np.random.default_rng(0)
+        levels = [0.002] * (rate // 2) + [0.3] * rate + [0.002] * (rate // 2)
+        recording = (rng.standard_normal(len(levels)) * levels * 32767).astype(np.int16)
+        with patch.object(voiceControl, "audio_preprocessor", AudioPreprocessor()), \
+             patch.object(voiceControl, "encode_wav", wraps=voiceControl.encode_wav) as encode_wav, \
+             patch("scipy.io.wavfile.read", side_effect=AssertionError("WAV decoded")):
+            audio = voiceControl.prepare_command_audio(recording, StageTimers("test"))
+        self.assertEqual(encode_wav.call_count, 1)
+        self.assertEqual(encode_wav.call_args.args[1], 16000)
+        self.assertEqual(audio[:4], b"RIFF")
+        self.assertEqual(int.from_bytes(audio[24:28], "little"), 16000)
+
 if __name__ == "__main__":
     class CustomTestResult(unittest.TextTestResult):
         def addSuccess(self, test):